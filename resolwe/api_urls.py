@@ -8,6 +8,7 @@ from .flow.views import (
     DataViewSet,
     DescriptorSchemaViewSet,
     EntityViewSet,
+    MetricsViewSet,
     ProcessViewSet,
     RelationViewSet,
     StorageViewSet,
@@ -21,6 +22,7 @@ api_router.register(r"entity", EntityViewSet)
 api_router.register(r"relation", RelationViewSet)
 api_router.register(r"descriptorschema", DescriptorSchemaViewSet)
 api_router.register(r"storage", StorageViewSet)
+api_router.register(r"metrics", MetricsViewSet, basename="metrics")
 
 
 urlpatterns = [
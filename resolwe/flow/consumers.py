@@ -3,7 +3,10 @@ import logging
 
 from channels.consumer import SyncConsumer
 
-from resolwe.flow.utils.purge import location_purge
+from django.conf import settings
+
+from resolwe.flow.models import DataLocation
+from resolwe.flow.utils.purge import purge_locations, purge_sweep
 from resolwe.utils import BraceMessage as __
 
 logger = logging.getLogger(__name__)
@@ -13,14 +16,33 @@ class PurgeConsumer(SyncConsumer):
     """Purge consumer."""
 
     def purge_run(self, event):
-        """Run purge for the object with ``location_id`` specified in ``event`` argument."""
-        location_id = event["location_id"]
+        """Run purge for the locations with ``location_ids`` specified in ``event`` argument."""
+        if "location_ids" in event:
+            location_ids = event["location_ids"]
+        else:
+            location_ids = [event["location_id"]]
         verbosity = event["verbosity"]
 
         try:
-            logger.info(__("Running purge for location id {}.", location_id))
-            location_purge(location_id=location_id, delete=True, verbosity=verbosity)
+            logger.info(__("Running purge for location ids {}.", location_ids))
+            purge_locations(
+                DataLocation.objects.filter(id__in=location_ids),
+                delete=True,
+                verbosity=verbosity,
+                workers=getattr(settings, "FLOW_PURGE_WORKERS", 2),
+            )
         except Exception:
             logger.exception(
-                "Error while purging location.", extra={"location_id": location_id}
+                "Error while purging locations.", extra={"location_ids": location_ids}
+            )
+
+    def purge_sweep(self, event):
+        """Purge finished data locations which were missed by ``purge_run``."""
+        try:
+            logger.info("Running purge sweep.")
+            purge_sweep(
+                limit=getattr(settings, "FLOW_PURGE_SWEEP_LIMIT", 500),
+                verbosity=event["verbosity"],
             )
+        except Exception:
+            logger.exception("Error while running purge sweep.")
@@ -53,8 +53,8 @@ class ExecutionEngine(BaseExecutionEngine):
         """Evaluate the code needed to compute a given Data object."""
         try:
             inputs = copy.deepcopy(data.input)
-            hydrate_input_references(inputs, data.process.input_schema)
-            hydrate_input_uploads(inputs, data.process.input_schema)
+            hydrate_input_references(inputs, data.process.compiled_input_schema)
+            hydrate_input_uploads(inputs, data.process.compiled_input_schema)
 
             # Include special 'proc' variable in the context.
             inputs["proc"] = {
@@ -66,7 +66,7 @@ class ExecutionEngine(BaseExecutionEngine):
             inputs["requirements"] = data.process.requirements
             # Inject default values and change resources according to
             # the current Django configuration.
-            inputs["requirements"]["resources"] = data.process.get_resource_limits()
+            inputs["requirements"]["resources"] = data.get_resource_limits()
 
             script_template = data.process.run.get("program", "")
 
@@ -81,8 +81,8 @@ class ExecutionEngine(BaseExecutionEngine):
 
         # Write serialized inputs.
         inputs = copy.deepcopy(data.input)
-        hydrate_input_references(inputs, data.process.input_schema)
-        hydrate_input_uploads(inputs, data.process.input_schema)
+        hydrate_input_references(inputs, data.process.compiled_input_schema)
+        hydrate_input_uploads(inputs, data.process.compiled_input_schema)
         inputs_path = os.path.join(runtime_dir, PYTHON_INPUTS_FILENAME)
 
         # XXX: Skip serialization of LazyStorageJSON. We should support
@@ -103,7 +103,7 @@ class ExecutionEngine(BaseExecutionEngine):
         requirements = copy.deepcopy(data.process.requirements)
         # Inject default values and change resources according to
         # the current Django configuration.
-        requirements["resources"] = data.process.get_resource_limits()
+        requirements["resources"] = data.get_resource_limits()
         requirements_path = os.path.join(runtime_dir, PYTHON_REQUIREMENTS_FILENAME)
 
         with open(requirements_path, "w") as file:
@@ -28,6 +28,7 @@ using the python from the ``venv`` virtualenv.
 
 import argparse
 import asyncio
+import logging
 from importlib import import_module
 
 from . import manager_commands
@@ -65,8 +66,10 @@ if __name__ == "__main__":
     loop = asyncio.get_event_loop()
     loop.run_until_complete(_sequential())
 
-    # Wait for any pending logging emits now there's
-    # nothing else running anymore
+    # Send buffered log records and wait for any pending logging
+    # emits now there's nothing else running anymore
+    for handler in logging.getLogger().handlers:
+        handler.flush()
     loop.run_until_complete(asyncio.gather(*logging_future_list))
 
     # Now that logging is done too, close the connection cleanly.
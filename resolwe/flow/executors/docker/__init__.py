@@ -6,5 +6,6 @@ Docker Flow Executor
 
 .. automodule:: resolwe.flow.executors.docker.run
 .. automodule:: resolwe.flow.executors.docker.prepare
+.. automodule:: resolwe.flow.executors.docker.pool
 
 """
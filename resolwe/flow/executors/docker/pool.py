@@ -0,0 +1,270 @@
+""".. Ignore pydocstyle D400.
+
+===================
+Warm Container Pool
+===================
+
+Pool of pre-started Docker containers, which can be used by the
+executor instead of starting a new container for each job.
+
+Pooled containers are started with the same limits and security options
+as regular containers. Instead of job's volumes, each of them mounts its
+own empty slot directories in the data and runtime directories (see
+:data:`POOL_SLOTS_DIR`). When a job is attached, its data directory is
+moved into the data slot and replaced with a symbolic link, and its
+read-only runtime volumes are hard linked into the runtime slot, so the
+container can only access volumes of the current job. The data
+directory is moved back and the slots are emptied when the job ends.
+
+Other state, e.g. temporary files, is shared by consecutive jobs in the
+same container, so the pool is only used for images listed in the
+``IMAGES`` key of the ``FLOW_DOCKER_POOL`` setting.
+
+Containers are claimed by renaming them, which Docker performs
+atomically, so concurrent executors never get the same container.
+
+.. autoclass:: resolwe.flow.executors.docker.pool.ContainerPool
+    :members:
+
+"""
+# pylint: disable=logging-format-interpolation
+import hashlib
+import logging
+import os
+import shlex
+import shutil
+import uuid
+from asyncio import subprocess
+
+from .. import manager_commands
+from ..global_settings import EXECUTOR_SETTINGS, SETTINGS
+from ..transfer import transfer_file
+
+# Mount points of containers' data and runtime slots.
+DATA_POOL_VOLUME = "/data_pool"
+RUNTIME_POOL_VOLUME = "/runtime_pool"
+
+#: Name of the directory with slots of pooled containers, created in
+#: both the data and the runtime directory.
+POOL_SLOTS_DIR = ".docker_pool"
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerPool:
+    """Warm pool of containers with the same image and options."""
+
+    def __init__(self, command, name_prefix, image, run_args, key_args, slot_volumes):
+        """Initialize attributes.
+
+        :param command: The Docker command.
+        :param name_prefix: The prefix of container names.
+        :param image: The container image.
+        :param run_args: A list of ``docker run`` arguments (limits,
+            security options, volumes...) of pooled containers.
+        :param key_args: A list of options, which identify the pool.
+            Containers with the same image and options share the pool.
+        :param slot_volumes: A dictionary of options of the slot volumes
+            by their mount points (:data:`DATA_POOL_VOLUME` and
+            :data:`RUNTIME_POOL_VOLUME`).
+        """
+        config = SETTINGS.get("FLOW_DOCKER_POOL", {})
+        self.size = config.get("SIZE", 1)
+        self.max_uses = config.get("MAX_USES", 1)
+
+        self.command = command
+        self.image = image
+        self.run_args = run_args
+        self.slot_volumes = slot_volumes
+
+        key = hashlib.sha1(" ".join([image] + key_args).encode("utf-8"))
+        self.name_prefix = "{}_pool_{}_".format(name_prefix, key.hexdigest()[:12])
+
+    @staticmethod
+    def is_enabled(image):
+        """Return ``True`` if the pool may be used for the given image."""
+        config = SETTINGS.get("FLOW_DOCKER_POOL", {})
+        return config.get("ENABLED", False) and image in config.get("IMAGES", [])
+
+    def _make_name(self, uses, slot):
+        """Generate a name of a pooled container."""
+        return "{}{}_{}".format(self.name_prefix, uses, slot)
+
+    @staticmethod
+    def _slot_paths(slot):
+        """Return paths of the slot by mount points of slot volumes."""
+        return {
+            volume: os.path.join(
+                SETTINGS["FLOW_EXECUTOR"][base_dir_name], POOL_SLOTS_DIR, slot
+            )
+            for volume, base_dir_name in [
+                (DATA_POOL_VOLUME, "DATA_DIR"),
+                (RUNTIME_POOL_VOLUME, "RUNTIME_DIR"),
+            ]
+        }
+
+    def _remove_slot(self, slot):
+        """Remove directories of the slot."""
+        for path in self._slot_paths(slot).values():
+            shutil.rmtree(path, ignore_errors=True)
+
+    async def _docker(self, *args):
+        """Run a Docker command and return its return code and output."""
+        proc = await subprocess.create_subprocess_exec(
+            self.command, *args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+        stdout, _ = await proc.communicate()
+        return proc.returncode, stdout.decode("utf-8")
+
+    async def _list(self):
+        """Return names of running containers in the pool."""
+        returncode, stdout = await self._docker(
+            "ps",
+            "--filter",
+            "name={}".format(self.name_prefix),
+            "--filter",
+            "status=running",
+            "--format",
+            "{{.Names}}",
+        )
+        if returncode != 0:
+            logger.warning("Unable to list pooled containers:\n\n{}".format(stdout))
+            return []
+        return [name for name in stdout.split() if name.startswith(self.name_prefix)]
+
+    async def acquire(self, name):
+        """Claim a container from the pool and rename it to ``name``.
+
+        :return: A tuple of the number of jobs the container has already
+            run and its slot, or ``None`` if there are no containers in
+            the pool.
+        """
+        for pooled_name in await self._list():
+            returncode, _ = await self._docker("rename", pooled_name, name)
+            if returncode == 0:
+                uses, slot = pooled_name[len(self.name_prefix) :].split("_")
+                return int(uses), slot
+
+        return None
+
+    async def release(self, name, uses, slot, success):
+        """Return the container to the pool or destroy it.
+
+        The container is recycled only if the job succeeded and the
+        container has not reached ``MAX_USES`` jobs yet. Job's volumes
+        must be detached before.
+        """
+        if success and uses < self.max_uses:
+            returncode, _ = await self._docker(
+                "rename", name, self._make_name(uses, slot)
+            )
+            if returncode == 0:
+                return
+
+        await self._docker("rm", "--force", name)
+        self._remove_slot(slot)
+
+    async def fill(self):
+        """Start containers until there are ``SIZE`` of them in the pool."""
+        missing = self.size - len(await self._list())
+        for _ in range(missing):
+            slot = uuid.uuid4().hex
+            slot_paths = self._slot_paths(slot)
+            for path in slot_paths.values():
+                os.makedirs(path, mode=0o755)
+
+            returncode, stdout = await self._docker(
+                "run",
+                "--rm",
+                "--detach",
+                "--interactive",
+                "--name={}".format(self._make_name(0, slot)),
+                *[
+                    "--volume={}:{}:{}".format(path, volume, self.slot_volumes[volume])
+                    for volume, path in slot_paths.items()
+                ],
+                *self.run_args,
+                self.image,
+                "/bin/bash",
+            )
+            if returncode != 0:
+                logger.warning("Unable to start pooled container:\n\n{}".format(stdout))
+                self._remove_slot(slot)
+                return
+
+    async def attach(self, name, slot, volumes):
+        """Attach job's volumes to their mount points in the container.
+
+        :param volumes: A list of ``(path, mount point, read only)``
+            tuples.
+        """
+        slot_paths = self._slot_paths(slot)
+        links = []
+        try:
+            for index, (path, dest, read_only) in enumerate(volumes):
+                volume = RUNTIME_POOL_VOLUME if read_only else DATA_POOL_VOLUME
+                slot_path = os.path.join(slot_paths[volume], str(index))
+                if read_only:
+                    # Read-only volumes are linked, so they stay in place.
+                    if os.path.isdir(path):
+                        shutil.copytree(path, slot_path, copy_function=transfer_file)
+                    elif os.path.exists(path):
+                        transfer_file(path, slot_path)
+                    else:
+                        os.mkdir(slot_path)
+                else:
+                    os.rename(path, slot_path)
+                    os.symlink(slot_path, path)
+                links.append((os.path.join(volume, str(index)), dest))
+
+            script = " && ".join(
+                "rm -rf {dest} && mkdir -p {parent} && ln -s {src} {dest}".format(
+                    src=shlex.quote(src),
+                    dest=shlex.quote(dest),
+                    parent=shlex.quote(os.path.dirname(dest)),
+                )
+                for src, dest in links
+            )
+            returncode, stdout = await self._docker(
+                "exec", "--user=0:0", name, "/bin/bash", "-c", script
+            )
+            if returncode != 0:
+                raise RuntimeError(
+                    "Unable to attach volumes to pooled container:\n\n{}".format(stdout)
+                )
+        except Exception:
+            self.detach(slot, volumes)
+            raise
+
+    def detach(self, slot, volumes):
+        """Move job's data volumes back and empty the slot.
+
+        :param volumes: A list of volumes as given to :meth:`attach`.
+        """
+        slot_paths = self._slot_paths(slot)
+        for index, (path, _, read_only) in enumerate(volumes):
+            slot_path = os.path.join(slot_paths[DATA_POOL_VOLUME], str(index))
+            if not read_only and os.path.islink(path) and os.path.exists(slot_path):
+                os.remove(path)
+                os.rename(slot_path, path)
+
+        # Remove anything else the job left in the slot.
+        for slot_path in slot_paths.values():
+            for entry in os.listdir(slot_path):
+                entry = os.path.join(slot_path, entry)
+                if os.path.isdir(entry) and not os.path.islink(entry):
+                    shutil.rmtree(entry)
+                else:
+                    os.remove(entry)
+
+    async def record(self, hit):
+        """Count a pool hit or miss in the statistics."""
+        stats_key = EXECUTOR_SETTINGS.get("REDIS_DOCKER_POOL_STATS")
+        if not stats_key or manager_commands.redis_conn is None:
+            return
+
+        field = "{}:{}".format("hits" if hit else "misses", self.image)
+        try:
+            await manager_commands.redis_conn.hincrby(stats_key, field, 1)
+        except Exception:
+            logger.exception("Unable to store container pool statistics.")
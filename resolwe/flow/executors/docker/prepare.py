@@ -24,7 +24,12 @@ class FlowExecutorPreparer(BaseFlowExecutorPreparer):
     def post_register_hook(self, verbosity=1):
         """Pull Docker images needed by processes after registering."""
         if not getattr(settings, "FLOW_DOCKER_DONT_PULL", False):
-            call_command("list_docker_images", pull=True, verbosity=verbosity)
+            call_command(
+                "list_docker_images",
+                pull=True,
+                prune=getattr(settings, "FLOW_DOCKER_PRUNE_IMAGES", False),
+                verbosity=verbosity,
+            )
 
     def resolve_data_path(self, data=None, filename=None):
         """Resolve data path for use with the executor.
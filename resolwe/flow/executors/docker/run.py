@@ -17,11 +17,16 @@ from asyncio import subprocess
 from ..global_settings import DATA_LOCATION, PROCESS_META, SETTINGS
 from ..local.run import FlowExecutor as LocalFlowExecutor
 from ..protocol import ExecutorFiles
+from ..resources import cgroup_usage, usage_difference
 from . import constants
+from .pool import DATA_POOL_VOLUME, RUNTIME_POOL_VOLUME, ContainerPool
 from .seccomp import SECCOMP_POLICY
 
 DOCKER_START_TIMEOUT = 60
 
+# Number of seconds between samples of resource usage of containers.
+RESOURCE_SAMPLE_INTERVAL = 5
+
 # Limits of containers' access to memory. We set the limit to ensure
 # processes are stable and do not get killed by OOM signal.
 DOCKER_MEMORY_HARD_LIMIT_BUFFER = 100
@@ -45,10 +50,66 @@ class FlowExecutor(LocalFlowExecutor):
         self.temporary_files = []
         self.command = SETTINGS.get("FLOW_DOCKER_COMMAND", "docker")
 
+        self.pool = None
+        self.pool_uses = None
+        self.pool_slot = None
+        self.pool_volumes = None
+        self.pool_fill = None
+
+        self.container_id = None
+        self.resource_sampler = None
+        self.container_usage_start = None
+        self.container_usage = None
+
     def _generate_container_name(self):
         """Generate unique container name."""
         return "{}_{}".format(self.container_name_prefix, self.data_id)
 
+    async def _get_container_id(self):
+        """Return the full ID of the running container."""
+        inspect_proc = await subprocess.create_subprocess_exec(
+            self.command,
+            "inspect",
+            "--format={{.Id}}",
+            self._generate_container_name(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        stdout, _ = await inspect_proc.communicate()
+        if inspect_proc.returncode != 0:
+            return None
+        return stdout.decode("utf-8").strip()
+
+    async def _sample_resource_usage(self):
+        """Periodically sample resource usage of the container."""
+        while True:
+            await asyncio.sleep(RESOURCE_SAMPLE_INTERVAL)
+            usage = cgroup_usage(self.container_id)
+            if usage is not None:
+                usage["max_memory"] = max(
+                    usage["max_memory"], self.container_usage["max_memory"]
+                )
+                self.container_usage = usage
+
+    async def get_resource_usage(self):
+        """Return resources used by the container.
+
+        The container's cgroup is removed together with the container,
+        so its usage is sampled while it is running and usage after the
+        last sample is not accounted for. Reused pooled containers report
+        the peak memory of all their jobs, so it is flagged as pooled.
+        """
+        if self.resource_sampler is not None:
+            self.resource_sampler.cancel()
+
+        if self.container_usage_start is None:
+            return None
+
+        usage = usage_difference(self.container_usage_start, self.container_usage)
+        if self.pool_uses:
+            usage["pooled"] = True
+        return usage
+
     async def start(self):
         """Start process execution."""
         # arguments passed to the Docker command
@@ -128,6 +189,12 @@ class FlowExecutor(LocalFlowExecutor):
         # Drop all capabilities and only add ones that are needed.
         security.append("--cap-drop=all")
 
+        # Security options identifying the pool of warm containers.
+        pool_security = " ".join(
+            option.split("=", 1)[0] if option.startswith("--security-opt") else option
+            for option in security
+        )
+
         command_args["security"] = " ".join(security)
 
         # Setup Docker volumes.
@@ -169,23 +236,28 @@ class FlowExecutor(LocalFlowExecutor):
                 "options": ",".join(options),
             }
 
-        volumes = [
-            new_volume(
+        # Volumes specific to this job, given as arguments of new_volume.
+        job_volumes = [
+            (
                 "data",
                 "DATA_DIR",
                 constants.DATA_VOLUME,
                 [DATA_LOCATION["subpath"]],
-                read_only=False,
-            ),
-            new_volume("data_all", "DATA_DIR", constants.DATA_ALL_VOLUME),
-            new_volume(
-                "upload", "UPLOAD_DIR", constants.UPLOAD_VOLUME, read_only=False
+                False,
             ),
-            new_volume(
+            (
                 "secrets",
                 "RUNTIME_DIR",
                 constants.SECRETS_VOLUME,
                 [DATA_LOCATION["subpath"], ExecutorFiles.SECRETS_DIR],
+                True,
+            ),
+        ]
+
+        volumes = [
+            new_volume("data_all", "DATA_DIR", constants.DATA_ALL_VOLUME),
+            new_volume(
+                "upload", "UPLOAD_DIR", constants.UPLOAD_VOLUME, read_only=False
             ),
         ]
 
@@ -206,7 +278,7 @@ class FlowExecutor(LocalFlowExecutor):
         group_file.file.flush()
         self.temporary_files.append(group_file)
 
-        volumes += [
+        users_volumes = [
             new_volume("users", None, "/etc/passwd", [passwd_file.name]),
             new_volume("users", None, "/etc/group", [group_file.name]),
         ]
@@ -230,9 +302,13 @@ class FlowExecutor(LocalFlowExecutor):
         runtime_volume_maps = SETTINGS.get("RUNTIME_VOLUME_MAPS", None)
         if runtime_volume_maps:
             for src, dst in runtime_volume_maps.items():
-                volumes.append(
-                    new_volume(
-                        "runtime", "RUNTIME_DIR", dst, [DATA_LOCATION["subpath"], src],
+                job_volumes.append(
+                    (
+                        "runtime",
+                        "RUNTIME_DIR",
+                        dst,
+                        [DATA_LOCATION["subpath"], src],
+                        True,
                     )
                 )
 
@@ -242,12 +318,19 @@ class FlowExecutor(LocalFlowExecutor):
         # Make sure that tmp dir exists.
         os.makedirs(constants.TMPDIR, mode=0o755, exist_ok=True)
 
-        # Create Docker --volume parameters from volumes.
-        command_args["volumes"] = " ".join(
-            [
+        def volume_args(volumes):
+            """Create Docker --volume parameters from volumes."""
+            return [
                 '--volume="{src}":"{dest}":{options}'.format(**volume)
                 for volume in volumes
             ]
+
+        command_args["volumes"] = " ".join(
+            volume_args(
+                [new_volume(*volume) for volume in job_volumes]
+                + volumes
+                + users_volumes
+            )
         )
 
         # Set working directory to the data volume.
@@ -297,12 +380,76 @@ class FlowExecutor(LocalFlowExecutor):
                     error_msg = "\n".join([error_msg, stderr.decode("utf-8")])
                 raise RuntimeError(error_msg)
 
-        docker_command = (
-            "{command} run --rm --interactive {container_name} {network} {volumes} {limits} "
-            "{security} {workdir} {user} {container_image} {shell}".format(
-                **command_args
+        if ContainerPool.is_enabled(command_args["container_image"]):
+            # Pooled containers mount only their own slots, where the
+            # job's volumes are attached.
+            pool_volumes = volume_args(volumes)
+            slot_volumes = {
+                volume["dest"]: volume["options"]
+                for volume in [
+                    new_volume("data", None, DATA_POOL_VOLUME, read_only=False),
+                    new_volume("runtime", None, RUNTIME_POOL_VOLUME),
+                ]
+            }
+            pool_options = [
+                command_args["network"],
+                command_args["limits"],
+                command_args["user"],
+            ]
+            self.pool = ContainerPool(
+                self.command,
+                self.container_name_prefix,
+                command_args["container_image"],
+                run_args=shlex.split(
+                    " ".join(
+                        pool_options
+                        + pool_volumes
+                        + volume_args(users_volumes)
+                        + [command_args["security"]]
+                    )
+                ),
+                # Temporary file names must not change the pool.
+                key_args=pool_options
+                + pool_volumes
+                + [pool_security]
+                + [
+                    "{}:{}".format(volume, ",".join(sorted(options.split(","))))
+                    for volume, options in sorted(slot_volumes.items())
+                ],
+                slot_volumes=slot_volumes,
+            )
+            acquired = await self.pool.acquire(self._generate_container_name())
+            await self.pool.record(hit=acquired is not None)
+            self.pool_fill = asyncio.ensure_future(self.pool.fill())
+
+            if acquired is not None:
+                self.pool_uses, self.pool_slot = acquired
+
+        if self.pool_uses is not None:
+            self.pool_volumes = [
+                (
+                    os.path.join(
+                        SETTINGS["FLOW_EXECUTOR"][base_dir_name],
+                        *[str(atom) for atom in path],
+                    ),
+                    volume,
+                    read_only,
+                )
+                for _, base_dir_name, volume, path, read_only in job_volumes
+            ]
+            await self.pool.attach(
+                self._generate_container_name(), self.pool_slot, self.pool_volumes
+            )
+            docker_command = "{command} exec --interactive {workdir} {user} {name} {shell}".format(
+                name=self._generate_container_name(), **command_args
+            )
+        else:
+            docker_command = (
+                "{command} run --rm --interactive {container_name} {network} {volumes} {limits} "
+                "{security} {workdir} {user} {container_image} {shell}".format(
+                    **command_args
+                )
             )
-        )
 
         logger.info("Starting docker container with command: {}".format(docker_command))
         start_time = time.time()
@@ -349,6 +496,15 @@ class FlowExecutor(LocalFlowExecutor):
             )
         )
 
+        self.container_id = await self._get_container_id()
+        if self.container_id:
+            self.container_usage_start = cgroup_usage(self.container_id)
+        if self.container_usage_start is not None:
+            self.container_usage = self.container_usage_start
+            self.resource_sampler = asyncio.ensure_future(self._sample_resource_usage())
+        else:
+            logger.debug("Resource usage of the container is not available.")
+
         self.stdout = self.proc.stdout
 
     async def run_script(self, script):
@@ -374,6 +530,20 @@ class FlowExecutor(LocalFlowExecutor):
         try:
             await self.proc.wait()
         finally:
+            if self.resource_sampler is not None:
+                self.resource_sampler.cancel()
+            if self.pool_fill is not None:
+                # Pooled containers use the temporary files.
+                await self.pool_fill
+            if self.pool_uses is not None:
+                self.pool.detach(self.pool_slot, self.pool_volumes)
+                await self.pool.release(
+                    self._generate_container_name(),
+                    self.pool_uses + 1,
+                    self.pool_slot,
+                    success=self.proc.returncode == 0,
+                )
+
             # Cleanup temporary files.
             for temporary_file in self.temporary_files:
                 temporary_file.close()
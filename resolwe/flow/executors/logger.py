@@ -7,9 +7,17 @@ import socket
 import sys
 from logging.config import dictConfig
 
-from .global_settings import DATA, DATA_LOCATION
-from .manager_commands import send_manager_command
-from .protocol import ExecutorProtocol
+from .global_settings import DATA, DATA_LOCATION, SETTINGS
+from .manager_commands import send_log_messages
+
+#: Maximal number of log records sent to the manager in one batch.
+LOG_BATCH_SIZE = 100
+
+#: Maximal total size (in bytes) of log records sent in one batch.
+LOG_BATCH_BYTES = 256 * 1024
+
+#: Maximal number of seconds a log record waits before it is sent.
+LOG_BATCH_INTERVAL = 1
 
 
 class JSONFormatter(logging.Formatter):
@@ -36,27 +44,71 @@ class JSONFormatter(logging.Formatter):
 
 
 class RedisHandler(logging.Handler):
-    """Publish messages to Redis channel."""
-
-    def __init__(self, emit_list, **kwargs):
+    """Publish messages to Redis channel.
+
+    Records are buffered and sent in batches, when the batch is full or
+    when the oldest record in it waited for ``batch_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        emit_list,
+        batch_size=LOG_BATCH_SIZE,
+        batch_bytes=LOG_BATCH_BYTES,
+        batch_interval=LOG_BATCH_INTERVAL,
+        **kwargs,
+    ):
         """Construct a handler instance.
 
         :param emit_list: The list to add emit futures into, so they can
             be waited on in the executor main function.
+        :param batch_size: The maximal number of records in a batch.
+        :param batch_bytes: The maximal size of records in a batch.
+        :param batch_interval: The maximal number of seconds a record
+            is kept in the buffer.
         """
         self.emit_list = emit_list
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.batch_interval = batch_interval
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._flush_handle = None
         super().__init__(**kwargs)
 
     def emit(self, record):
-        """Send log message to the listener."""
-        future = asyncio.ensure_future(
-            send_manager_command(
-                ExecutorProtocol.LOG,
-                extra_fields={ExecutorProtocol.LOG_MESSAGE: self.format(record),},
-                expect_reply=False,
+        """Add log message to the batch sent to the listener."""
+        message = self.format(record)
+        self._buffer.append(message)
+        self._buffer_bytes += len(message)
+
+        if (
+            len(self._buffer) >= self.batch_size
+            or self._buffer_bytes >= self.batch_bytes
+        ):
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(
+                self.batch_interval, self.flush
             )
-        )
-        self.emit_list.append(future)
+
+    def flush(self):
+        """Send buffered log messages to the listener."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._buffer:
+            return
+
+        messages, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        self.emit_list.append(asyncio.ensure_future(send_log_messages(messages)))
+
+    def close(self):
+        """Send buffered log messages and close the handler."""
+        self.flush()
+        super().close()
 
 
 def configure_logging(emit_list):
@@ -65,6 +117,7 @@ def configure_logging(emit_list):
         module_base = "resolwe.flow.executors"
     else:
         module_base = "executors"
+    flow_executor = SETTINGS.get("FLOW_EXECUTOR", {})
     logging_config = dict(
         version=1,
         formatters={"json_formatter": {"()": JSONFormatter},},
@@ -74,6 +127,10 @@ def configure_logging(emit_list):
                 "formatter": "json_formatter",
                 "level": logging.INFO,
                 "emit_list": emit_list,
+                "batch_size": flow_executor.get("LOG_BATCH_SIZE", LOG_BATCH_SIZE),
+                "batch_interval": flow_executor.get(
+                    "LOG_BATCH_INTERVAL", LOG_BATCH_INTERVAL
+                ),
             },
             "console": {"class": "logging.StreamHandler", "level": logging.WARNING},
         },
@@ -81,7 +138,7 @@ def configure_logging(emit_list):
         loggers={
             # Don't use redis logger to prevent circular dependency.
             module_base
-            + ".manager_comm": {
+            + ".manager_commands": {
                 "level": "INFO",
                 "handlers": ["console"],
                 "propagate": False,
@@ -98,3 +98,29 @@ async def send_manager_command(cmd, expect_reply=True, extra_fields={}):
         return True
 
     return False
+
+
+async def send_log_messages(messages):
+    """Send a batch of formatted log records to the manager.
+
+    Log records are pushed to a dedicated channel, so they do not delay
+    processing of the commands sent by :func:`send_manager_command`.
+
+    :param messages: A list of log records, serialized to JSON.
+    """
+    packet = {
+        ExecutorProtocol.DATA_ID: DATA["id"],
+        ExecutorProtocol.COMMAND: ExecutorProtocol.LOG,
+        ExecutorProtocol.LOG_MESSAGES: messages,
+    }
+
+    log_channel = EXECUTOR_SETTINGS["REDIS_LOG_CHANNEL"]
+    try:
+        await redis_conn.rpush(log_channel, json.dumps(packet))
+    except Exception:
+        logger.error(
+            "Error sending log messages to manager:\n\n{}".format(
+                traceback.format_exc()
+            )
+        )
+        raise
@@ -52,9 +52,7 @@ class BaseFlowExecutorPreparer:
         files[ExecutorFiles.DATA] = model_to_dict(data)
         files[ExecutorFiles.DATA_LOCATION] = model_to_dict(data.location)
         files[ExecutorFiles.PROCESS] = model_to_dict(data.process)
-        files[ExecutorFiles.PROCESS][
-            "resource_limits"
-        ] = data.process.get_resource_limits()
+        files[ExecutorFiles.PROCESS]["resource_limits"] = data.get_resource_limits()
 
         # Add secrets if the process has permission to read them.
         secrets.update(data.resolve_secrets())
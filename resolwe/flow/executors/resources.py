@@ -0,0 +1,174 @@
+""".. Ignore pydocstyle D400.
+
+==============
+Resource Usage
+==============
+
+Measurement of resources used by processes. Usage is reported as a
+dictionary with the following keys:
+
+- ``max_memory``: peak memory usage, in MB
+- ``cpu_time``: user and system CPU time, in seconds
+- ``io_read``: number of bytes read from block devices
+- ``io_write``: number of bytes written to block devices
+
+Measurements of the peak memory that may be inaccurate are flagged with
+the following keys:
+
+- ``sampled``: the peak memory was sampled from the current usage, so
+  it may be underestimated
+- ``pooled``: the peak memory includes previous jobs run in the same
+  container
+
+.. autofunction:: resolwe.flow.executors.resources.rusage_children
+.. autofunction:: resolwe.flow.executors.resources.cgroup_usage
+.. autofunction:: resolwe.flow.executors.resources.usage_difference
+
+"""
+import os
+import resource
+
+#: Mount point of the cgroup file system.
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+#: Paths of Docker containers' cgroups created by the ``systemd`` and
+#: ``cgroupfs`` cgroup drivers, relative to the hierarchy.
+CGROUP_PATHS = ("system.slice/docker-{}.scope", "docker/{}")
+
+#: Size of blocks counted by :func:`resource.getrusage`.
+RUSAGE_BLOCK_SIZE = 512
+
+#: Keys flagging inaccurate measurements of the peak memory.
+USAGE_FLAGS = ("sampled", "pooled")
+
+
+def rusage_children():
+    """Return resources used by terminated children of this process."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        # The maximum resident set size is in kilobytes on Linux.
+        "max_memory": usage.ru_maxrss // 1024,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "io_read": usage.ru_inblock * RUSAGE_BLOCK_SIZE,
+        "io_write": usage.ru_oublock * RUSAGE_BLOCK_SIZE,
+    }
+
+
+def _read_int(path):
+    """Read an integer from the file, return ``None`` if it is missing."""
+    try:
+        with open(path) as handle:
+            return int(handle.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _read_stats(path):
+    """Read lines of keys and values from the file."""
+    try:
+        with open(path) as handle:
+            return [line.split() for line in handle]
+    except OSError:
+        return []
+
+
+def _cgroup2_usage(path):
+    """Read resource usage from the cgroup v2 directory."""
+    # The peak is only available on newer kernels, the current usage is
+    # sampled otherwise.
+    memory = _read_int(os.path.join(path, "memory.peak"))
+    sampled = memory is None
+    if sampled:
+        memory = _read_int(os.path.join(path, "memory.current")) or 0
+
+    cpu_time = 0.0
+    for fields in _read_stats(os.path.join(path, "cpu.stat")):
+        if fields[0] == "usage_usec":
+            cpu_time = int(fields[1]) / 1e6
+
+    io_read = io_write = 0
+    for fields in _read_stats(os.path.join(path, "io.stat")):
+        for field in fields[1:]:
+            key, _, value = field.partition("=")
+            if key == "rbytes":
+                io_read += int(value)
+            elif key == "wbytes":
+                io_write += int(value)
+
+    usage = {
+        "max_memory": memory // 2 ** 20,
+        "cpu_time": cpu_time,
+        "io_read": io_read,
+        "io_write": io_write,
+    }
+    if sampled:
+        usage["sampled"] = True
+    return usage
+
+
+def _cgroup1_usage(container_id):
+    """Read resource usage from the cgroup v1 hierarchies."""
+    for relative in CGROUP_PATHS:
+        relative = relative.format(container_id)
+        memory = _read_int(
+            os.path.join(CGROUP_ROOT, "memory", relative, "memory.max_usage_in_bytes")
+        )
+        if memory is not None:
+            break
+    else:
+        return None
+
+    cpu_time = _read_int(
+        os.path.join(CGROUP_ROOT, "cpuacct", relative, "cpuacct.usage")
+    )
+
+    io_read = io_write = 0
+    for fields in _read_stats(
+        os.path.join(CGROUP_ROOT, "blkio", relative, "blkio.throttle.io_service_bytes")
+    ):
+        if len(fields) == 3 and fields[1] == "Read":
+            io_read += int(fields[2])
+        elif len(fields) == 3 and fields[1] == "Write":
+            io_write += int(fields[2])
+
+    return {
+        "max_memory": memory // 2 ** 20,
+        "cpu_time": (cpu_time or 0) / 1e9,
+        "io_read": io_read,
+        "io_write": io_write,
+    }
+
+
+def cgroup_usage(container_id):
+    """Return resources used by the Docker container.
+
+    Usage is read from the container's cgroup, created by the
+    ``cgroupfs`` or ``systemd`` cgroup driver in either the unified
+    (v2) or the legacy (v1) hierarchy.
+
+    :return: The resource usage or ``None`` if the cgroup is not found.
+    """
+    for relative in CGROUP_PATHS:
+        path = os.path.join(CGROUP_ROOT, relative.format(container_id))
+        if os.path.isfile(os.path.join(path, "cgroup.controllers")):
+            return _cgroup2_usage(path)
+
+    return _cgroup1_usage(container_id)
+
+
+def usage_difference(start, end):
+    """Return resources used between the two measurements.
+
+    Peak memory can not be subtracted, so the later peak is used.
+    Flags of inaccurate measurements of either of them are kept.
+    """
+    usage = {
+        "max_memory": end["max_memory"],
+        "cpu_time": round(max(end["cpu_time"] - start["cpu_time"], 0.0), 3),
+        "io_read": max(end["io_read"] - start["io_read"], 0),
+        "io_write": max(end["io_write"] - start["io_write"], 0),
+    }
+    for flag in USAGE_FLAGS:
+        if start.get(flag) or end.get(flag):
+            usage[flag] = True
+    return usage
@@ -13,15 +13,18 @@ import asyncio
 import json
 import logging
 import os
-import shutil
+import re
 import signal
 import sys
+import time
 import uuid
 from collections import defaultdict
 
 from .global_settings import DATA_META, EXECUTOR_SETTINGS, PROCESS, SETTINGS
 from .manager_commands import send_manager_command
 from .protocol import ExecutorProtocol
+from .resources import rusage_children, usage_difference
+from .transfer import transfer_file
 
 # NOTE: If the imports here are changed, the executors' requirements.txt
 # file must also be updated accordingly.
@@ -29,6 +32,37 @@ from .protocol import ExecutorProtocol
 logger = logging.getLogger(__name__)
 
 
+#: Number of bytes read from the process output at once.
+STDOUT_CHUNK_SIZE = 64 * 1024
+
+#: Maximal number of seconds between flushes of output files.
+OUTPUT_FLUSH_INTERVAL = 1
+
+#: Pattern of lines which have to be interpreted by the executor.
+PROTOCOL_LINE_RE = re.compile(r"^(?:\{|\s*run|\s*export)", re.MULTILINE)
+
+
+def iterlines(text):
+    r"""Iterate over lines of text, including line endings.
+
+    Unlike :meth:`str.splitlines`, only ``\n`` is considered a line
+    boundary, so carriage returns (e.g. in progress bars) are kept.
+    """
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start) + 1 or len(text)
+        yield text[start:end]
+        start = end
+
+
+def as_list(value):
+    """Return the value as a list.
+
+    Messages may be sent one by one or batched in a list.
+    """
+    return value if isinstance(value, list) else [value]
+
+
 def iterjson(text):
     """Decode JSON stream."""
     decoder = json.JSONDecoder()
@@ -54,6 +88,15 @@ class BaseFlowExecutor:
         self.requirements = {}
         self.resources = {}
 
+        # Start time of the executor and durations of its phases.
+        self.timings = {"started": time.time()}
+
+        # Number of exported files per used transfer mechanism.
+        self.file_transfers = defaultdict(int)
+
+        # Resources used by children before the process started.
+        self.resource_usage_start = None
+
         asyncio.get_event_loop().add_signal_handler(
             signal.SIGTERM, lambda: asyncio.ensure_future(self._exit_gracefully())
         )
@@ -126,13 +169,60 @@ class BaseFlowExecutor:
             }
 
         if finish_fields is not None:
-            await self._send_manager_command(
-                ExecutorProtocol.FINISH, extra_fields=finish_fields
-            )
+            await self._send_finish(finish_fields)
 
         # The response channel (Redis list) is deleted automatically once the list is drained, so
         # there is no need to remove it manually.
 
+    async def _read_output(self, stdout, queue):
+        """Read process output in chunks and put decoded lines into queue.
+
+        Output is read independently of its processing, so the process
+        is never blocked on a full pipe while the executor communicates
+        with the manager. Only complete lines are put into the queue,
+        ``None`` is put into the queue at the end of the output.
+        """
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = await stdout.read(STDOUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                buffer += chunk
+                end = buffer.rfind(b"\n") + 1
+                if end:
+                    queue.put_nowait(buffer[:end].decode("utf-8"))
+                    del buffer[:end]
+
+            if buffer:
+                queue.put_nowait(buffer.decode("utf-8"))
+        finally:
+            queue.put_nowait(None)
+
+    async def _send_finish(self, finish_fields):
+        """Send the finish command with timings and resource usage."""
+        finish_fields[ExecutorProtocol.FINISH_TIMINGS] = self.timings
+        finish_fields[ExecutorProtocol.FINISH_FILE_TRANSFERS] = self.file_transfers
+        resource_usage = await self.get_resource_usage()
+        if resource_usage is not None:
+            finish_fields[ExecutorProtocol.FINISH_RESOURCES] = resource_usage
+        await self._send_manager_command(
+            ExecutorProtocol.FINISH, extra_fields=finish_fields
+        )
+
+    async def get_resource_usage(self):
+        """Return resources used by the process.
+
+        :return: A dictionary with peak memory, CPU time and I/O of the
+            process, described in :mod:`~resolwe.flow.executors.resources`,
+            or ``None`` if usage was not measured.
+        """
+        if self.resource_usage_start is None:
+            return None
+
+        return usage_difference(self.resource_usage_start, rusage_children())
+
     def _create_file(self, filename):
         """Ensure a new file is created and opened for writing."""
         file_descriptor = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
@@ -160,7 +250,11 @@ class BaseFlowExecutor:
             await self._send_manager_command(ExecutorProtocol.ABORT, expect_reply=False)
             return
 
+        start_time = time.time()
+        self.resource_usage_start = rusage_children()
         proc_pid = await self.start()
+        run_start_time = time.time()
+        self.timings["executor_start"] = run_start_time - start_time
 
         await self.update_data_status(
             status=DATA_META["STATUS_PROCESSING"], process_pid=proc_pid
@@ -176,94 +270,117 @@ class BaseFlowExecutor:
         process_progress, process_rc = 0, 0
 
         # read process output
+        queue = asyncio.Queue()
+        reader = asyncio.ensure_future(self._read_output(self.get_stdout(), queue))
+        last_flush = time.monotonic()
         try:
-            stdout = self.get_stdout()
             while True:
-                line = await stdout.readline()
-                logger.debug("Process's output: {}".format(line.strip()))
-
-                if not line:
+                text = await queue.get()
+                if text is None:
+                    # Propagate errors raised while reading the output.
+                    await reader
                     break
-                line = line.decode("utf-8")
 
-                try:
-                    if line.strip().startswith("run"):
-                        # Save process and spawn if no errors
-                        log_file.write(line)
-                        log_file.flush()
-
-                        for obj in iterjson(line[3:].strip()):
-                            spawn_processes.append(obj)
-                    elif line.strip().startswith("export"):
-                        file_name = line[6:].strip()
-
-                        export_folder = SETTINGS["FLOW_EXECUTOR"]["UPLOAD_DIR"]
-                        unique_name = "export_{}".format(uuid.uuid4().hex)
-                        export_path = os.path.join(export_folder, unique_name)
-
-                        self.exported_files_mapper[self.data_id][
-                            file_name
-                        ] = unique_name
-
-                        shutil.move(file_name, export_path)
-                    else:
-                        # If JSON, save to MongoDB
-                        updates = {}
-                        for obj in iterjson(line):
-                            for key, val in obj.items():
-                                if key.startswith("proc."):
-                                    if key == "proc.error":
-                                        process_error.append(val)
-                                        if not process_rc:
-                                            process_rc = 1
-                                            updates["process_rc"] = process_rc
-                                        updates["process_error"] = process_error
-                                        updates["status"] = DATA_META["STATUS_ERROR"]
-                                    elif key == "proc.warning":
-                                        process_warning.append(val)
-                                        updates["process_warning"] = process_warning
-                                    elif key == "proc.info":
-                                        process_info.append(val)
-                                        updates["process_info"] = process_info
-                                    elif key == "proc.rc":
-                                        process_rc = int(val)
-                                        updates["process_rc"] = process_rc
-                                        if process_rc != 0:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Process's output: {}".format(text.strip()))
+
+                if not PROTOCOL_LINE_RE.search(text):
+                    # Fast path: chunk contains only log lines.
+                    log_file.write(text)
+                    text = ""
+
+                updates = {}
+                for line in iterlines(text):
+                    stripped = line.strip()
+                    try:
+                        if stripped.startswith("run"):
+                            # Save process and spawn if no errors
+                            log_file.write(line)
+
+                            for obj in iterjson(stripped[3:].strip()):
+                                spawn_processes.append(obj)
+                        elif stripped.startswith("export"):
+                            file_name = stripped[6:].strip()
+
+                            export_folder = SETTINGS["FLOW_EXECUTOR"]["UPLOAD_DIR"]
+                            unique_name = "export_{}".format(uuid.uuid4().hex)
+                            export_path = os.path.join(export_folder, unique_name)
+
+                            self.exported_files_mapper[self.data_id][
+                                file_name
+                            ] = unique_name
+
+                            mechanism = transfer_file(file_name, export_path, move=True)
+                            self.file_transfers[mechanism] += 1
+                            logger.debug(
+                                "Exported file '{}' using {}.".format(
+                                    file_name, mechanism
+                                )
+                            )
+                        elif line.startswith("{"):
+                            # If JSON, save to MongoDB
+                            for obj in iterjson(line):
+                                for key, val in obj.items():
+                                    if key.startswith("proc."):
+                                        if key == "proc.error":
+                                            process_error.extend(as_list(val))
+                                            if not process_rc:
+                                                process_rc = 1
+                                                updates["process_rc"] = process_rc
+                                            updates["process_error"] = process_error
                                             updates["status"] = DATA_META[
                                                 "STATUS_ERROR"
                                             ]
-                                    elif key == "proc.progress":
-                                        process_progress = int(float(val) * 100)
-                                        updates["process_progress"] = process_progress
-                                else:
-                                    output[key] = val
-                                    updates["output"] = output
-
-                        if updates:
-                            await self.update_data_status(**updates)
-                            # Process meta fields are collected in listener, so we can clear them.
-                            process_error, process_warning, process_info = [], [], []
-
-                        if process_rc > 0:
-                            log_file.close()
-                            json_file.close()
-                            await self._send_manager_command(
-                                ExecutorProtocol.FINISH,
-                                extra_fields={
-                                    ExecutorProtocol.FINISH_PROCESS_RC: process_rc
-                                },
-                            )
-                            return
+                                        elif key == "proc.warning":
+                                            process_warning.extend(as_list(val))
+                                            updates["process_warning"] = process_warning
+                                        elif key == "proc.info":
+                                            process_info.extend(as_list(val))
+                                            updates["process_info"] = process_info
+                                        elif key == "proc.rc":
+                                            process_rc = int(val)
+                                            updates["process_rc"] = process_rc
+                                            if process_rc != 0:
+                                                updates["status"] = DATA_META[
+                                                    "STATUS_ERROR"
+                                                ]
+                                        elif key == "proc.progress":
+                                            process_progress = int(float(val) * 100)
+                                            updates[
+                                                "process_progress"
+                                            ] = process_progress
+                                    else:
+                                        output[key] = val
+                                        updates["output"] = output
+
+                            if process_rc > 0:
+                                if updates:
+                                    await self.update_data_status(**updates)
+                                log_file.close()
+                                json_file.close()
+                                self.timings["run"] = time.time() - run_start_time
+                                return {ExecutorProtocol.FINISH_PROCESS_RC: process_rc}
+
+                            # Debug output
+                            # Not referenced in Data object
+                            json_file.write(line)
+                        else:
+                            log_file.write(line)
+
+                    except ValueError:
+                        # Ignore if not JSON
+                        log_file.write(line)
 
-                        # Debug output
-                        # Not referenced in Data object
-                        json_file.write(line)
-                        json_file.flush()
+                # Updates of all lines in the chunk are sent together.
+                if updates:
+                    await self.update_data_status(**updates)
+                    # Process meta fields are collected in listener, so we can clear them.
+                    process_error, process_warning, process_info = [], [], []
 
-                except ValueError:
-                    # Ignore if not JSON
-                    log_file.write(line)
+                if time.monotonic() - last_flush >= OUTPUT_FLUSH_INTERVAL:
                     log_file.flush()
+                    json_file.flush()
+                    last_flush = time.monotonic()
 
         except MemoryError as ex:
             logger.error("Out of memory:\n\n{}".format(ex))
@@ -272,11 +389,13 @@ class BaseFlowExecutor:
             # TODO: if ex.errno == 28: no more free space
             raise ex
         finally:
+            reader.cancel()
             # Store results
             log_file.close()
             json_file.close()
 
         return_code = await self.end()
+        self.timings["run"] = time.time() - run_start_time
 
         if process_rc < return_code:
             process_rc = return_code
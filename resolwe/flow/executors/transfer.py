@@ -0,0 +1,76 @@
+""".. Ignore pydocstyle D400.
+
+==============
+File Transfers
+==============
+
+Files are transferred between directories with the cheapest available
+mechanism. A file is renamed if the source may be removed, otherwise it
+is hard linked or cloned with a reflink (``FICLONE``) on file systems
+that support it. Only if none of these succeeds, the file is copied.
+
+The module only depends on the standard library, as it is also linked
+into the Python process runtime (``resolwe.process.transfer``), which
+imports files with it.
+
+.. autofunction:: resolwe.flow.executors.transfer.transfer_file
+
+"""
+import fcntl
+import os
+import shutil
+
+#: The ``FICLONE`` ioctl request number, ``_IOW(0x94, 9, int)``.
+FICLONE = 0x40049409
+
+TRANSFER_RENAME = "rename"
+TRANSFER_HARDLINK = "hardlink"
+TRANSFER_REFLINK = "reflink"
+TRANSFER_COPY = "copy"
+
+
+def reflink(src, dst):
+    """Clone the file, so that both files share their data blocks."""
+    with open(src, "rb") as source, open(dst, "xb") as destination:
+        try:
+            fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+        except OSError:
+            os.remove(dst)
+            raise
+
+
+def transfer_file(src, dst, move=False):
+    """Transfer the file to the destination path.
+
+    :param src: The path of the source file.
+    :param dst: The path of the destination, which must not exist.
+    :param move: If ``True``, the source file is removed.
+    :return: The used mechanism, one of ``rename``, ``hardlink``,
+        ``reflink`` or ``copy``.
+    """
+    if move:
+        try:
+            os.rename(src, dst)
+            return TRANSFER_RENAME
+        except OSError:
+            pass
+
+        if os.path.isdir(src):
+            shutil.move(src, dst)
+            return TRANSFER_COPY
+
+    try:
+        os.link(src, dst)
+        mechanism = TRANSFER_HARDLINK
+    except OSError:
+        try:
+            reflink(src, dst)
+            mechanism = TRANSFER_REFLINK
+        except OSError:
+            shutil.copy2(src, dst)
+            mechanism = TRANSFER_COPY
+
+    if move:
+        os.remove(src)
+
+    return mechanism
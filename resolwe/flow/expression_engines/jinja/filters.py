@@ -44,8 +44,8 @@ def input_(data, field_path):
 
     inputs = copy.deepcopy(data_obj.input)
     # XXX: Optimize by hydrating only the required field (major refactoring).
-    hydrate_input_references(inputs, data_obj.process.input_schema)
-    hydrate_input_uploads(inputs, data_obj.process.input_schema)
+    hydrate_input_references(inputs, data_obj.process.compiled_input_schema)
+    hydrate_input_uploads(inputs, data_obj.process.compiled_input_schema)
 
     return dict_dot(inputs, field_path)
 
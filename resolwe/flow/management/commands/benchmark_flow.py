@@ -0,0 +1,391 @@
+""".. Ignore pydocstyle D400.
+
+=========================
+Flow Throughput Benchmark
+=========================
+
+Command to run on local machine::
+
+    ./manage.py benchmark_flow --jobs 100 --depth 3 --output results.json
+
+The command creates synthetic :class:`~resolwe.flow.models.Data`
+objects, runs them through the manager, connector, executor and
+listener, and reports throughput, latencies and database queries. To
+compare two versions, run the benchmark with ``--output`` on the first
+one and with ``--compare`` on the second one.
+
+"""
+import asyncio
+import json
+import random
+import time
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils.timezone import now
+
+from resolwe.__about__ import __version__
+from resolwe.flow.managers import manager
+from resolwe.flow.managers.listener import ExecutorListener
+from resolwe.flow.models import Data, Process
+from resolwe.flow.utils import metrics
+from resolwe.flow.utils.stats import percentile
+
+BENCHMARK_PROCESS_SLUG = "benchmark-job"
+
+BENCHMARK_PROCESS = {
+    "name": "Benchmark job",
+    "type": "data:benchmark:",
+    "data_name": "Benchmark job",
+    "requirements": {"expression-engine": "jinja"},
+    "input_schema": [
+        {"name": "parents", "type": "list:data:benchmark:", "required": False},
+        {"name": "lines", "type": "basic:integer", "default": 0},
+        {"name": "updates", "type": "basic:integer", "default": 0},
+        {"name": "spawn", "type": "basic:integer", "default": 0},
+    ],
+    "output_schema": [{"name": "value", "type": "basic:integer", "required": False}],
+    "run": {
+        "language": "bash",
+        "program": (
+            'for i in $(seq 1 {{ lines }}); do echo "Benchmark output line $i"; done\n'
+            'for i in $(seq 1 {{ updates }}); do echo "{\\"value\\": $i}"; done\n'
+            "for i in $(seq 1 {{ spawn }}); do\n"
+            '  echo \'run {"process": "benchmark-job", '
+            '"input": {"lines": {{ lines }}, "updates": {{ updates }}, "spawn": 0 } }\'\n'
+            "done\n"
+        ),
+    },
+}
+
+#: Percentiles reported for latencies.
+PERCENTILES = (50, 90, 99)
+
+
+def build_topology(jobs, depth, fan_out, seed=None):
+    """Generate dependencies of synthetic jobs.
+
+    Jobs are split into ``depth`` levels of (almost) equal size. Each job
+    depends on ``fan_out`` random jobs of the previous level.
+
+    :return: list of lists of indices of the jobs' parents
+    """
+    rng = random.Random(seed)
+    depth = max(1, min(depth, jobs))
+    bounds = [jobs * level // depth for level in range(depth + 1)]
+
+    topology = []
+    for level in range(depth):
+        previous = range(bounds[level - 1], bounds[level]) if level else range(0)
+        for _ in range(bounds[level], bounds[level + 1]):
+            topology.append(sorted(rng.sample(previous, min(fan_out, len(previous)))))
+
+    return topology
+
+
+def summarize(values):
+    """Summarize the values with their mean and percentiles."""
+    summary = {"count": len(values), "mean": None}
+    if values:
+        summary["mean"] = sum(values) / len(values)
+    for percent in PERCENTILES:
+        summary["p{}".format(percent)] = percentile(values, percent)
+    return summary
+
+
+def collect_metrics():
+    """Collect the current values of metrics used in the benchmark."""
+    phases = {}
+    for (phase, process, _), sample in metrics.job_phase_seconds.collect().items():
+        if process == BENCHMARK_PROCESS_SLUG:
+            count, total = phases.get(phase, (0, 0.0))
+            phases[phase] = (count + sample["count"], total + sample["sum"])
+
+    return {
+        "packets": {
+            command: sample["count"]
+            for (command,), sample in metrics.listener_service_seconds.collect().items()
+        },
+        "listener_queries": {
+            command: int(value)
+            for (command,), value in metrics.listener_db_queries.collect().items()
+        },
+        "scans": sum(
+            sample["count"]
+            for sample in metrics.manager_scan_seconds.collect().values()
+        ),
+        "scan_queries": int(sum(metrics.manager_db_queries.collect().values())),
+        "phases": phases,
+    }
+
+
+def get_metrics_results(start, end, results):
+    """Compute differences of metrics during the benchmark."""
+    packets = sum(end["packets"].values()) - sum(start["packets"].values())
+    queries = {
+        command: count - start["listener_queries"].get(command, 0)
+        for command, count in end["listener_queries"].items()
+        if count - start["listener_queries"].get(command, 0)
+    }
+    queries["scan"] = end["scan_queries"] - start["scan_queries"]
+
+    phases = {}
+    for phase, (count, total) in end["phases"].items():
+        start_count, start_total = start["phases"].get(phase, (0, 0.0))
+        if count > start_count:
+            phases[phase] = {
+                "count": count - start_count,
+                "mean_seconds": (total - start_total) / (count - start_count),
+            }
+
+    duration = results["run_seconds"]
+    return {
+        "packets": packets,
+        "packets_per_second": packets / duration if duration else None,
+        "scans": end["scans"] - start["scans"],
+        "queries": queries,
+        "phases": phases,
+    }
+
+
+class Command(BaseCommand):
+    """Benchmark throughput of the flow."""
+
+    help = "Run synthetic jobs through the flow and measure its throughput."
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument(
+            "--jobs", type=int, default=100, help="Number of data objects to create"
+        )
+        parser.add_argument(
+            "--depth", type=int, default=1, help="Number of levels of dependencies"
+        )
+        parser.add_argument(
+            "--fan-out",
+            type=int,
+            default=1,
+            help="Number of inputs of each data object from the previous level",
+        )
+        parser.add_argument(
+            "--spawn", type=int, default=0, help="Number of processes each job spawns"
+        )
+        parser.add_argument(
+            "--lines", type=int, default=0, help="Number of lines each job prints"
+        )
+        parser.add_argument(
+            "--updates", type=int, default=0, help="Number of updates each job sends"
+        )
+        parser.add_argument("--seed", type=int, help="Seed of the random generator")
+        parser.add_argument("--executor", help="Use the given executor")
+        parser.add_argument(
+            "--external-listener",
+            action="store_true",
+            help="Use an already running listener instead of starting one",
+        )
+        parser.add_argument("--output", help="Store results to the given JSON file")
+        parser.add_argument(
+            "--compare", help="Compare results with the given JSON file"
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Do not delete created data objects"
+        )
+
+    def get_process(self, contributor):
+        """Create or update the benchmark process."""
+        process, _ = Process.objects.update_or_create(
+            slug=BENCHMARK_PROCESS_SLUG,
+            version="1.0.0",
+            defaults=dict(BENCHMARK_PROCESS, contributor=contributor),
+        )
+        return process
+
+    def create_data(self, process, contributor, options):
+        """Create data objects of the benchmark."""
+        topology = build_topology(
+            options["jobs"], options["depth"], options["fan_out"], options["seed"]
+        )
+        inputs = {
+            "lines": options["lines"],
+            "updates": options["updates"],
+            "spawn": options["spawn"],
+        }
+
+        # The manager is triggered once all objects are created.
+        data_ids = []
+        with override_settings(FLOW_MANAGER_DISABLE_AUTO_CALLS=True):
+            for index, parents in enumerate(topology):
+                data = Data.objects.create(
+                    name="Benchmark job {}".format(index),
+                    process=process,
+                    contributor=contributor,
+                    input=dict(inputs, parents=[data_ids[i] for i in parents]),
+                )
+                data_ids.append(data.pk)
+
+    def run_benchmark(self, options):
+        """Create data objects, process them and return the results."""
+        contributor = (
+            get_user_model().objects.filter(is_superuser=True).order_by("date_joined")
+        ).first()
+        if contributor is None:
+            raise CommandError("Admin does not exist: create a superuser")
+
+        process = self.get_process(contributor)
+        metrics_start = collect_metrics()
+        start_datetime = now()
+        start = time.time()
+
+        self.create_data(process, contributor, options)
+        created = time.time()
+
+        async_to_sync(manager.communicate)(run_sync=True)
+        finished = time.time()
+
+        metrics_end = collect_metrics()
+        queryset = Data.objects.filter(
+            process__slug=BENCHMARK_PROCESS_SLUG, created__gte=start_datetime
+        )
+        results = self.get_results(queryset, start, created, finished)
+        results.update(get_metrics_results(metrics_start, metrics_end, results))
+
+        if not options["keep"]:
+            queryset.delete()
+
+        return results
+
+    def get_results(self, queryset, start, created, finished):
+        """Compute throughput and latencies of processed data objects."""
+        queue, run, turnaround = [], [], []
+        statuses = {}
+        for data in queryset.only(
+            "status", "created", "scheduled", "started", "finished"
+        ):
+            statuses[data.status] = statuses.get(data.status, 0) + 1
+            if data.started and data.scheduled:
+                queue.append((data.started - data.scheduled).total_seconds())
+            if data.started and data.finished:
+                run.append((data.finished - data.started).total_seconds())
+            if data.finished:
+                turnaround.append(
+                    data.finished.timestamp() - max(data.created.timestamp(), created)
+                )
+
+        jobs = sum(statuses.values())
+        duration = finished - created
+        return {
+            "jobs": jobs,
+            "statuses": statuses,
+            "create_seconds": created - start,
+            "run_seconds": duration,
+            "jobs_per_second": jobs / duration if duration else None,
+            "latency": {
+                "queue": summarize(queue),
+                "run": summarize(run),
+                "turnaround": summarize(turnaround),
+            },
+        }
+
+    def print_results(self, results, previous=None):
+        """Print the results and their changes since the previous run."""
+
+        def change(value, key):
+            """Format the relative change of the value since the previous run."""
+            if not previous or not previous.get(key) or value is None:
+                return ""
+            return " ({:+.1%})".format(value / previous[key] - 1)
+
+        self.stdout.write(
+            "{jobs} jobs in {run_seconds:.2f} s".format(**results)
+            + ", {:.2f} jobs/s".format(results["jobs_per_second"] or 0)
+            + change(results["jobs_per_second"], "jobs_per_second")
+        )
+        self.stdout.write(
+            "{:.2f} packets/s".format(results["packets_per_second"] or 0)
+            + change(results["packets_per_second"], "packets_per_second")
+        )
+        for name, summary in results["latency"].items():
+            self.stdout.write(
+                "{:<11} ".format(name + ":")
+                + ", ".join(
+                    "p{} {:.3f} s".format(percent, summary["p{}".format(percent)])
+                    for percent in PERCENTILES
+                    if summary["p{}".format(percent)] is not None
+                )
+            )
+        for phase, stats in sorted(results["phases"].items()):
+            self.stdout.write(
+                "{:<15} mean {:.3f} s".format(phase + ":", stats["mean_seconds"])
+            )
+        for phase, count in sorted(results["queries"].items()):
+            self.stdout.write("{:<15} {} queries".format(phase + ":", count))
+
+    def handle(self, *args, **options):
+        """Run the benchmark."""
+        if options["jobs"] < 1:
+            raise CommandError("At least one job is required.")
+
+        previous = None
+        if options["compare"]:
+            with open(options["compare"]) as handle:
+                previous = json.load(handle)
+
+        overrides = {}
+        if options["executor"]:
+            overrides["FLOW_EXECUTOR"] = dict(
+                getattr(settings, "FLOW_EXECUTOR", {}), NAME=options["executor"]
+            )
+
+        with override_settings(**overrides):
+            if options["external_listener"]:
+                results = self.run_benchmark(options)
+            else:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                try:
+                    results = loop.run_until_complete(self._run_with_listener(options))
+                finally:
+                    loop.close()
+
+        results = {
+            "version": __version__,
+            "timestamp": time.time(),
+            "parameters": {
+                name: options[name]
+                for name in (
+                    "jobs",
+                    "depth",
+                    "fan_out",
+                    "spawn",
+                    "lines",
+                    "updates",
+                    "seed",
+                    "executor",
+                )
+            },
+            **results,
+        }
+
+        self.print_results(results, previous)
+
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+
+    async def _run_with_listener(self, options):
+        """Run the benchmark with a listener in the same process."""
+        listener = ExecutorListener(
+            redis_params=getattr(settings, "FLOW_MANAGER", {}).get(
+                "REDIS_CONNECTION", {}
+            )
+        )
+        async with listener:
+            try:
+                return await database_sync_to_async(self.run_benchmark)(options)
+            finally:
+                listener.terminate()
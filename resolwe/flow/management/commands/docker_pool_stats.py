@@ -0,0 +1,47 @@
+""".. Ignore pydocstyle D400.
+
+===========================
+Docker Container Pool Stats
+===========================
+
+"""
+from collections import defaultdict
+
+import redis
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from resolwe.flow.managers import state
+
+
+class Command(BaseCommand):
+    """Show hit rates of the Docker executor's warm container pool."""
+
+    help = "Show hit rates of the Docker executor's warm container pool."
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument("--reset", action="store_true", help="Reset the statistics")
+
+    def handle(self, *args, **options):
+        """Print the number of pool hits and misses per image."""
+        conn = redis.StrictRedis(
+            **getattr(settings, "FLOW_EXECUTOR", {}).get("REDIS_CONNECTION", {})
+        )
+
+        counts = defaultdict(lambda: {"hits": 0, "misses": 0})
+        for field, value in conn.hgetall(state.MANAGER_DOCKER_POOL_STATS).items():
+            kind, image = field.decode("utf-8").split(":", 1)
+            counts[image][kind] = int(value)
+
+        for image, count in sorted(counts.items()):
+            total = count["hits"] + count["misses"]
+            self.stdout.write(
+                "{}: {} hits, {} misses, {:.1%} hit rate".format(
+                    image, count["hits"], count["misses"], count["hits"] / total
+                )
+            )
+
+        if options["reset"]:
+            conn.delete(state.MANAGER_DOCKER_POOL_STATS)
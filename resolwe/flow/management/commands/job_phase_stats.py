@@ -0,0 +1,40 @@
+""".. Ignore pydocstyle D400.
+
+==========================
+Job Lifecycle Phase Timing
+==========================
+
+"""
+from django.core.management.base import BaseCommand
+
+from resolwe.flow.utils.metrics import job_phase_seconds, job_phase_stats
+
+
+class Command(BaseCommand):
+    """Show durations of job lifecycle phases."""
+
+    help = "Show durations of job lifecycle phases per process and scheduling class."
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument("--process", help="Only show phases of the given process")
+        parser.add_argument("--reset", action="store_true", help="Reset the statistics")
+
+    def handle(self, *args, **options):
+        """Print statistics of job lifecycle phases."""
+        self.stdout.write(
+            "{:<30} {:<3} {:<15} {:>8} {:>10} {:>8} {:>8} {:>8}".format(
+                "process", "sc", "phase", "count", "mean", "p50", "p90", "p99"
+            )
+        )
+        for stats in job_phase_stats():
+            if options["process"] and stats["process"] != options["process"]:
+                continue
+
+            self.stdout.write(
+                "{process:<30} {scheduling_class:<3} {phase:<15} {count:>8} "
+                "{mean:>10.3f} {p50:>8} {p90:>8} {p99:>8}".format(**stats)
+            )
+
+        if options["reset"]:
+            job_phase_seconds.reset()
@@ -12,6 +12,7 @@ import operator
 import shlex
 import subprocess
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 
@@ -28,6 +29,9 @@ logger = logging.getLogger(__name__)
 PULLED_IMAGES = set()
 PULLED_IMAGES_LOCK = threading.Lock()
 
+# Default number of images pulled in parallel.
+DEFAULT_PULL_WORKERS = 4
+
 
 class Command(BaseCommand):
     """List Docker images used by processes.  Optionally also pull them."""
@@ -56,6 +60,102 @@ class Command(BaseCommand):
             action="store_true",
             help="Don't fail whenever a Docker image can't be pulled",
         )
+        parser.add_argument(
+            "--workers",
+            dest="workers",
+            type=int,
+            default=getattr(settings, "FLOW_DOCKER_PULL_WORKERS", DEFAULT_PULL_WORKERS),
+            help="Number of images pulled in parallel",
+        )
+        parser.add_argument(
+            "--prune",
+            dest="prune",
+            default=False,
+            action="store_true",
+            help="With --pull, remove local versions of used images that are not "
+            "used anymore",
+        )
+
+    def _docker(self, *args):
+        """Run a Docker command and return its return code and output."""
+        docker = getattr(settings, "FLOW_DOCKER_COMMAND", "docker")
+        result = subprocess.run(
+            shlex.split(docker) + list(args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        return result.returncode, result.stdout
+
+    def _image_id(self, image):
+        """Return the id (digest) of a local image or ``None`` if missing."""
+        returncode, output = self._docker(
+            "image", "inspect", "--format", "{{.Id}}", image
+        )
+        return output.strip() if returncode == 0 else None
+
+    def pull_image(self, image):
+        """Pull the image unless it is pinned by digest and present.
+
+        :return: tuple of the image, the return code and output of the
+            pull command and a flag, telling if the image changed
+        """
+        old_id = self._image_id(image)
+        if old_id and "@" in image:
+            # Images referenced by digest never change.
+            return image, 0, "", False
+
+        returncode, output = self._docker("pull", image)
+        if returncode != 0:
+            return image, returncode, output, False
+
+        return image, returncode, output, self._image_id(image) != old_id
+
+    def prune_images(self, images, verbosity):
+        """Remove local images of used repositories with unused tags.
+
+        Repositories of images pinned by digest are not pruned, as their
+        tags may point to the pinned images.
+        """
+
+        def split_tag(image):
+            """Split image into repository and tag."""
+            repository, _, tag = image.partition("@")[0].rpartition(":")
+            if not repository or "/" in tag:
+                # Image without a tag (colon belongs to registry's port).
+                return image.partition("@")[0], "latest"
+            return repository, tag
+
+        pinned_repositories = {split_tag(image)[0] for image in images if "@" in image}
+        images = {split_tag(image) for image in images if "@" not in image}
+        used_repositories = {
+            repository for repository, _ in images
+        } - pinned_repositories
+
+        returncode, output = self._docker(
+            "image", "ls", "--format", "{{.Repository}}:{{.Tag}}"
+        )
+        if returncode != 0:
+            raise CommandError("Failed to list Docker images:\n{}".format(output))
+
+        for image in output.split():
+            repository, tag = split_tag(image)
+            if repository not in used_repositories or (repository, tag) in images:
+                continue
+            if tag == "<none>":
+                continue
+
+            returncode, output = self._docker("image", "rm", image)
+            if returncode != 0:
+                # Image may still be used by a container.
+                logger.warning(
+                    "Failed to remove Docker image '{}': {}".format(image, output)
+                )
+            else:
+                msg = "Docker image '{}' removed.".format(image)
+                logger.info(msg)
+                if verbosity > 0:
+                    self.stdout.write(msg)
 
     def handle(self, *args, **options):
         """Handle command list_docker_images."""
@@ -82,41 +182,45 @@ class Command(BaseCommand):
 
         # Pull images if requested or just output the list in specified format
         if options["pull"]:
+            used_docker_images = set(unique_docker_images)
+
             # Remove set of already pulled images.
             with PULLED_IMAGES_LOCK:
                 unique_docker_images.difference_update(PULLED_IMAGES)
 
-            # Get the desired 'docker' command from settings or use the default
-            docker = getattr(settings, "FLOW_DOCKER_COMMAND", "docker")
-
-            # Pull each image
-            for img in unique_docker_images:
-                ret = subprocess.call(
-                    shlex.split("{} pull {}".format(docker, img)),
-                    stdout=None if verbosity > 0 else subprocess.DEVNULL,
-                    stderr=None if verbosity > 0 else subprocess.DEVNULL,
-                )
+            # Pull images in parallel.
+            with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+                results = list(pool.map(self.pull_image, sorted(unique_docker_images)))
 
+            for img, ret, output, changed in results:
                 # Update set of pulled images.
                 with PULLED_IMAGES_LOCK:
                     PULLED_IMAGES.add(img)
 
+                if verbosity > 1 and output:
+                    self.stdout.write(output, ending="")
+
                 if ret != 0:
                     errmsg = "Failed to pull Docker image '{}'!".format(img)
 
                     if not options["ignore_pull_errors"]:
                         # Print error and stop execution
-                        raise CommandError(errmsg)
+                        raise CommandError("\n".join([errmsg, output]))
                     else:
                         # Print error, but keep going
                         logger.error(errmsg)
                         if verbosity > 0:
                             self.stderr.write(errmsg)
                 else:
-                    msg = "Docker image '{}' pulled successfully!".format(img)
+                    msg = "Docker image '{}' {}!".format(
+                        img, "pulled successfully" if changed else "is up to date"
+                    )
                     logger.info(msg)
                     if verbosity > 0:
                         self.stdout.write(msg)
+
+            if options["prune"]:
+                self.prune_images(used_docker_images, verbosity)
         else:
             # Sort the set of unique Docker images for nicer output.
             unique_docker_images = sorted(unique_docker_images)
@@ -7,7 +7,7 @@ Delete Unreferenced Files
 """
 from django.core.management.base import BaseCommand
 
-from resolwe.flow.utils.purge import purge_all
+from resolwe.flow.utils.purge import DEFAULT_PURGE_WORKERS, purge_all
 
 
 class Command(BaseCommand):
@@ -23,7 +23,26 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete unreferenced files and storages",
         )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=DEFAULT_PURGE_WORKERS,
+            help="Number of data locations purged in parallel",
+        )
 
     def handle(self, *args, **options):
         """Call :func:`~resolwe.flow.utils.purge.purge_all`."""
-        purge_all(delete=options["force"], verbosity=options["verbosity"])
+        report = purge_all(
+            delete=options["force"],
+            verbosity=options["verbosity"],
+            workers=options["workers"],
+        )
+        self.stdout.write(
+            "{} {} bytes in {} files from {} data locations.".format(
+                "Reclaimed" if options["force"] else "Purge would reclaim",
+                report["bytes"],
+                report["files"],
+                report["locations"],
+            )
+        )
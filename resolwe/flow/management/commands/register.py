@@ -5,27 +5,37 @@ Register Processes
 ==================
 
 """
+import hashlib
+import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 import jsonschema
 import yaml
+from redis.exceptions import RedisError
 from versionfield.utils import convert_version_string_to_int
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand
-from django.db.models import Max, Q
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
 
+from resolwe.__about__ import __version__
 from resolwe.flow.engine import InvalidEngineError
 from resolwe.flow.finders import get_finders
-from resolwe.flow.managers import manager
+from resolwe.flow.managers import manager, state
 from resolwe.flow.models import DescriptorSchema, Process
 from resolwe.flow.models.base import VERSION_NUMBER_BITS
 from resolwe.flow.models.utils import validate_schema, validation_schema
 from resolwe.flow.utils import dict_dot, iterate_schema
-from resolwe.permissions.utils import assign_contributor_permissions, copy_permissions
+from resolwe.permissions.utils import (
+    bulk_assign_contributor_permissions,
+    bulk_copy_permissions,
+)
 
 PROCESSOR_SCHEMA = validation_schema("processor")
 DESCRIPTOR_SCHEMA = validation_schema("descriptor")
@@ -33,6 +43,44 @@ DESCRIPTOR_SCHEMA = validation_schema("descriptor")
 SCHEMA_TYPE_DESCRIPTOR = "descriptor"
 SCHEMA_TYPE_PROCESS = "process"
 
+#: Number of objects inserted or updated in a single query.
+REGISTER_BATCH_SIZE = 500
+
+#: Version of the format of cached schemas, increase it when parsing of
+#: schema files changes.
+REGISTER_CACHE_VERSION = 1
+
+#: Number of seconds the schema cache is kept after its last update.
+REGISTER_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def discover_schemas(schema_file, schema_type):
+    """Discover schemas of the given type in the file.
+
+    The function is run in worker processes, so it must not access the
+    database or write to the command's output.
+
+    :return: tuple of the list of discovered schemas and an error
+        message or ``None``
+    """
+    if schema_type == SCHEMA_TYPE_DESCRIPTOR:
+        if not schema_file.lower().endswith((".yml", ".yaml")):
+            return [], None
+
+        with open(schema_file) as fn:
+            schemas = yaml.load(fn, Loader=yaml.FullLoader)
+        if not schemas:
+            return [], "Could not read YAML file {}".format(schema_file)
+
+        return [schema for schema in schemas if "schema" in schema], None
+
+    # Perform process discovery for all supported execution engines.
+    schemas = []
+    for execution_engine in manager.execution_engines.values():
+        schemas.extend(execution_engine.discover_process(schema_file))
+
+    return schemas, None
+
 
 class Command(BaseCommand):
     """Register processes."""
@@ -53,6 +101,17 @@ class Command(BaseCommand):
             action="store_true",
             help="retire obsolete processes",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="number of processes parsing schema files",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="parse all schema files, including unchanged ones",
+        )
 
     def valid(self, instance, schema):
         """Validate schema."""
@@ -87,57 +146,204 @@ class Command(BaseCommand):
 
     def find_descriptor_schemas(self, schema_file):
         """Find descriptor schemas in given path."""
-        if not schema_file.lower().endswith((".yml", ".yaml")):
-            return []
-
-        with open(schema_file) as fn:
-            schemas = yaml.load(fn, Loader=yaml.FullLoader)
-        if not schemas:
-            self.stderr.write("Could not read YAML file {}".format(schema_file))
-            return []
-
-        descriptor_schemas = []
-        for schema in schemas:
-            if "schema" not in schema:
-                continue
-
-            descriptor_schemas.append(schema)
+        schemas, error = discover_schemas(schema_file, SCHEMA_TYPE_DESCRIPTOR)
+        if error:
+            self.stderr.write(error)
 
-        return descriptor_schemas
-
-    def find_schemas(self, schema_path, schema_type=SCHEMA_TYPE_PROCESS, verbosity=1):
-        """Find schemas in packages that match filters."""
-        schema_matches = []
+        return schemas
 
+    def find_files(self, schema_path, verbosity=1):
+        """Find files in the given path."""
         if not os.path.isdir(schema_path):
             if verbosity > 0:
                 self.stdout.write("Invalid path {}".format(schema_path))
-            return
+            return []
+
+        return [
+            os.path.join(root, fn)
+            for root, _, files in os.walk(schema_path)
+            for fn in files
+        ]
 
+    def find_schemas(self, schema_path, schema_type=SCHEMA_TYPE_PROCESS, verbosity=1):
+        """Find schemas in packages that match filters."""
         if schema_type not in [SCHEMA_TYPE_PROCESS, SCHEMA_TYPE_DESCRIPTOR]:
             raise ValueError("Invalid schema type")
 
-        for root, _, files in os.walk(schema_path):
-            for schema_file in [os.path.join(root, fn) for fn in files]:
-                schemas = None
-                if schema_type == SCHEMA_TYPE_DESCRIPTOR:
-                    # Discover descriptors.
-                    schemas = self.find_descriptor_schemas(schema_file)
-                elif schema_type == SCHEMA_TYPE_PROCESS:
-                    # Perform process discovery for all supported execution engines.
-                    schemas = []
-                    for execution_engine in manager.execution_engines.values():
-                        schemas.extend(execution_engine.discover_process(schema_file))
+        files = [
+            (schema_file, schema_type)
+            for schema_file in self.find_files(schema_path, verbosity)
+        ]
+        return [schema for schemas in self.discover(files) for schema in schemas]
+
+    def discover(self, files, workers=1, use_cache=True):
+        """Discover schemas in the given files.
+
+        Files are parsed in parallel by ``workers`` processes. Schemas in
+        files which did not change since the previous run are loaded from
+        the cache instead. Cached schemas are only used with the same
+        version of Resolwe and the same execution engines.
+
+        :param files: list of ``(path, schema type)`` tuples
+        :return: list of lists of schemas in the given files
+        """
+        cache_scope = "{}:{}:{}".format(
+            __version__,
+            REGISTER_CACHE_VERSION,
+            ",".join(sorted(manager.execution_engines)),
+        ).encode("utf-8")
+        fields, digests = [], []
+        for schema_file, schema_type in files:
+            digest = hashlib.sha256(cache_scope)
+            with open(schema_file, "rb") as fn:
+                digest.update(fn.read())
+            fields.append("{}:{}".format(schema_type, schema_file))
+            digests.append(digest.hexdigest())
+
+        results = {}
+        if use_cache and files:
+            try:
+                cached = manager.state.redis.hmget(state.MANAGER_REGISTER_CACHE, fields)
+            except RedisError:
+                self.stderr.write("Unable to read the schema cache")
+                cached, use_cache = [], False
+
+            for index, entry in enumerate(cached):
+                if entry is not None:
+                    entry = json.loads(entry.decode("utf-8"))
+                    if entry["digest"] == digests[index]:
+                        results[index] = entry["schemas"]
+
+        missing = [index for index in range(len(files)) if index not in results]
+        if workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parsed = list(
+                    executor.map(
+                        discover_schemas,
+                        *zip(*(files[index] for index in missing)),
+                        chunksize=max(1, len(missing) // (workers * 4)),
+                    )
+                )
+        else:
+            parsed = [discover_schemas(*files[index]) for index in missing]
+
+        updates = {}
+        for index, (schemas, error) in zip(missing, parsed):
+            results[index] = schemas
+            if error:
+                self.stderr.write(error)
+                continue
+
+            try:
+                updates[fields[index]] = json.dumps(
+                    {"digest": digests[index], "schemas": schemas}
+                )
+            except TypeError:
+                # Schemas which cannot be stored are parsed every time.
+                pass
+
+        if use_cache and updates:
+            try:
+                pipeline = manager.state.redis.pipeline()
+                pipeline.hmset(state.MANAGER_REGISTER_CACHE, updates)
+                # Entries of removed files are dropped when the cache expires.
+                pipeline.expire(state.MANAGER_REGISTER_CACHE, REGISTER_CACHE_TIMEOUT)
+                pipeline.execute()
+            except RedisError:
+                self.stderr.write("Unable to update the schema cache")
+
+        return [results[index] for index in range(len(files))]
+
+    def save_schemas(self, model, schemas, user, force=False, verbosity=1):
+        """Insert new and update existing schemas in bulk.
+
+        Versions of all existing objects are loaded with a single query.
+
+        :param model: :class:`~resolwe.flow.models.Process` or
+            :class:`~resolwe.flow.models.DescriptorSchema`
+        :param schemas: list of ``(slug, version, fields)`` tuples
+        :return: list of log messages
+        """
+        name = {Process: "processor", DescriptorSchema: "descriptor schema"}[model]
+
+        # Newest versions of slugs and objects of existing versions.
+        latest, existing = {}, {}
+        for pk, slug, version in model.objects.values_list("pk", "slug", "version"):
+            int_version = convert_version_string_to_int(
+                str(version), VERSION_NUMBER_BITS
+            )
+            existing[slug, int_version] = pk
+            if slug not in latest or latest[slug][0] < int_version:
+                latest[slug] = (int_version, pk)
+
+        log = []
+        inserts, permission_sources, updates = [], [], {}
+        name_max_len = model._meta.get_field("name").max_length
+        for slug, version, fields in schemas:
+            int_version = convert_version_string_to_int(version, VERSION_NUMBER_BITS)
+            latest_version, latest_pk = latest.get(slug, (None, None))
+
+            # `latest version` is stored as `int` so it has to be compared to `int_version`
+            if latest_version is not None and latest_version > int_version:
+                self.stderr.write(
+                    "Skip {} {}: newer version installed".format(name, slug)
+                )
+                continue
+
+            if (slug, int_version) in existing:
+                if not force:
+                    if verbosity > 0:
+                        self.stdout.write(
+                            "Skip {} {}: same version installed".format(name, slug)
+                        )
+                    continue
+
+                target = existing[slug, int_version]
+                if isinstance(target, model):
+                    # The object is inserted in this run.
+                    for key, value in fields.items():
+                        setattr(target, key, value)
+                else:
+                    updates[target] = fields
+                log.append("Updated {}".format(slug))
+            else:
+                obj = model(contributor=user, **fields)
+                if len(obj.name) > name_max_len:
+                    obj.name = obj.name[: (name_max_len - 3)] + "..."
+                inserts.append(obj)
+                # Permissions are copied from the latest existing version.
+                permission_sources.append(
+                    model(pk=latest_pk) if latest_pk is not None else None
+                )
+                existing[slug, int_version] = obj
+                latest[slug] = (int_version, latest_pk)
+                log.append("Inserted {}".format(slug))
+
+        with transaction.atomic():
+            if updates:
+                objs = list(model.objects.filter(pk__in=updates.keys()))
+                update_fields = {"modified"}
+                for obj in objs:
+                    for key, value in updates[obj.pk].items():
+                        setattr(obj, key, value)
+                        update_fields.add(key)
+                    obj.modified = now()
+                model.objects.bulk_update(
+                    objs, sorted(update_fields), batch_size=REGISTER_BATCH_SIZE
+                )
 
-                for schema in schemas:
-                    schema_matches.append(schema)
+            if inserts:
+                model.objects.bulk_create(inserts, batch_size=REGISTER_BATCH_SIZE)
+                bulk_assign_contributor_permissions(inserts)
+                bulk_copy_permissions(zip(permission_sources, inserts))
 
-        return schema_matches
+        return log
 
     def register_processes(self, process_schemas, user, force=False, verbosity=1):
         """Read and register processors."""
-        log_processors = []
         log_templates = []
+        valid_schemas = []
+        descriptor_slugs = set(DescriptorSchema.objects.values_list("slug", flat=True))
 
         for p in process_schemas:
             # TODO: Remove this when all processes are migrated to the
@@ -190,9 +396,7 @@ class Command(BaseCommand):
                 p["entity_always_create"] = p["entity"].get("always_create", False)
                 p.pop("entity")
 
-                if not DescriptorSchema.objects.filter(
-                    slug=p["entity_descriptor_schema"]
-                ).exists():
+                if p["entity_descriptor_schema"] not in descriptor_slugs:
                     self.stderr.write(
                         "Skip processor {}: Unknown descriptor schema '{}' used in 'entity' "
                         "field.".format(p["slug"], p["entity_descriptor_schema"])
@@ -263,42 +467,11 @@ class Command(BaseCommand):
                 except KeyError:
                     pass
 
-            version = p["version"]
-            int_version = convert_version_string_to_int(version, VERSION_NUMBER_BITS)
-
-            # `latest version` is returned as `int` so it has to be compared to `int_version`
-            latest_version = Process.objects.filter(slug=slug).aggregate(
-                Max("version")
-            )["version__max"]
-            if latest_version is not None and latest_version > int_version:
-                self.stderr.write(
-                    "Skip processor {}: newer version installed".format(slug)
-                )
-                continue
-
-            previous_process_qs = Process.objects.filter(slug=slug)
-            if previous_process_qs.exists():
-                previous_process = previous_process_qs.latest()
-            else:
-                previous_process = None
-
-            process_query = Process.objects.filter(slug=slug, version=version)
-            if process_query.exists():
-                if not force:
-                    if verbosity > 0:
-                        self.stdout.write(
-                            "Skip processor {}: same version installed".format(slug)
-                        )
-                    continue
+            valid_schemas.append((slug, p["version"], p))
 
-                process_query.update(**p)
-                log_processors.append("Updated {}".format(slug))
-            else:
-                process = Process.objects.create(contributor=user, **p)
-                assign_contributor_permissions(process)
-                if previous_process:
-                    copy_permissions(previous_process, process)
-                log_processors.append("Inserted {}".format(slug))
+        log_processors = self.save_schemas(
+            Process, valid_schemas, user, force, verbosity=verbosity
+        )
 
         if verbosity > 0:
             if log_processors:
@@ -313,7 +486,7 @@ class Command(BaseCommand):
 
     def register_descriptors(self, descriptor_schemas, user, force=False, verbosity=1):
         """Read and register descriptors."""
-        log_descriptors = []
+        valid_schemas = []
 
         for descriptor_schema in descriptor_schemas:
             for schema, _, _ in iterate_schema({}, descriptor_schema.get("schema", {})):
@@ -326,49 +499,17 @@ class Command(BaseCommand):
             if not self.valid(descriptor_schema, DESCRIPTOR_SCHEMA):
                 continue
 
-            slug = descriptor_schema["slug"]
-            version = descriptor_schema.get("version", "0.0.0")
-            int_version = convert_version_string_to_int(version, VERSION_NUMBER_BITS)
-
-            # `latest version` is returned as `int` so it has to be compared to `int_version`
-            latest_version = DescriptorSchema.objects.filter(slug=slug).aggregate(
-                Max("version")
-            )["version__max"]
-            if latest_version is not None and latest_version > int_version:
-                self.stderr.write(
-                    "Skip descriptor schema {}: newer version installed".format(slug)
+            valid_schemas.append(
+                (
+                    descriptor_schema["slug"],
+                    descriptor_schema.get("version", "0.0.0"),
+                    descriptor_schema,
                 )
-                continue
-
-            previous_descriptor_qs = DescriptorSchema.objects.filter(slug=slug)
-            if previous_descriptor_qs.exists():
-                previous_descriptor = previous_descriptor_qs.latest()
-            else:
-                previous_descriptor = None
-
-            descriptor_query = DescriptorSchema.objects.filter(
-                slug=slug, version=version
             )
-            if descriptor_query.exists():
-                if not force:
-                    if verbosity > 0:
-                        self.stdout.write(
-                            "Skip descriptor schema {}: same version installed".format(
-                                slug
-                            )
-                        )
-                    continue
 
-                descriptor_query.update(**descriptor_schema)
-                log_descriptors.append("Updated {}".format(slug))
-            else:
-                descriptor = DescriptorSchema.objects.create(
-                    contributor=user, **descriptor_schema
-                )
-                assign_contributor_permissions(descriptor)
-                if previous_descriptor:
-                    copy_permissions(previous_descriptor, descriptor)
-                log_descriptors.append("Inserted {}".format(slug))
+        log_descriptors = self.save_schemas(
+            DescriptorSchema, valid_schemas, user, force, verbosity=verbosity
+        )
 
         if log_descriptors and verbosity > 0:
             self.stdout.write("Descriptor schemas Updates:")
@@ -408,6 +549,8 @@ class Command(BaseCommand):
         """Register processes."""
         force = options.get("force")
         retire = options.get("retire")
+        workers = options.get("workers") or 1
+        use_cache = not options.get("no_cache")
         verbosity = int(options.get("verbosity"))
 
         users = (
@@ -425,19 +568,22 @@ class Command(BaseCommand):
             process_paths.extend(finder.find_processes())
             descriptor_paths.extend(finder.find_descriptors())
 
-        for proc_path in process_paths:
-            process_schemas.extend(
-                self.find_schemas(
-                    proc_path, schema_type=SCHEMA_TYPE_PROCESS, verbosity=verbosity
-                )
-            )
-
-        for desc_path in descriptor_paths:
-            descriptor_schemas.extend(
-                self.find_schemas(
-                    desc_path, schema_type=SCHEMA_TYPE_DESCRIPTOR, verbosity=verbosity
-                )
-            )
+        files = [
+            (schema_file, SCHEMA_TYPE_PROCESS)
+            for proc_path in process_paths
+            for schema_file in self.find_files(proc_path, verbosity=verbosity)
+        ] + [
+            (schema_file, SCHEMA_TYPE_DESCRIPTOR)
+            for desc_path in descriptor_paths
+            for schema_file in self.find_files(desc_path, verbosity=verbosity)
+        ]
+        for (_, schema_type), schemas in zip(
+            files, self.discover(files, workers, use_cache)
+        ):
+            if schema_type == SCHEMA_TYPE_PROCESS:
+                process_schemas.extend(schemas)
+            else:
+                descriptor_schemas.extend(schemas)
 
         user_admin = users.first()
         self.register_descriptors(
@@ -6,12 +6,14 @@ Dispatcher
 
 """
 import asyncio
+import copy
 import inspect
 import json
 import logging
 import os
 import shlex
 import shutil
+import time
 import uuid
 from contextlib import suppress
 from importlib import import_module
@@ -31,6 +33,14 @@ from django.utils.timezone import now
 from resolwe.flow.engine import InvalidEngineError, load_engines
 from resolwe.flow.execution_engines import ExecutionError
 from resolwe.flow.models import Data, DataDependency, DataLocation, Process
+from resolwe.flow.utils import metrics
+from resolwe.flow.utils.metrics import (
+    PHASE_EVALUATION,
+    PHASE_RESOLVE_WAIT,
+    PHASE_RUNTIME_PREP,
+    observe_job_phase,
+)
+from resolwe.permissions.shortcuts import get_objects_for_user
 from resolwe.test.utils import is_testing
 from resolwe.utils import BraceMessage as __
 
@@ -424,6 +434,7 @@ class Manager:
         data.save(update_fields=["scheduled"])
 
         async_to_sync(self.sync_counter.inc)("executor")
+        metrics.manager_dispatched_jobs.inc(connector=class_name)
         return self.connectors[class_name].submit(data, runtime_dir, argv)
 
     def _get_per_data_dir(self, dir_base, subpath):
@@ -506,6 +517,8 @@ class Manager:
         settings_dict = {}
         settings_dict["DATA_DIR"] = data_dir
         settings_dict["REDIS_CHANNEL_PAIR"] = state.MANAGER_EXECUTOR_CHANNELS
+        settings_dict["REDIS_LOG_CHANNEL"] = state.MANAGER_EXECUTOR_LOG_CHANNEL
+        settings_dict["REDIS_DOCKER_POOL_STATS"] = state.MANAGER_DOCKER_POOL_STATS
         files[ExecutorFiles.EXECUTOR_SETTINGS] = settings_dict
 
         django_settings = {}
@@ -785,6 +798,63 @@ class Manager:
                 )
             )
 
+    def _reuse_cached_result(self, data):
+        """Complete the data object with results of an equal one.
+
+        Results are reused only if the ``FLOW_MANAGER_REUSE_RESULTS``
+        setting is enabled and the process is cached. A finished data
+        object with the same checksum that the contributor may view is
+        looked up and its output, storages and data location are linked
+        to the given data object instead of running it. Data objects
+        spawned by the original are not recreated.
+
+        :param data: The :class:`~resolwe.flow.models.Data` object with
+            resolved dependencies.
+        :return: ``True`` if results were reused.
+        """
+        if not getattr(settings, "FLOW_MANAGER_REUSE_RESULTS", False):
+            return False
+        if data.process.persistence != Process.PERSISTENCE_CACHED:
+            return False
+        if data.process.run.get("language", None) == "workflow":
+            # Workflows only create data objects of their steps.
+            return False
+
+        cached = Data.objects.filter(
+            checksum=data.checksum,
+            status=Data.STATUS_DONE,
+            process__persistence=Process.PERSISTENCE_CACHED,
+            location__isnull=False,
+        ).exclude(pk=data.pk)
+        cached = (
+            get_objects_for_user(data.contributor, "view_data", cached)
+            .order_by("-created")
+            .first()
+        )
+
+        if cached is None:
+            metrics.manager_cache_lookups.inc(process=data.process.slug, result="miss")
+            return False
+
+        logger.debug(
+            __("Reusing results of Data with id {} for {}.", cached.id, data.id)
+        )
+        # The data location is shared and only purged when no data object
+        # references it anymore.
+        data.location = cached.location
+        data.output = copy.deepcopy(cached.output)
+        data.storages.add(*cached.storages.values_list("pk", flat=True))
+        data.process_info.append(
+            "Results reused from data object with id {}".format(cached.id)
+        )
+        data.process_rc = 0
+        data.process_progress = 100
+        data.started = data.finished = now()
+        data.status = Data.STATUS_DONE
+
+        metrics.manager_cache_lookups.inc(process=data.process.slug, result="hit")
+        return True
+
     def _data_execute(self, data, program, executor):
         """Execute the Data object.
 
@@ -804,6 +874,7 @@ class Manager:
         logger.debug(__("Manager preparing Data with id {} for processing.", data.id))
 
         # Prepare the executor's environment.
+        prepare_start = time.perf_counter()
         try:
             executor_env_vars = self.get_executor().get_environment_variables()
             program = self._include_environment_variables(program, executor_env_vars)
@@ -845,6 +916,8 @@ class Manager:
             )
             return
 
+        observe_job_phase(PHASE_RUNTIME_PREP, data, time.perf_counter() - prepare_start)
+
         # Hand off to the run() method for execution.
         logger.info(__("Running {}", runtime_dir))
         self.run(data, runtime_dir, argv)
@@ -886,7 +959,21 @@ class Manager:
             elif dep_status != Data.STATUS_DONE:
                 return
 
-            if data.process.run:
+            observe_job_phase(
+                PHASE_RESOLVE_WAIT, data, (now() - data.created).total_seconds()
+            )
+
+            if self._reuse_cached_result(data):
+                # Nothing to run, results are already set.
+                program = ""
+            elif data.process.run:
+                # Set allocated resources before they are used by the
+                # execution engine.
+                resource_limits = data.process.get_resource_limits()
+                data.process_memory = resource_limits["memory"]
+                data.process_cores = resource_limits["cores"]
+
+                evaluation_start = time.perf_counter()
                 try:
                     execution_engine = data.process.run.get("language", None)
                     # Evaluation by the execution engine may spawn additional data objects and
@@ -902,11 +989,9 @@ class Manager:
                     )
                     data.save()
                     return
-
-                # Set allocated resources:
-                resource_limits = data.process.get_resource_limits()
-                data.process_memory = resource_limits["memory"]
-                data.process_cores = resource_limits["cores"]
+                observe_job_phase(
+                    PHASE_EVALUATION, data, time.perf_counter() - evaluation_start
+                )
             else:
                 # If there is no run section, then we should not try to run anything. But the
                 # program must not be set to None as then the process will be stuck in waiting
@@ -943,72 +1028,86 @@ class Manager:
             # Ensure settings overrides apply
             self.discover_engines(executor=executor)
 
-        try:
-            queryset = Data.objects.filter(status=Data.STATUS_RESOLVING)
-            if data_id is not None:
-                # Scan only given data object and its children.
-                queryset = queryset.filter(
-                    Q(parents=data_id) | Q(id=data_id)
-                ).distinct()
-
-            for data in queryset:
-                try:
-                    with transaction.atomic():
-                        process_data_object(data)
-
-                        # All data objects created by the execution engine are commited after this
-                        # point and may be processed by other managers running in parallel. At the
-                        # same time, the lock for the current data object is released.
-                except Exception as error:
-                    logger.exception(
-                        __(
-                            "Unhandled exception in _data_scan while processing data object {}.",
-                            data.pk,
-                        )
-                    )
+        queries = 0
 
-                    # Unhandled error while processing a data object. We must set its
-                    # status to STATUS_ERROR to prevent the object from being retried
-                    # on next _data_scan run. We must perform this operation without
-                    # using the Django ORM as using the ORM may be the reason the error
-                    # occurred in the first place.
-                    error_msg = "Internal error: {}".format(error)
-                    process_error_field = Data._meta.get_field("process_error")
-                    max_length = process_error_field.base_field.max_length
-                    if len(error_msg) > max_length:
-                        error_msg = error_msg[: max_length - 3] + "..."
+        def count_query(execute, sql, params, many, context):
+            """Count the database queries of the scan."""
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
 
+        scan_start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            try:
+                queryset = Data.objects.filter(status=Data.STATUS_RESOLVING)
+                if data_id is not None:
+                    # Scan only given data object and its children.
+                    queryset = queryset.filter(
+                        Q(parents=data_id) | Q(id=data_id)
+                    ).distinct()
+
+                for data in queryset:
                     try:
-                        with connection.cursor() as cursor:
-                            cursor.execute(
-                                """
-                                    UPDATE {table}
-                                    SET
-                                        status = %(status)s,
-                                        process_error = process_error || (%(error)s)::varchar[]
-                                    WHERE id = %(id)s
-                                """.format(
-                                    table=Data._meta.db_table
-                                ),
-                                {
-                                    "status": Data.STATUS_ERROR,
-                                    "error": [error_msg],
-                                    "id": data.pk,
-                                },
-                            )
-                    except Exception:
-                        # If object's state cannot be changed due to some database-related
-                        # issue, at least skip the object for this run.
+                        with transaction.atomic():
+                            process_data_object(data)
+
+                            # All data objects created by the execution engine are commited after this
+                            # point and may be processed by other managers running in parallel. At the
+                            # same time, the lock for the current data object is released.
+                    except Exception as error:
                         logger.exception(
                             __(
-                                "Unhandled exception in _data_scan while trying to emit error for {}.",
+                                "Unhandled exception in _data_scan while processing data object {}.",
                                 data.pk,
                             )
                         )
 
-        except IntegrityError as exp:
-            logger.error(__("IntegrityError in manager {}", exp))
-            return
+                        # Unhandled error while processing a data object. We must set its
+                        # status to STATUS_ERROR to prevent the object from being retried
+                        # on next _data_scan run. We must perform this operation without
+                        # using the Django ORM as using the ORM may be the reason the error
+                        # occurred in the first place.
+                        error_msg = "Internal error: {}".format(error)
+                        process_error_field = Data._meta.get_field("process_error")
+                        max_length = process_error_field.base_field.max_length
+                        if len(error_msg) > max_length:
+                            error_msg = error_msg[: max_length - 3] + "..."
+
+                        try:
+                            with connection.cursor() as cursor:
+                                cursor.execute(
+                                    """
+                                        UPDATE {table}
+                                        SET
+                                            status = %(status)s,
+                                            process_error = process_error || (%(error)s)::varchar[]
+                                        WHERE id = %(id)s
+                                    """.format(
+                                        table=Data._meta.db_table
+                                    ),
+                                    {
+                                        "status": Data.STATUS_ERROR,
+                                        "error": [error_msg],
+                                        "id": data.pk,
+                                    },
+                                )
+                        except Exception:
+                            # If object's state cannot be changed due to some database-related
+                            # issue, at least skip the object for this run.
+                            logger.exception(
+                                __(
+                                    "Unhandled exception in _data_scan while trying to emit error for {}.",
+                                    data.pk,
+                                )
+                            )
+
+            except IntegrityError as exp:
+                logger.error(__("IntegrityError in manager {}", exp))
+                return
+            finally:
+                metrics.manager_scan_seconds.observe(time.perf_counter() - scan_start)
+                metrics.manager_db_queries.inc(queries)
+                metrics.flush_metrics()
 
     def get_executor(self):
         """Return an executor instance."""
@@ -14,7 +14,6 @@ Standalone Redis client used as a contact point for executors.
 import asyncio
 import json
 import logging
-import math
 import os
 import time
 import traceback
@@ -28,15 +27,22 @@ from channels.layers import get_channel_layer
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.db import connection, transaction
 from django.urls import reverse
 from django.utils.timezone import now
 
 from django_priority_batch import PrioritizedBatcher
 
 from resolwe.flow.models import Data, Process
-from resolwe.flow.protocol import CHANNEL_PURGE_WORKER, TYPE_PURGE_RUN
-from resolwe.flow.utils import dict_dot, iterate_fields, stats
+from resolwe.flow.protocol import CHANNEL_PURGE_WORKER, TYPE_PURGE_RUN, TYPE_PURGE_SWEEP
+from resolwe.flow.utils import dict_dot, metrics, stats
+from resolwe.flow.utils.metrics import (
+    PHASE_EXECUTOR_START,
+    PHASE_FINISH,
+    PHASE_QUEUE_WAIT,
+    PHASE_RUN,
+    observe_job_phase,
+)
 from resolwe.test.utils import is_testing
 from resolwe.utils import BraceMessage as __
 
@@ -64,20 +70,28 @@ class ExecutorListener:
         # Running coordination.
         self._should_stop = False
         self._runner_coro = None
+        self._log_worker_coro = None
 
         # The verbosity level to pass around to Resolwe utilities
         # such as location_purge.
         self._verbosity = kwargs.get("verbosity", 1)
 
+        # Ids of data locations waiting to be purged and the time when
+        # the oldest of them was queued.
+        self._purge_queue = set()
+        self._purge_queue_since = None
+
+        # Timestamp of the last periodic purge sweep.
+        self._last_purge_sweep = time.time()
+
         # Statistics about how much time each event needed for handling.
         self.service_time = stats.NumberSeriesShape()
 
         # Statistics about the number of events handled per time interval.
         self.load_avg = stats.SimpleLoadAvg([60, 5 * 60, 15 * 60])
 
-        # Timestamp of last critical load error and level, for throttling.
-        self.last_load_log = -math.inf
-        self.last_load_level = 0
+        # Timestamp of the last flush of metrics to Redis.
+        self._last_metrics_flush = time.time()
 
     async def _make_connection(self):
         """Construct a connection to Redis."""
@@ -95,7 +109,8 @@ class ExecutorListener:
             try:
                 if not self._redis:
                     self._redis = await self._make_connection()
-                return await meth(self._redis, *args, **kwargs)
+                with metrics.listener_redis_seconds.time(command=meth.__name__):
+                    return await meth(self._redis, *args, **kwargs)
             except aioredis.RedisError:
                 logger.exception("Redis connection error")
                 if self._redis:
@@ -125,6 +140,7 @@ class ExecutorListener:
         self._should_stop = False
         self._redis = await self._make_connection()
         self._runner_coro = asyncio.ensure_future(self.run())
+        self._log_worker_coro = asyncio.ensure_future(self.run_log_worker())
         return self
 
     async def __aexit__(self, typ, value, trace):
@@ -135,6 +151,7 @@ class ExecutorListener:
             Exceptions are all propagated.
         """
         await self._runner_coro
+        await self._log_worker_coro
         self._redis.close()
         await self._redis.wait_closed()
         # Make sure the connection is cleaned up.
@@ -354,9 +371,14 @@ class ExecutorListener:
                                this command changes],
                     'process_rc': [exit status of the processing]
                     'spawn_processes': [optional; list of spawn dictionaries],
-                    'exported_files_mapper': [if spawn_processes present]
+                    'exported_files_mapper': [if spawn_processes present],
+                    'timings': [optional; executor start time and durations],
+                    'file_transfers': [optional; number of exported files
+                                       per transfer mechanism],
+                    'resources': [optional; observed resource usage]
                 }
         """
+        finish_start = time.perf_counter()
         data_id = obj[ExecutorProtocol.DATA_ID]
         logger.debug(
             __("Finishing Data with id {} (handle_finish).", data_id),
@@ -392,17 +414,20 @@ class ExecutorListener:
                         parent_data = Data.objects.get(pk=data_id)
 
                         # Spawn processes.
+                        spawn_processes, processes = [], {}
                         for d in obj[ExecutorProtocol.FINISH_SPAWN_PROCESSES]:
                             d["contributor"] = parent_data.contributor
-                            d["process"] = Process.objects.filter(
-                                slug=d["process"]
-                            ).latest()
+                            if d["process"] not in processes:
+                                processes[d["process"]] = Process.objects.filter(
+                                    slug=d["process"]
+                                ).latest()
+                            d["process"] = processes[d["process"]]
                             d["tags"] = parent_data.tags
                             d["collection"] = parent_data.collection
-                            d["subprocess_parent"] = parent_data
 
-                            for field_schema, fields in iterate_fields(
-                                d.get("input", {}), d["process"].input_schema
+                            compiled_schema = d["process"].compiled_input_schema
+                            for field_schema, fields in compiled_schema.iterate_fields(
+                                d.get("input", {}), "basic:file:", "list:basic:file:"
                             ):
                                 type_ = field_schema["type"]
                                 name = field_schema["name"]
@@ -420,7 +445,11 @@ class ExecutorListener:
                                         for fn in value
                                     ]
 
-                            d = Data.objects.create(**d)
+                            spawn_processes.append(d)
+
+                        Data.objects.create_many(
+                            spawn_processes, subprocess_parent=parent_data
+                        )
 
                 except Exception:
                     logger.error(
@@ -469,27 +498,18 @@ class ExecutorListener:
                     changeset["status"] = Data.STATUS_ERROR
                     changeset["process_rc"] = process_rc
 
+                if ExecutorProtocol.FINISH_RESOURCES in obj:
+                    changeset["process_resources"] = obj[
+                        ExecutorProtocol.FINISH_RESOURCES
+                    ]
+
                 obj[ExecutorProtocol.UPDATE_CHANGESET] = changeset
                 self.handle_update(obj, internal_call=True)
 
         if not getattr(settings, "FLOW_MANAGER_KEEP_DATA", False):
             # Purge worker is not running in test runner, so we should skip triggering it.
             if not is_testing():
-                channel_layer = get_channel_layer()
-                try:
-                    async_to_sync(channel_layer.send)(
-                        CHANNEL_PURGE_WORKER,
-                        {
-                            "type": TYPE_PURGE_RUN,
-                            "location_id": d.location.id,
-                            "verbosity": self._verbosity,
-                        },
-                    )
-                except ChannelFull:
-                    logger.warning(
-                        "Cannot trigger purge because channel is full.",
-                        extra={"data_id": data_id},
-                    )
+                self.schedule_purge(d.location.id)
 
         # Notify the executor that we're done.
         async_to_sync(self._send_reply)(
@@ -513,6 +533,22 @@ class ExecutorListener:
             }
         )
 
+        # Record durations of the job's phases measured by the executor.
+        timings = obj.get(ExecutorProtocol.FINISH_TIMINGS, {})
+        if "started" in timings and d.scheduled:
+            observe_job_phase(
+                PHASE_QUEUE_WAIT, d, timings["started"] - d.scheduled.timestamp()
+            )
+        for phase in [PHASE_EXECUTOR_START, PHASE_RUN]:
+            if phase in timings:
+                observe_job_phase(phase, d, timings[phase])
+        observe_job_phase(PHASE_FINISH, d, time.perf_counter() - finish_start)
+
+        for mechanism, count in obj.get(
+            ExecutorProtocol.FINISH_FILE_TRANSFERS, {}
+        ).items():
+            metrics.file_transfers.inc(count, direction="export", mechanism=mechanism)
+
     def handle_abort(self, obj):
         """Handle an incoming ``Data`` abort processing request.
 
@@ -556,15 +592,155 @@ class ExecutorListener:
                     'message': [log message]
                 }
         """
-        record_dict = json.loads(obj[ExecutorProtocol.LOG_MESSAGE])
-        record_dict["msg"] = record_dict["msg"]
+        self._handle_log_messages([obj[ExecutorProtocol.LOG_MESSAGE]])
 
+    def _handle_log_messages(self, messages):
+        """Pass log records serialized by the executor to the logger.
+
+        :param messages: A list of log records, serialized to JSON.
+        """
         executors_dir = os.path.join(
             os.path.dirname(os.path.dirname(__file__)), "executors"
         )
-        record_dict["pathname"] = os.path.join(executors_dir, record_dict["pathname"])
+        for message in messages:
+            try:
+                record_dict = json.loads(message)
+            except json.JSONDecodeError:
+                logger.error(__("Undecodable log message:\n\n{}", message))
+                continue
+
+            record_dict["pathname"] = os.path.join(
+                executors_dir, record_dict["pathname"]
+            )
+            logger.handle(logging.makeLogRecord(record_dict))
+
+    async def run_log_worker(self):
+        """Run the log worker loop.
 
-        logger.handle(logging.makeLogRecord(record_dict))
+        Batches of log records are consumed from a dedicated channel
+        over a separate Redis connection and handled in a thread, so
+        verbose executors do not delay the main listener loop. Doesn't
+        return until :meth:`terminate` is called.
+        """
+        channel = state.MANAGER_EXECUTOR_LOG_CHANNEL
+        loop = asyncio.get_event_loop()
+        conn = None
+        while not self._should_stop:
+            try:
+                if conn is None:
+                    conn = await self._make_connection()
+                ret = await conn.blpop(channel, timeout=1)
+            except aioredis.RedisError:
+                logger.exception("Redis connection error in log worker")
+                if conn is not None:
+                    conn.close()
+                    await conn.wait_closed()
+                    conn = None
+                await asyncio.sleep(3)
+                continue
+
+            if ret is None:
+                continue
+
+            _, item = ret
+            try:
+                packet = json.loads(item.decode("utf-8"))
+                messages = packet[ExecutorProtocol.LOG_MESSAGES]
+            except (json.JSONDecodeError, KeyError):
+                logger.error(
+                    __("Undecodable log packet:\n\n{}", traceback.format_exc())
+                )
+                continue
+
+            try:
+                await loop.run_in_executor(None, self._handle_log_messages, messages)
+            except Exception:
+                logger.error(
+                    __("Log message handling error:\n\n{}", traceback.format_exc())
+                )
+
+        if conn is not None:
+            conn.close()
+            await conn.wait_closed()
+
+    def schedule_purge(self, location_id):
+        """Queue the data location to be purged.
+
+        Queued locations are sent to the purge worker in batches by
+        :meth:`flush_purge_queue`.
+        """
+        if not self._purge_queue:
+            self._purge_queue_since = time.time()
+        self._purge_queue.add(location_id)
+
+    async def flush_purge_queue(self, force=False):
+        """Send queued data locations to the purge worker.
+
+        Locations are sent once the oldest of them has waited for
+        ``FLOW_PURGE_DELAY`` seconds or at least ``FLOW_PURGE_BATCH_SIZE``
+        of them are queued, so consecutive finishes are purged together.
+
+        :param force: send queued locations immediately
+        """
+        if not self._purge_queue:
+            return
+
+        delay = getattr(settings, "FLOW_PURGE_DELAY", 10)
+        batch_size = getattr(settings, "FLOW_PURGE_BATCH_SIZE", 100)
+        if (
+            not force
+            and len(self._purge_queue) < batch_size
+            and time.time() - self._purge_queue_since < delay
+        ):
+            return
+
+        channel_layer = get_channel_layer()
+        location_ids = sorted(self._purge_queue)
+        for start in range(0, len(location_ids), batch_size):
+            batch = location_ids[start : start + batch_size]
+            try:
+                await channel_layer.send(
+                    CHANNEL_PURGE_WORKER,
+                    {
+                        "type": TYPE_PURGE_RUN,
+                        "location_ids": batch,
+                        "verbosity": self._verbosity,
+                    },
+                )
+            except ChannelFull:
+                # Keep the remaining locations and retry after the delay.
+                logger.warning(
+                    "Cannot trigger purge because channel is full.",
+                    extra={"location_ids": batch},
+                )
+                self._purge_queue_since = time.time()
+                return
+
+            self._purge_queue.difference_update(batch)
+
+        self._purge_queue_since = None
+
+    async def schedule_purge_sweep(self):
+        """Periodically trigger purge of data locations missed by the queue.
+
+        The sweep runs every ``FLOW_PURGE_SWEEP_INTERVAL`` seconds and
+        can be disabled by setting it to ``0``.
+        """
+        interval = getattr(settings, "FLOW_PURGE_SWEEP_INTERVAL", 3600)
+        if not interval or time.time() - self._last_purge_sweep < interval:
+            return
+        if getattr(settings, "FLOW_MANAGER_KEEP_DATA", False) or is_testing():
+            return
+
+        self._last_purge_sweep = time.time()
+        channel_layer = get_channel_layer()
+        try:
+            await channel_layer.send(
+                CHANNEL_PURGE_WORKER,
+                {"type": TYPE_PURGE_SWEEP, "verbosity": self._verbosity},
+            )
+        except ChannelFull:
+            logger.warning("Cannot trigger purge sweep because channel is full.")
 
     def _make_stats(self):
         """Create a stats snapshot."""
@@ -596,30 +772,47 @@ class ExecutorListener:
                 )
             )
 
-    def check_critical_load(self):
-        """Check for critical load and log an error if necessary."""
-        if self.load_avg.intervals["1m"].value > 1:
-            if self.last_load_level == 1 and time.time() - self.last_load_log < 30:
-                return
-            self.last_load_log = time.time()
-            self.last_load_level = 1
-            logger.error(
-                "Listener load limit exceeded, the system can't handle this!",
-                extra=self._make_stats(),
-            )
+    def update_load_metrics(self, queue_depth):
+        """Update metrics of the listener's load.
 
-        elif self.load_avg.intervals["1m"].value > 0.8:
-            if self.last_load_level == 0.8 and time.time() - self.last_load_log < 30:
-                return
-            self.last_load_log = time.time()
-            self.last_load_level = 0.8
-            logger.warning(
-                "Listener load approaching critical!", extra=self._make_stats()
-            )
+        :param queue_depth: The number of commands in the queue.
+        """
+        metrics.listener_queue_depth.set(queue_depth)
+        for interval, value in self.load_avg.to_dict().items():
+            metrics.listener_load_average.set(value, interval=interval)
 
-        else:
-            self.last_load_log = -math.inf
-            self.last_load_level = 0
+    async def flush_metrics(self):
+        """Send collected metrics to Redis at most once per second.
+
+        Metrics are sent from a thread, so the listener does not wait
+        for them.
+        """
+        if time.time() - self._last_metrics_flush < 1:
+            return
+        self._last_metrics_flush = time.time()
+        await asyncio.get_event_loop().run_in_executor(None, metrics.flush_metrics)
+
+    def _handle_command(self, handler, command, obj):
+        """Run the command handler and measure its database queries."""
+        db_time = 0
+        queries = 0
+
+        def timer(execute, sql, params, many, context):
+            """Measure the time of the database query."""
+            nonlocal db_time, queries
+            queries += 1
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_time += time.perf_counter() - start
+
+        try:
+            with connection.execute_wrapper(timer):
+                handler(obj)
+        finally:
+            metrics.listener_db_seconds.observe(db_time, command=command)
+            metrics.listener_db_queries.inc(queries, command=command)
 
     async def run(self):
         """Run the main listener run loop.
@@ -634,17 +827,21 @@ class ExecutorListener:
         )
         while not self._should_stop:
             await self.push_stats()
+            await self.flush_purge_queue()
+            await self.schedule_purge_sweep()
+            await self.flush_metrics()
             ret = await self._call_redis(
                 aioredis.Redis.blpop, state.MANAGER_EXECUTOR_CHANNELS.queue, timeout=1
             )
             if ret is None:
                 self.load_avg.add(0)
+                self.update_load_metrics(0)
                 continue
             remaining = await self._call_redis(
                 aioredis.Redis.llen, state.MANAGER_EXECUTOR_CHANNELS.queue
             )
             self.load_avg.add(remaining + 1)
-            self.check_critical_load()
+            self.update_load_metrics(remaining + 1)
             _, item = ret
             try:
                 item = item.decode("utf-8")
@@ -666,7 +863,9 @@ class ExecutorListener:
             if handler:
                 try:
                     with PrioritizedBatcher.global_instance():
-                        await database_sync_to_async(handler)(obj)
+                        await database_sync_to_async(self._handle_command)(
+                            handler, command, obj
+                        )
                 except Exception:
                     logger.error(
                         __(
@@ -685,6 +884,12 @@ class ExecutorListener:
             # a lagging system, good internal performance is meaningless.
             service_end = time.perf_counter()
             self.service_time.update(service_end - service_start)
+            metrics.listener_service_seconds.observe(
+                service_end - service_start, command=command
+            )
+
+        await self.flush_purge_queue(force=True)
+        await asyncio.get_event_loop().run_in_executor(None, metrics.flush_metrics)
         logger.info(
             __(
                 "Stopping Resolwe listener on channel '{}'.",
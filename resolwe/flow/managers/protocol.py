@@ -31,6 +31,9 @@ class ExecutorProtocol:
     FINISH_PROCESS_RC = "process_rc"
     FINISH_SPAWN_PROCESSES = "spawn_processes"
     FINISH_EXPORTED_FILES = "exported_files_mapper"
+    FINISH_TIMINGS = "timings"
+    FINISH_FILE_TRANSFERS = "file_transfers"
+    FINISH_RESOURCES = "resources"
 
     ABORT = "abort"
 
@@ -40,6 +43,7 @@ class ExecutorProtocol:
 
     LOG = "log"
     LOG_MESSAGE = "message"
+    LOG_MESSAGES = "messages"
 
 
 class ExecutorFiles:
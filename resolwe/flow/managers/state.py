@@ -26,8 +26,12 @@ ManagerChannelPair = namedtuple("ManagerChannelPair", ["queue", "queue_response"
 
 MANAGER_CONTROL_CHANNEL = "DUMMY.control"
 MANAGER_EXECUTOR_CHANNELS = ManagerChannelPair("DUMMY.queue", "DUMMY.queue_response")
+MANAGER_EXECUTOR_LOG_CHANNEL = "DUMMY.log_queue"
 MANAGER_STATE_PREFIX = "DUMMY.state_prefix"
 MANAGER_LISTENER_STATS = "DUMMY.listener_stats"
+MANAGER_DOCKER_POOL_STATS = "DUMMY.docker_pool_stats"
+MANAGER_METRICS_PREFIX = "DUMMY.metrics"
+MANAGER_REGISTER_CACHE = "DUMMY.register_cache"
 
 
 def update_constants():
@@ -40,7 +44,9 @@ def update_constants():
     as this one are then needed to fix dummy values.
     """
     global MANAGER_CONTROL_CHANNEL, MANAGER_EXECUTOR_CHANNELS
-    global MANAGER_LISTENER_STATS, MANAGER_STATE_PREFIX
+    global MANAGER_EXECUTOR_LOG_CHANNEL
+    global MANAGER_LISTENER_STATS, MANAGER_STATE_PREFIX, MANAGER_DOCKER_POOL_STATS
+    global MANAGER_METRICS_PREFIX, MANAGER_REGISTER_CACHE
     redis_prefix = getattr(settings, "FLOW_MANAGER", {}).get("REDIS_PREFIX", "")
 
     MANAGER_CONTROL_CHANNEL = "{}.control".format(redis_prefix)
@@ -48,8 +54,12 @@ def update_constants():
         "{}.result_queue".format(redis_prefix),
         "{}.result_queue_response".format(redis_prefix),
     )
+    MANAGER_EXECUTOR_LOG_CHANNEL = "{}.log_queue".format(redis_prefix)
     MANAGER_STATE_PREFIX = "{}.state".format(redis_prefix)
     MANAGER_LISTENER_STATS = "{}.listener_stats".format(redis_prefix)
+    MANAGER_DOCKER_POOL_STATS = "{}.docker_pool_stats".format(redis_prefix)
+    MANAGER_METRICS_PREFIX = "{}.metrics".format(redis_prefix)
+    MANAGER_REGISTER_CACHE = "{}.register_cache".format(redis_prefix)
 
 
 update_constants()
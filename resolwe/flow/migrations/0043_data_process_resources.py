@@ -0,0 +1,19 @@
+# Generated by Django 2.2.10 on 2020-03-02 10:12
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flow", "0042_delete_obsolete_perms"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="data",
+            name="process_resources",
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
@@ -36,6 +36,30 @@ def delete_chunked(queryset, chunk_size=500):
             queryset.filter(pk__lte=last_instance.pk).delete()
 
 
+def bulk_create_with_slugs(model, instances):
+    """Insert new instances with a single query and allocate their slugs.
+
+    Insert is retried with newly allocated slugs if it fails due to a
+    slug conflict with concurrently created objects.
+    """
+    slug_field = model._meta.get_field("slug")
+    for _ in range(MAX_SLUG_RETRIES):
+        slug_field.allocate_slugs(instances)
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(instances)
+                return
+        except IntegrityError as error:
+            if "{}_slug".format(model._meta.db_table) in error.args[0]:
+                for instance in instances:
+                    instance.slug = None
+                continue
+
+            raise
+
+    raise IntegrityError("Maximum number of retries exceeded during slug generation")
+
+
 class BaseQuerySet(models.QuerySet):
     """Base query set for Resolwe's ORM objects."""
 
@@ -1,10 +1,6 @@
 """Resolwe collection model."""
 from django.contrib.postgres.fields import ArrayField, JSONField
 from django.db import models, transaction
-from django.utils.timezone import now
-
-from resolwe.permissions.shortcuts import get_objects_for_user
-from resolwe.permissions.utils import assign_contributor_permissions
 
 from .base import BaseModel, BaseQuerySet
 from .utils import DirtyError, validate_schema
@@ -37,8 +33,8 @@ class BaseCollection(BaseModel):
     #: tags for categorizing objects
     tags = ArrayField(models.CharField(max_length=255), default=list)
 
-    def save(self, *args, **kwargs):
-        """Perform descriptor validation and save object."""
+    def validate_descriptor(self):
+        """Validate descriptor and set ``descriptor_dirty`` flag."""
         if self.descriptor_schema:
             try:
                 validate_schema(self.descriptor, self.descriptor_schema.schema)
@@ -50,6 +46,9 @@ class BaseCollection(BaseModel):
                 "`descriptor_schema` must be defined if `descriptor` is given"
             )
 
+    def save(self, *args, **kwargs):
+        """Perform descriptor validation and save object."""
+        self.validate_descriptor()
         super().save()
 
 
@@ -57,9 +56,19 @@ class CollectionQuerySet(BaseQuerySet):
     """Query set for ``Collection`` objects."""
 
     @transaction.atomic
-    def duplicate(self, contributor=None):
-        """Duplicate (make a copy) ``Collection`` objects."""
-        return [collection.duplicate(contributor=contributor) for collection in self]
+    def duplicate(self, contributor=None, progress=None):
+        """Duplicate (make a copy) ``Collection`` objects.
+
+        :param contributor: Duplication user
+        :param progress: Optional callable called with the number of
+            copied objects and the total number of objects
+        :return: A list of duplicated collections
+        """
+        from resolwe.flow.utils.duplicate import (  # Prevent circular import.
+            duplicate_collections,
+        )
+
+        return duplicate_collections(self, contributor=contributor, progress=progress)
 
 
 class Collection(BaseCollection):
@@ -87,31 +96,5 @@ class Collection(BaseCollection):
 
     def duplicate(self, contributor=None):
         """Duplicate (make a copy)."""
-        duplicate = Collection.objects.get(id=self.id)
-        duplicate.pk = None
-        duplicate.slug = None
-        duplicate.name = "Copy of {}".format(self.name)
-        duplicate.duplicated = now()
-        if contributor:
-            duplicate.contributor = contributor
-
-        duplicate.save(force_insert=True)
-
-        assign_contributor_permissions(duplicate)
-
-        # Fields to inherit from original data object.
-        duplicate.created = self.created
-        duplicate.save()
-
-        # Duplicate collection's entities.
-        entities = get_objects_for_user(
-            contributor, "view_entity", self.entity_set.all()
-        )
-        duplicated_entities = entities.duplicate(contributor=contributor)
-        duplicate.entity_set.add(*duplicated_entities)
-
-        # Add duplicated data objects to collection.
-        for duplicated_entity in duplicate.entity_set.all():
-            duplicate.data.add(*duplicated_entity.data.all())
-
-        return duplicate
+        queryset = Collection.objects.filter(pk=self.pk)
+        return queryset.duplicate(contributor=contributor)[0]
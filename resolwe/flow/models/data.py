@@ -1,6 +1,5 @@
 """Reslowe process model."""
 import copy
-import enum
 import json
 import logging
 import os
@@ -10,19 +9,19 @@ from django.contrib.postgres.fields import ArrayField, JSONField
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.validators import RegexValidator
 from django.db import models, transaction
-from django.utils.timezone import now
+from django.db.models.expressions import RawSQL
+
+from django_priority_batch import PrioritizedBatcher
 
 from resolwe.flow.expression_engines.exceptions import EvaluationError
 from resolwe.flow.models.utils import fill_with_defaults
-from resolwe.flow.utils import (
-    dict_dot,
-    get_data_checksum,
-    iterate_fields,
-    rewire_inputs,
+from resolwe.flow.utils import compile_schema, dict_dot, get_data_checksum
+from resolwe.permissions.utils import (
+    bulk_assign_contributor_permissions,
+    bulk_copy_permissions,
 )
-from resolwe.permissions.utils import assign_contributor_permissions, copy_permissions
 
-from .base import BaseModel, BaseQuerySet
+from .base import BaseModel, BaseQuerySet, bulk_create_with_slugs
 from .descriptor import DescriptorSchema
 from .entity import Entity
 from .secret import Secret
@@ -43,21 +42,12 @@ if not hasattr(json, "JSONDecodeError"):
 logger = logging.getLogger(__name__)
 
 
-@enum.unique
-class HandleEntityOperation(enum.Enum):
-    """Constants for entity handling."""
-
-    CREATE = "CREATE"
-    ADD = "ADD"
-    PASS = "PASS"
-
-
 class DataQuerySet(BaseQuerySet):
     """Query set for Data objects."""
 
     @staticmethod
-    def _handle_entity(obj):
-        """Create entity if `entity.type` is defined in process.
+    def _handle_entities(objs):
+        """Add new ``Data`` objects to entities and collections in bulk.
 
         Following rules applies for adding `Data` object to `Entity`:
         * Only add `Data object` to `Entity` if process has defined
@@ -68,24 +58,45 @@ class DataQuerySet(BaseQuerySet):
         `Entity`
         * If parents belong to different `Entities` don't do anything
 
+        Entities of parents of all objects are resolved with a single
+        query and objects are handled in the given order, so they can be
+        added to entities of objects earlier in the list. New entities
+        are inserted and permissions assigned in bulk.
+
+        Search indexes are not built, since permissions of the objects
+        are only assigned afterwards.
+
+        There are 2 x 4 possible scenarios how to handle collection
+        assignment. One dimension in "decision matrix" is Data.collection:
+
+            1.x Data.collection = None
+            2.x Data.collection != None
+
+        Second dimension is about Data.entity:
+
+            x.1 Data.entity is None
+            x.2 Data.entity was just created
+            x.3 Data.entity already exists and Data.entity.collection = None
+            x.4 Data.entity already exists and Data.entity.collection != None
+
+        :return: set of ids of entities objects were added to
         """
-        entity_type = obj.process.entity_type
-        entity_descriptor_schema = obj.process.entity_descriptor_schema
-        entity_input = obj.process.entity_input
-        entity_always_create = obj.process.entity_always_create
-        operation = HandleEntityOperation.PASS
-
-        if entity_type:
-            data_filter = {}
+        # Ids of parents used for entity selection by indices of objects.
+        parent_ids = {}
+        for index, obj in enumerate(objs):
+            if not obj.process.entity_type:
+                continue
+
+            entity_input = obj.process.entity_input
             if entity_input:
                 input_id = dict_dot(obj.input, entity_input, default=lambda: None)
                 if input_id is None:
                     logger.warning("Skipping creation of entity due to missing input.")
-                    return
+                    continue
                 if isinstance(input_id, int):
-                    data_filter["data__pk"] = input_id
+                    parent_ids[index] = [input_id]
                 elif isinstance(input_id, list):
-                    data_filter["data__pk__in"] = input_id
+                    parent_ids[index] = input_id
                 else:
                     raise ValueError(
                         "Cannot create entity due to invalid value of field {}.".format(
@@ -93,139 +104,213 @@ class DataQuerySet(BaseQuerySet):
                         )
                     )
             else:
-                data_filter["data__in"] = obj.parents.all()
-
-            entity_query = Entity.objects.filter(
-                type=entity_type, **data_filter
-            ).distinct()
-            entity_count = entity_query.count()
-
-            if entity_count == 0 or entity_always_create:
-                descriptor_schema = DescriptorSchema.objects.filter(
-                    slug=entity_descriptor_schema
-                ).latest()
-                entity = Entity.objects.create(
+                parent_ids[index] = []
+
+        if not parent_ids:
+            return set()
+
+        dependent = {
+            objs[index].pk: index
+            for index in parent_ids
+            if not objs[index].process.entity_input
+        }
+        for child_id, parent_id in DataDependency.objects.filter(
+            child__in=list(dependent), parent__isnull=False
+        ).values_list("child_id", "parent_id"):
+            parent_ids[dependent[child_id]].append(parent_id)
+
+        # Entities of data objects by their ids.
+        entities = {
+            data.pk: data.entity
+            for data in Data.objects.filter(
+                pk__in={id_ for ids in parent_ids.values() for id_ in ids},
+                entity__isnull=False,
+            )
+            .select_related("entity__collection")
+            .only("pk", "entity")
+        }
+
+        descriptor_schemas = {}
+        new_entities, added, changed = [], [], []
+        for index, obj in enumerate(objs):
+            if index not in parent_ids:
+                continue
+
+            process = obj.process
+            candidates = {}
+            for parent_id in parent_ids[index]:
+                entity = entities.get(parent_id)
+                if entity is not None and entity.type == process.entity_type:
+                    # New entities are not saved yet, so they have no id.
+                    key = entity.pk if entity.pk is not None else ("new", id(entity))
+                    candidates[key] = entity
+
+            if not candidates or process.entity_always_create:
+                slug = process.entity_descriptor_schema
+                if slug not in descriptor_schemas:
+                    descriptor_schemas[slug] = DescriptorSchema.objects.filter(
+                        slug=slug
+                    ).latest()
+                entity = Entity(
                     contributor=obj.contributor,
-                    descriptor_schema=descriptor_schema,
-                    type=entity_type,
+                    descriptor_schema=descriptor_schemas[slug],
+                    type=process.entity_type,
                     name=obj.name,
                     tags=obj.tags,
                 )
-                assign_contributor_permissions(entity)
-                operation = HandleEntityOperation.CREATE
+                new_entities.append(entity)
+
+                # 2.2
+                if obj.collection:
+                    entity.collection = obj.collection
+                    entity.tags = obj.collection.tags
 
-            elif entity_count == 1:
-                entity = entity_query.first()
+            elif len(candidates) == 1:
+                (entity,) = candidates.values()
                 obj.tags = entity.tags
-                copy_permissions(entity, obj)
-                operation = HandleEntityOperation.ADD
+                added.append((entity, obj))
+
+                if obj.collection:
+                    # 2.3
+                    if not entity.collection:
+                        raise ValueError(
+                            "Created Data has collection {} assigned, but it is added to entity {} that is not "
+                            "inside this collection.".format(obj.collection, entity)
+                        )
+                    # 2.4
+                    assert obj.collection == entity.collection
 
             else:
                 logger.info(
                     "Skipping creation of entity due to multiple entities found."
                 )
-                entity = None
+                continue
 
-            if entity:
-                obj.entity = entity
-                obj.save()
+            obj.entity = entity
+            entities[obj.pk] = entity
 
-            return operation
+            # 1.4
+            if not obj.collection and entity.collection:
+                obj.collection = entity.collection
+                obj.tags = entity.collection.tags
 
-    @staticmethod
-    def _handle_collection(obj, entity_operation=None):
-        """Correclty assign Collection to Data and it's Entity.
+            changed.append(obj)
 
-        There are 2 x 4 possible scenarios how to handle collection
-        assignment. One dimension in "decision matrix" is Data.collection:
+        if not changed:
+            return set()
 
-            1.x Data.collection = None
-            2.x Data.collection != None
-
-        Second dimension is about Data.entity:
+        if new_entities:
+            for entity in new_entities:
+                entity.validate_descriptor()
+            bulk_create_with_slugs(Entity, new_entities)
+            bulk_assign_contributor_permissions(new_entities)
+            bulk_copy_permissions(
+                (entity.collection, entity) for entity in new_entities
+            )
+        bulk_copy_permissions(added)
 
-            x.1 Data.entity is None
-            x.2 Data.entity was just created
-            x.3 Data.entity already exists and Data.entity.collection = None
-            x.4 Data.entity already exists and Data.entity.collection != None
-        """
-        # 1.2 and 1.3 require no action.
+        for obj in changed:
+            # New entities were assigned before they were inserted.
+            obj.entity_id = obj.entity.pk
+        Data.objects.bulk_update(changed, ["entity", "collection", "tags"])
 
-        # 1.1 and 2.1:
-        if not obj.entity:
-            return
-        if entity_operation == HandleEntityOperation.ADD and obj.collection:
-            # 2.3
-            if not obj.entity.collection:
-                raise ValueError(
-                    "Created Data has collection {} assigned, but it is added to entity {} that is not "
-                    "inside this collection.".format(obj.collection, obj.entity)
-                )
-            # 2.4
-            assert obj.collection == obj.entity.collection
-
-        # 1.4
-        if not obj.collection and obj.entity and obj.entity.collection:
-            obj.collection = obj.entity.collection
-            obj.tags = obj.entity.collection.tags
-            obj.save()
-        # 2.2
-        if entity_operation == HandleEntityOperation.CREATE and obj.collection:
-            obj.entity.collection = obj.collection
-            obj.entity.tags = obj.collection.tags
-            obj.entity.save()
-            copy_permissions(obj.collection, obj.entity)
+        return {obj.entity_id for obj in changed}
 
     @transaction.atomic
     def create(self, subprocess_parent=None, **kwargs):
         """Create new object with the given kwargs."""
-        obj = super().create(**kwargs)
+        return self.create_many([kwargs], subprocess_parent=subprocess_parent)[0]
+
+    @transaction.atomic
+    def create_many(self, objects, subprocess_parent=None):
+        """Create new objects, one for each dictionary of kwargs.
+
+        Objects are created in the given order, so inputs can reference
+        objects earlier in the list. Their entities, collections and
+        permissions are handled in bulk. Builds of search indexes are
+        batched and run once all permissions are assigned.
+
+        :param objects: list of dictionaries of kwargs of new objects
+        :param subprocess_parent: optional data object that spawned
+            the new objects
+        :return: list of created objects
+        """
+        batcher = PrioritizedBatcher.global_instance()
+        if batcher.is_started:
+            return self._create_many(objects, subprocess_parent)
+
+        with batcher:
+            return self._create_many(objects, subprocess_parent)
+
+    def _create_many(self, objects, subprocess_parent):
+        """Create new objects and build their search indexes."""
+        objs = []
+        for kwargs in objects:
+            obj = super().create(**kwargs)
+            # Data dependencies
+            obj.save_dependencies(obj.input, obj.process.compiled_input_schema)
+            objs.append(obj)
 
-        # Data dependencies
-        obj.save_dependencies(obj.input, obj.process.input_schema)
         if subprocess_parent:
-            DataDependency.objects.create(
-                parent=subprocess_parent,
-                child=obj,
-                kind=DataDependency.KIND_SUBPROCESS,
+            DataDependency.objects.bulk_create(
+                [
+                    DataDependency(
+                        parent=subprocess_parent,
+                        child=obj,
+                        kind=DataDependency.KIND_SUBPROCESS,
+                    )
+                    for obj in objs
+                ]
             )
             # Data was from a workflow / spawned process
-            copy_permissions(subprocess_parent, obj)
+            bulk_copy_permissions((subprocess_parent, obj) for obj in objs)
 
         # Entity, Collection assignment
-        entity_operation = self._handle_entity(obj)
-        self._handle_collection(obj, entity_operation=entity_operation)
+        entity_ids = self._handle_entities(objs)
 
         # Permissions:
-        assign_contributor_permissions(obj)
-        copy_permissions(obj.collection, obj)
+        bulk_assign_contributor_permissions(objs)
+        bulk_copy_permissions((obj.collection, obj) for obj in objs)
+
+        # Prevent circular import.
+        from resolwe.elastic.builder import index_builder
 
-        return obj
+        # Signals are not sent for bulk inserts and updates, so indexes
+        # are built once all permissions are assigned.
+        index_builder.build(
+            queryset=Data.objects.filter(pk__in=[obj.pk for obj in objs])
+        )
+        if entity_ids:
+            index_builder.build(queryset=Entity.objects.filter(pk__in=entity_ids))
+
+        return objs
 
     @transaction.atomic
     def duplicate(
-        self, contributor=None, inherit_entity=False, inherit_collection=False
+        self,
+        contributor=None,
+        inherit_entity=False,
+        inherit_collection=False,
+        progress=None,
     ):
         """Duplicate (make a copy) ``Data`` objects.
 
         :param contributor: Duplication user
+        :param progress: Optional callable called with the number of
+            copied objects and the total number of objects
+        :return: A list of duplicated data objects
         """
-        bundle = [
-            {
-                "original": data,
-                "copy": data.duplicate(
-                    contributor=contributor,
-                    inherit_entity=inherit_entity,
-                    inherit_collection=inherit_collection,
-                ),
-            }
-            for data in self
-        ]
-
-        bundle = rewire_inputs(bundle)
-        duplicated = [item["copy"] for item in bundle]
+        from resolwe.flow.utils.duplicate import (  # Prevent circular import.
+            duplicate_data,
+        )
 
-        return duplicated
+        return duplicate_data(
+            self,
+            contributor=contributor,
+            inherit_entity=inherit_entity,
+            inherit_collection=inherit_collection,
+            progress=progress,
+        )
 
 
 class Data(BaseModel):
@@ -370,6 +455,9 @@ class Data(BaseModel):
     #: actual allocated cores
     process_cores = models.PositiveSmallIntegerField(default=0)
 
+    #: observed resource usage (peak memory, CPU time and I/O)
+    process_resources = JSONField(default=dict)
+
     #: data location
     location = models.ForeignKey(
         "DataLocation",
@@ -393,50 +481,106 @@ class Data(BaseModel):
         related_name="data",
     )
 
+    #: fields which require validation or hydration when changed, mapped
+    #: to their attribute names
+    TRACKED_FIELDS = {
+        "input": "input",
+        "output": "output",
+        "descriptor": "descriptor",
+        "descriptor_schema": "descriptor_schema_id",
+        "status": "status",
+        "process": "process_id",
+        "location": "location_id",
+    }
+
     def __init__(self, *args, **kwargs):
         """Initialize attributes."""
         super().__init__(*args, **kwargs)
         self._original_name = self.name
 
+    def get_changed_fields(self):
+        """Return names of tracked fields that differ from stored values.
+
+        Stored values are fetched when needed, so loaded objects do not
+        keep copies of their values. All tracked fields are considered
+        changed if the object has not been saved yet.
+
+        :rtype: set
+        """
+        if self.pk is None:
+            return set(self.TRACKED_FIELDS)
+
+        deferred = self.get_deferred_fields()
+        tracked = {
+            name: attname
+            for name, attname in self.TRACKED_FIELDS.items()
+            if attname not in deferred
+        }
+        stored = Data.objects.filter(pk=self.pk).values(*tracked.values()).first()
+        if stored is None:
+            return set(tracked)
+
+        return {
+            name
+            for name, attname in tracked.items()
+            if stored[attname] != getattr(self, attname)
+        }
+
+    def get_resource_limits(self):
+        """Get the resource limits of the job.
+
+        Limits are computed once, when the job is dispatched, and stored
+        in :attr:`process_memory` and :attr:`process_cores`, so all parts
+        of the job use the same limits. Limits of the process are used if
+        they are not stored yet.
+
+        :rtype: dict
+        """
+        if self.process_memory and self.process_cores:
+            return {"memory": self.process_memory, "cores": self.process_cores}
+
+        return self.process.get_resource_limits()
+
     def save_storage(self, instance, schema):
         """Save basic:json values to a Storage collection."""
-        for field_schema, fields in iterate_fields(instance, schema):
+        for field_schema, fields in compile_schema(schema).iterate_fields(
+            instance, "basic:json:"
+        ):
             name = field_schema["name"]
             value = fields[name]
-            if field_schema.get("type", "").startswith("basic:json:"):
-                if value and not self.pk:
-                    raise ValidationError(
-                        "Data object must be `created` before creating `basic:json:` fields"
-                    )
+            if value and not self.pk:
+                raise ValidationError(
+                    "Data object must be `created` before creating `basic:json:` fields"
+                )
 
-                if isinstance(value, int):
-                    # already in Storage
-                    continue
+            if isinstance(value, int):
+                # already in Storage
+                continue
 
-                if isinstance(value, str):
-                    file_path = self.location.get_path(filename=value)
-                    if os.path.isfile(file_path):
-                        try:
-                            with open(file_path) as file_handler:
-                                value = json.load(file_handler)
-                        except json.JSONDecodeError:
-                            with open(file_path) as file_handler:
-                                content = file_handler.read()
-                                content = content.rstrip()
-                                raise ValidationError(
-                                    "Value of '{}' must be a valid JSON, current: {}".format(
-                                        name, content
-                                    )
+            if isinstance(value, str):
+                file_path = self.location.get_path(filename=value)
+                if os.path.isfile(file_path):
+                    try:
+                        with open(file_path) as file_handler:
+                            value = json.load(file_handler)
+                    except json.JSONDecodeError:
+                        with open(file_path) as file_handler:
+                            content = file_handler.read()
+                            content = content.rstrip()
+                            raise ValidationError(
+                                "Value of '{}' must be a valid JSON, current: {}".format(
+                                    name, content
                                 )
+                            )
 
-                storage = self.storages.create(
-                    name="Storage for data id {}".format(self.pk),
-                    contributor=self.contributor,
-                    json=value,
-                )
+            storage = self.storages.create(
+                name="Storage for data id {}".format(self.pk),
+                contributor=self.contributor,
+                json=value,
+            )
 
-                # `value` is copied by value, so `fields[name]` must be changed
-                fields[name] = storage.pk
+            # `value` is copied by value, so `fields[name]` must be changed
+            fields[name] = storage.pk
 
     def resolve_secrets(self):
         """Retrieve handles for all basic:secret: fields on input.
@@ -449,12 +593,9 @@ class Data(BaseModel):
             and value is the secret value.
         """
         secrets = {}
-        for field_schema, fields in iterate_fields(
-            self.input, self.process.input_schema
+        for field_schema, fields in self.process.compiled_input_schema.iterate_fields(
+            self.input, "basic:secret:"
         ):
-            if not field_schema.get("type", "").startswith("basic:secret:"):
-                continue
-
             name = field_schema["name"]
             value = fields[name]
             try:
@@ -497,7 +638,9 @@ class Data(BaseModel):
             except Data.DoesNotExist:
                 pass
 
-        for field_schema, fields in iterate_fields(instance, schema):
+        for field_schema, fields in compile_schema(schema).iterate_fields(
+            instance, "data:", "list:data:"
+        ):
             name = field_schema["name"]
             value = fields[name]
 
@@ -508,7 +651,12 @@ class Data(BaseModel):
                     add_dependency(data)
 
     def save(self, render_name=False, *args, **kwargs):
-        """Save the data model."""
+        """Save the data model.
+
+        Only validation and hydration steps affected by changed fields
+        are performed. If ``update_fields`` is given, only the listed
+        fields are considered changed.
+        """
         if self.name != self._original_name:
             self.named_by_user = True
 
@@ -528,35 +676,52 @@ class Data(BaseModel):
         elif render_name:
             self._render_name()
 
-        self.save_storage(self.output, self.process.output_schema)
-
-        if self.status != Data.STATUS_ERROR:
+        update_fields = kwargs.get("update_fields")
+        if create:
+            changed = set(self.TRACKED_FIELDS)
+        elif update_fields is not None:
+            kwargs["update_fields"] = update_fields = list(update_fields)
+            changed = set(self.TRACKED_FIELDS).intersection(update_fields)
+        else:
+            changed = self.get_changed_fields()
+
+        if "output" in changed:
+            self.save_storage(self.output, self.process.compiled_output_schema)
+
+        output_changed = bool(changed & {"output", "status", "location"})
+        if self.status != Data.STATUS_ERROR and output_changed:
             hydrate_size(self)
             # If only specified fields are updated (e.g. in executor), size needs to be added
-            if "update_fields" in kwargs:
-                kwargs["update_fields"].append("size")
-
-        # Input Data objects are validated only upon creation as they can be deleted later.
-        skip_missing_data = not create
-        validate_schema(
-            self.input, self.process.input_schema, skip_missing_data=skip_missing_data
-        )
+            if update_fields is not None:
+                update_fields.append("size")
+
+        if changed & {"input", "process"}:
+            # Input Data objects are validated only upon creation as they can be deleted later.
+            skip_missing_data = not create
+            validate_schema(
+                self.input,
+                self.process.compiled_input_schema,
+                skip_missing_data=skip_missing_data,
+            )
 
-        render_descriptor(self)
+        if changed & {"descriptor", "descriptor_schema"}:
+            render_descriptor(self)
 
-        if self.descriptor_schema:
-            try:
-                validate_schema(self.descriptor, self.descriptor_schema.schema)
-                self.descriptor_dirty = False
-            except DirtyError:
-                self.descriptor_dirty = True
-        elif self.descriptor and self.descriptor != {}:
-            raise ValueError(
-                "`descriptor_schema` must be defined if `descriptor` is given"
-            )
+            if self.descriptor_schema:
+                try:
+                    validate_schema(
+                        self.descriptor, self.descriptor_schema.compiled_schema
+                    )
+                    self.descriptor_dirty = False
+                except DirtyError:
+                    self.descriptor_dirty = True
+            elif self.descriptor and self.descriptor != {}:
+                raise ValueError(
+                    "`descriptor_schema` must be defined if `descriptor` is given"
+                )
 
-        if self.status != Data.STATUS_ERROR:
-            output_schema = self.process.output_schema
+        if self.status != Data.STATUS_ERROR and output_changed:
+            output_schema = self.process.compiled_output_schema
             if self.status == Data.STATUS_DONE:
                 validate_schema(
                     self.output,
@@ -601,73 +766,78 @@ class Data(BaseModel):
                 "Data object must have done or error status to be duplicated"
             )
 
-        duplicate = Data.objects.get(id=self.id)
-        duplicate.pk = None
-        duplicate.slug = None
-        duplicate.name = "Copy of {}".format(self.name)
-        duplicate.duplicated = now()
-        if contributor:
-            duplicate.contributor = contributor
-
-        duplicate.entity = None
-        if inherit_entity:
-            if not contributor.has_perm("edit_entity", self.entity):
-                raise ValidationError(
-                    "You do not have edit permission on entity {}.".format(self.entity)
-                )
-            duplicate.entity = self.entity
+        return Data.objects.filter(pk=self.pk).duplicate(
+            contributor=contributor,
+            inherit_entity=inherit_entity,
+            inherit_collection=inherit_collection,
+        )[0]
 
-        duplicate.collection = None
-        if inherit_collection:
-            if not contributor.has_perm("edit_collection", self.collection):
-                raise ValidationError(
-                    "You do not have edit permission on collection {}.".format(
-                        self.collection
-                    )
-                )
-            duplicate.collection = self.collection
-
-        duplicate._perform_save(force_insert=True)
+    def _lineage(self, ancestors, depth=None, kinds=None):
+        """Return data objects connected through dependencies.
 
-        # Override fields that are automatically set on create.
-        duplicate.created = self.created
-        duplicate._perform_save()
+        Dependencies are followed with a single recursive query, so the
+        returned queryset is not filtered by permissions.
 
-        if self.location:
-            self.location.data.add(duplicate)
+        :param ancestors: Follow dependencies to parents if ``True`` and
+            to children otherwise
+        :param depth: Optional maximal number of followed dependencies
+        :param kinds: Optional list of followed dependency kinds
+        """
+        source, target = (
+            ("child_id", "parent_id") if ancestors else ("parent_id", "child_id")
+        )
+        kind_filter = "AND kind = ANY(%s)" if kinds is not None else ""
+        kind_params = [list(kinds)] if kinds is not None else []
+
+        if depth is None:
+            # Visited objects are not repeated, so the query terminates
+            # even if dependencies contain a cycle.
+            columns, depth_select, depth_filter, depth_params = "id", "", "", []
+        else:
+            columns, depth_select = "id, depth", ", lineage.depth + 1"
+            depth_filter, depth_params = "AND lineage.depth < %s", [depth]
+
+        sql = """
+            WITH RECURSIVE lineage({columns}) AS (
+                SELECT {target}{depth_start}
+                FROM {table}
+                WHERE {source} = %s AND {target} IS NOT NULL {kind_filter}
+            UNION
+                SELECT dependency.{target}{depth_select}
+                FROM {table} dependency
+                JOIN lineage ON dependency.{source} = lineage.id
+                WHERE dependency.{target} IS NOT NULL {depth_filter} {kind_filter}
+            )
+            SELECT id FROM lineage
+        """.format(
+            columns=columns,
+            source=source,
+            target=target,
+            depth_start=", 1" if depth is not None else "",
+            depth_select=depth_select,
+            depth_filter=depth_filter,
+            kind_filter=kind_filter,
+            table=DataDependency._meta.db_table,
+        )
+        params = [self.pk] + kind_params + depth_params + kind_params
 
-        duplicate.storages.set(self.storages.all())
+        return Data.objects.filter(id__in=RawSQL(sql, params))
 
-        for migration in self.migration_history.order_by("created"):
-            migration.pk = None
-            migration.data = duplicate
-            migration.save(force_insert=True)
+    def ancestors(self, depth=None, kinds=None):
+        """Return all data objects this data object depends on.
 
-        # Inherit existing child dependencies.
-        DataDependency.objects.bulk_create(
-            [
-                DataDependency(
-                    child=duplicate, parent=dependency.parent, kind=dependency.kind
-                )
-                for dependency in DataDependency.objects.filter(child=self)
-            ]
-        )
-        # Inherit existing parent dependencies.
-        DataDependency.objects.bulk_create(
-            [
-                DataDependency(
-                    child=dependency.child, parent=duplicate, kind=dependency.kind
-                )
-                for dependency in DataDependency.objects.filter(parent=self)
-            ]
-        )
+        :param depth: Optional maximal number of levels of ancestors
+        :param kinds: Optional list of followed dependency kinds
+        """
+        return self._lineage(True, depth=depth, kinds=kinds)
 
-        # Permissions
-        assign_contributor_permissions(duplicate)
-        copy_permissions(duplicate.entity, duplicate)
-        copy_permissions(duplicate.collection, duplicate)
+    def descendants(self, depth=None, kinds=None):
+        """Return all data objects depending on this data object.
 
-        return duplicate
+        :param depth: Optional maximal number of levels of descendants
+        :param kinds: Optional list of followed dependency kinds
+        """
+        return self._lineage(False, depth=depth, kinds=kinds)
 
     def _render_name(self):
         """Render data name.
@@ -681,7 +851,7 @@ class Data(BaseModel):
 
         inputs = copy.deepcopy(self.input)
         hydrate_input_references(
-            inputs, self.process.input_schema, hydrate_values=False
+            inputs, self.process.compiled_input_schema, hydrate_values=False
         )
         template_context = inputs
 
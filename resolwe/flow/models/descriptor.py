@@ -2,6 +2,8 @@
 from django.contrib.postgres.fields import JSONField
 from django.db import models
 
+from resolwe.flow.utils import compile_schema
+
 from .base import BaseModel
 
 
@@ -23,3 +25,20 @@ class DescriptorSchema(BaseModel):
 
     #: user descriptor schema represented as a JSON object
     schema = JSONField(default=list)
+
+    @property
+    def compiled_schema(self):
+        """Get compiled :attr:`schema`.
+
+        Compiled schemas of saved descriptor schemas are cached per id,
+        version and modification time.
+        """
+        cache_key = None
+        if self.pk is not None:
+            cache_key = (
+                "descriptorschema",
+                self.pk,
+                str(self.version),
+                self.modified,
+            )
+        return compile_schema(self.schema, cache_key=cache_key)
@@ -1,11 +1,9 @@
 """Resolwe entity model."""
 from django.contrib.postgres.fields import CICharField
-from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils.timezone import now
 
-from resolwe.permissions.shortcuts import get_objects_for_user
-from resolwe.permissions.utils import assign_contributor_permissions, copy_permissions
+from resolwe.permissions.utils import bulk_copy_permissions
 
 from .base import BaseModel, BaseQuerySet
 from .collection import BaseCollection
@@ -15,7 +13,7 @@ class EntityQuerySet(BaseQuerySet):
     """Query set for ``Entity`` objects."""
 
     @transaction.atomic
-    def duplicate(self, contributor=None, inherit_collection=False):
+    def duplicate(self, contributor=None, inherit_collection=False, progress=None):
         """Duplicate (make a copy) ``Entity`` objects.
 
         :param contributor: Duplication user
@@ -24,15 +22,55 @@ class EntityQuerySet(BaseQuerySet):
             is part of. Duplicated entities' data objects will also be
             added to the collection, but only those which are in the
             collection
+        :param progress: Optional callable called with the number of
+            copied objects and the total number of objects
         :return: A list of duplicated entities
         """
-        return [entity.duplicate(contributor, inherit_collection) for entity in self]
+        from resolwe.flow.utils.duplicate import (  # Prevent circular import.
+            duplicate_entities,
+        )
+
+        return duplicate_entities(
+            self,
+            contributor=contributor,
+            inherit_collection=inherit_collection,
+            progress=progress,
+        )
 
     @transaction.atomic
     def move_to_collection(self, source_collection, destination_collection):
-        """Move entities from source to destination collection."""
-        for entity in self:
-            entity.move_to_collection(source_collection, destination_collection)
+        """Move entities from source to destination collection.
+
+        Entities and their data objects are moved with bulk updates,
+        permissions of the destination collection are copied to them
+        in bulk and their search indexes are rebuilt at once.
+        """
+        from resolwe.elastic.builder import index_builder  # Prevent circular import.
+
+        from .data import Data  # Prevent circular import.
+
+        if source_collection == destination_collection:
+            return
+
+        entity_ids = list(self.values_list("id", flat=True))
+        entities = Entity.objects.filter(id__in=entity_ids)
+        data = Data.objects.filter(entity_id__in=entity_ids)
+
+        values = {"collection": destination_collection, "modified": now()}
+        if destination_collection:
+            values["tags"] = destination_collection.tags
+        entities.update(**values)
+        data.update(**values)
+
+        if destination_collection:
+            bulk_copy_permissions(
+                (destination_collection, obj)
+                for queryset in (entities, data)
+                for obj in queryset.only("id")
+            )
+
+        index_builder.build(queryset=entities)
+        index_builder.build(queryset=data)
 
 
 class Entity(BaseCollection):
@@ -68,63 +106,22 @@ class Entity(BaseCollection):
 
     def duplicate(self, contributor=None, inherit_collection=False):
         """Duplicate (make a copy)."""
-        duplicate = Entity.objects.get(id=self.id)
-        duplicate.pk = None
-        duplicate.slug = None
-        duplicate.name = "Copy of {}".format(self.name)
-        duplicate.duplicated = now()
-        if contributor:
-            duplicate.contributor = contributor
-
-        duplicate.collection = None
-        if inherit_collection:
-            if not contributor.has_perm("edit_collection", self.collection):
-                raise ValidationError(
-                    "You do not have edit permission on collection {}.".format(
-                        self.collection
-                    )
-                )
-            duplicate.collection = self.collection
-
-        duplicate.save(force_insert=True)
-
-        assign_contributor_permissions(duplicate)
-
-        # Override fields that are automatically set on create.
-        duplicate.created = self.created
-        duplicate.save()
-
-        # Duplicate entity's data objects.
-        data = get_objects_for_user(contributor, "view_data", self.data.all())
-        duplicated_data = data.duplicate(
-            contributor, inherit_collection=inherit_collection
-        )
-        duplicate.data.add(*duplicated_data)
+        return Entity.objects.filter(pk=self.pk).duplicate(
+            contributor=contributor, inherit_collection=inherit_collection
+        )[0]
 
-        # Permissions
-        assign_contributor_permissions(duplicate)
-        copy_permissions(duplicate.collection, duplicate)
-
-        return duplicate
-
-    @transaction.atomic
     def move_to_collection(self, source_collection, destination_collection):
         """Move entity to destination collection."""
         if source_collection == destination_collection:
             return
 
+        Entity.objects.filter(pk=self.pk).move_to_collection(
+            source_collection, destination_collection
+        )
+
         self.collection = destination_collection
         if destination_collection:
             self.tags = destination_collection.tags
-            copy_permissions(destination_collection, self)
-        self.save()
-
-        for datum in self.data.all():
-            datum.collection = destination_collection
-            if destination_collection:
-                datum.tags = destination_collection.tags
-                copy_permissions(destination_collection, datum)
-            datum.save()
 
 
 class RelationType(models.Model):
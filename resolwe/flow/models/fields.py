@@ -1,4 +1,6 @@
 """Custom database fields."""
+from collections import defaultdict
+
 from django.db import connection
 from django.db.models import constants
 from django.db.models.fields import SlugField
@@ -87,8 +89,12 @@ class ResolweSlugField(SlugField):
             attr = getattr(instance, self.populate_from)
             return attr() if callable(attr) else attr
 
-    def pre_save(self, instance, add):
-        """Ensure slug uniqunes before save."""
+    def _make_slug(self, instance):
+        """Return the base slug of the instance.
+
+        :return: tuple of the slug and flag indicating whether the slug
+            was defined by user
+        """
         slug = self.value_from_object(instance)
 
         # We don't want to change slug defined by user.
@@ -108,13 +114,92 @@ class ResolweSlugField(SlugField):
             elif not self.null:
                 slug = ""
 
-        if slug:
-            # Make sure that auto generated slug with added sequence
-            # won't excede maximal length.
-            # Validation of predefined slugs is handled by Django.
-            if not predefined_slug:
-                slug = slug[: (self.max_length - MAX_SLUG_SEQUENCE_DIGITS - 1)]
+        # Make sure that auto generated slug with added sequence
+        # won't excede maximal length.
+        # Validation of predefined slugs is handled by Django.
+        if slug and not predefined_slug:
+            slug = slug[: (self.max_length - MAX_SLUG_SEQUENCE_DIGITS - 1)]
+
+        return slug, predefined_slug
+
+    def allocate_slugs(self, instances):
+        """Assign unique slugs to new instances which are inserted in bulk.
+
+        Instances are grouped by their base slug and values of fields in
+        ``unique_with`` attribute, so a single query per group is needed
+        instead of one query per instance. Instances with slugs defined
+        by user are left to :meth:`pre_save`.
+        """
+        groups = defaultdict(list)
+        for instance in instances:
+            slug, predefined_slug = self._make_slug(instance)
+            if slug and not predefined_slug:
+                (
+                    constraints_placeholder,
+                    constraints_values,
+                ) = self._get_unique_constraints(instance)
+                key = (slug, tuple(sorted(constraints_values.items())))
+                groups[key].append((instance, constraints_placeholder))
+
+        for (slug, constraints_values), group in groups.items():
+            constraints_placeholder = group[0][1]
+
+            # Safe values - make sure that there is no chance of SQL injection.
+            query_params = {
+                "constraints_placeholder": constraints_placeholder,
+                "slug_column": connection.ops.quote_name(self.column),
+                "slug_len": len(slug),
+                "table_name": connection.ops.quote_name(self.model._meta.db_table),
+            }
+            query_escape_params = {"slug_regex": "^{}(-[0-9]*)?$".format(slug)}
+            query_escape_params.update(constraints_values)
 
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT MAX(
+                        COALESCE(
+                            NULLIF(RIGHT({slug_column}, -{slug_len}-1), ''),
+                            '1'
+                        )::text::integer
+                    )
+                    FROM {table_name} WHERE (
+                        {slug_column} ~ %(slug_regex)s
+                        {constraints_placeholder}
+                    )
+                    """.format(
+                        **query_params
+                    ),
+                    params=query_escape_params,
+                )
+                sequence = cursor.fetchone()[0]
+
+            for instance, _ in group:
+                if sequence is None:
+                    # The base slug is free, continue with the second one.
+                    allocated = slug
+                    sequence = 1
+                else:
+                    sequence += 1
+                    if len(str(sequence)) > MAX_SLUG_SEQUENCE_DIGITS:
+                        raise SlugError(
+                            "Auto-generated slug sequence too long - please choose a different slug."
+                        )
+                    allocated = "{}-{}".format(slug, sequence)
+
+                setattr(instance, self.name, allocated)
+                # Mark the slug as unique, so pre_save doesn't check it again.
+                instance._allocated_slug = allocated
+
+    def pre_save(self, instance, add):
+        """Ensure slug uniqunes before save."""
+        slug, predefined_slug = self._make_slug(instance)
+
+        if slug and slug == getattr(instance, "_allocated_slug", None):
+            # Slug was already allocated by allocate_slugs.
+            return slug
+
+        if slug:
             constraints_placeholder, constraints_values = self._get_unique_constraints(
                 instance
             )
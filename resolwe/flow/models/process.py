@@ -4,6 +4,9 @@ from django.contrib.postgres.fields import JSONField
 from django.core.validators import RegexValidator
 from django.db import models
 
+from resolwe.flow.utils import compile_schema
+from resolwe.flow.utils.resources import get_policy, suggest_resource_limits
+
 from .base import BaseModel
 
 
@@ -180,9 +183,34 @@ class Process(BaseModel):
     process scheduling class
     """
 
-    def get_resource_limits(self):
+    def _get_compiled_schema(self, field):
+        """Get compiled schema stored in the given field.
+
+        Compiled schemas of saved processes are cached per process id,
+        version and modification time.
+        """
+        cache_key = None
+        if self.pk is not None:
+            cache_key = ("process", self.pk, str(self.version), self.modified, field)
+        return compile_schema(getattr(self, field), cache_key=cache_key)
+
+    @property
+    def compiled_input_schema(self):
+        """Get compiled :attr:`input_schema`."""
+        return self._get_compiled_schema("input_schema")
+
+    @property
+    def compiled_output_schema(self):
+        """Get compiled :attr:`output_schema`."""
+        return self._get_compiled_schema("output_schema")
+
+    def get_resource_limits(self, adaptive=True):
         """Get the core count and memory usage limits for this process.
 
+        :param adaptive: Lower the limits to the ones suggested from the
+            observed usage if the adaptive resource limits policy is
+            applied, see :mod:`resolwe.flow.utils.resources`
+
         :return: A dictionary with the resource limits, containing the
             following keys:
 
@@ -207,6 +235,7 @@ class Process(BaseModel):
             limits["cores"] = min(limits["cores"], max_cores)
 
         memory = limit_overrides.get("memory", {}).get(self.slug, None)
+        overridden = memory is not None
         if memory is None:
             memory = int(
                 resources.get(
@@ -217,4 +246,13 @@ class Process(BaseModel):
             )
         limits["memory"] = memory
 
+        policy = get_policy()
+        if adaptive and policy["APPLY"]:
+            suggested = suggest_resource_limits(self, limits, policy)
+            if suggested is not None:
+                limits["cores"] = suggested["cores"]
+                # Explicit overrides take precedence over observed usage.
+                if not overridden:
+                    limits["memory"] = suggested["memory"]
+
         return limits
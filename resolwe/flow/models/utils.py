@@ -1,15 +1,28 @@
 """Resolwe models utils."""
 import copy
+import functools
 import json
+import logging
 import os
 import re
+import time
+from contextlib import contextmanager
 
 import jsonschema
 
 from django.contrib.staticfiles import finders
 from django.core.exceptions import ValidationError
 
-from resolwe.flow.utils import dict_dot, iterate_dict, iterate_fields, iterate_schema
+from resolwe.flow.utils import (
+    compile_schema,
+    dict_dot,
+    iterate_dict,
+    iterate_fields,
+    iterate_schema,
+)
+from resolwe.utils import BraceMessage as __
+
+logger = logging.getLogger(__name__)
 
 
 class DirtyError(ValidationError):
@@ -45,10 +58,47 @@ def validation_schema(name):
 
 
 TYPE_SCHEMA = validation_schema("type")
+TYPE_VALIDATOR = jsonschema.Draft4Validator(TYPE_SCHEMA)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_type_validator(type_):
+    """Return a compiled validator for values of the given field type.
+
+    The validator only contains the type definitions from
+    ``TYPE_SCHEMA`` matching the field type and validates the
+    ``{"type": type_, "value": value}`` item. ``None`` is returned if no
+    type definition matches, in which case the value must be validated
+    against the complete ``TYPE_SCHEMA``.
+    """
+    candidates = [
+        type_schema
+        for type_schema in TYPE_SCHEMA["types"].values()
+        if re.search(type_schema["properties"]["type"]["pattern"], type_)
+    ]
+    if not candidates:
+        return None
+
+    return jsonschema.Draft4Validator({"oneOf": candidates})
+
+
+@contextmanager
+def _validation_phase(timings, phase):
+    """Add the time spent in the block to the given validation phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
 
 
 def validate_schema(
-    instance, schema, test_required=True, data_location=None, skip_missing_data=False
+    instance,
+    schema,
+    test_required=True,
+    data_location=None,
+    skip_missing_data=False,
+    timings=None,
 ):
     """Check if DictField values are consistent with our data types.
 
@@ -80,6 +130,9 @@ def validate_schema(
         (default: ``None``)
     :param bool skip_missing_data: Don't raise an error if referenced
         ``Data`` object does not exist
+    :param dict timings: Optional dictionary, which is updated with the
+        time (in seconds) spent in each validation phase (``fields``,
+        ``references`` and ``schema``)
     :rtype: None
     :raises ValidationError: if ``instance`` doesn't match schema
         defined in ``schema``
@@ -87,6 +140,10 @@ def validate_schema(
     """
     from .storage import Storage  # Prevent circular import.
 
+    schema = compile_schema(schema)
+    if timings is None:
+        timings = {}
+
     path_prefix = None
     if data_location:
         path_prefix = data_location.get_path()
@@ -145,24 +202,41 @@ def validate_schema(
 
             validate_refs(field)
 
-    def validate_data(data_pk, type_):
-        """Check that `Data` objects exist and is of right type."""
+    def validate_data():
+        """Check that referenced `Data` objects exist and are of right type."""
         from .data import Data  # prevent circular import
 
-        data_qs = Data.objects.filter(pk=data_pk).values("process__type")
-        if not data_qs.exists():
-            if skip_missing_data:
-                return
+        data_types = dict(
+            Data.objects.filter(
+                pk__in={data_pk for data_pk, _ in data_refs}
+            ).values_list("pk", "process__type")
+        )
+        for data_pk, type_ in data_refs:
+            if data_pk not in data_types:
+                if skip_missing_data:
+                    continue
 
-            raise ValidationError(
-                "Referenced `Data` object does not exist (id:{})".format(data_pk)
-            )
-        data = data_qs.first()
-        if not data["process__type"].startswith(type_):
-            raise ValidationError(
-                "Data object of type `{}` is required, but type `{}` is given. "
-                "(id:{})".format(type_, data["process__type"], data_pk)
-            )
+                raise ValidationError(
+                    "Referenced `Data` object does not exist (id:{})".format(data_pk)
+                )
+            if not data_types[data_pk].startswith(type_):
+                raise ValidationError(
+                    "Data object of type `{}` is required, but type `{}` is given. "
+                    "(id:{})".format(type_, data_types[data_pk], data_pk)
+                )
+
+    def validate_storages():
+        """Check that referenced `Storage` objects exist."""
+        existing = set(
+            Storage.objects.filter(pk__in=storage_refs).values_list("pk", flat=True)
+        )
+        for storage_pk in storage_refs:
+            if storage_pk not in existing:
+                raise ValidationError(
+                    "Referenced `Storage` object does not exist (id:{})".format(
+                        storage_pk
+                    )
+                )
 
     def validate_range(value, interval, name):
         """Check that given value is inside the specified range."""
@@ -178,76 +252,99 @@ def validate_schema(
 
     is_dirty = False
     dirty_fields = []
-    for _schema, _fields, _ in iterate_schema(instance, schema):
-        name = _schema["name"]
-        is_required = _schema.get("required", True)
-
-        if test_required and is_required and name not in _fields:
-            is_dirty = True
-            dirty_fields.append(name)
-
-        if name in _fields:
-            field = _fields[name]
-            type_ = _schema.get("type", "")
-
-            # Treat None as if the field is missing.
-            if not is_required and field is None:
-                continue
-
-            try:
-                jsonschema.validate([{"type": type_, "value": field}], TYPE_SCHEMA)
-            except jsonschema.exceptions.ValidationError as ex:
-                raise ValidationError(ex.message)
-
-            choices = [choice["value"] for choice in _schema.get("choices", [])]
-            allow_custom_choice = _schema.get("allow_custom_choice", False)
-            if choices and not allow_custom_choice and field not in choices:
-                raise ValidationError(
-                    "Value of field '{}' must match one of predefined choices. "
-                    "Current value: {}".format(name, field)
-                )
-
-            if type_ == "basic:file:":
-                validate_file(field, _schema.get("validate_regex"))
-
-            elif type_ == "list:basic:file:":
-                for obj in field:
-                    validate_file(obj, _schema.get("validate_regex"))
-
-            elif type_ == "basic:dir:":
-                validate_dir(field)
-
-            elif type_ == "list:basic:dir:":
-                for obj in field:
-                    validate_dir(obj)
-
-            elif (
-                type_ == "basic:json:" and not Storage.objects.filter(pk=field).exists()
-            ):
-                raise ValidationError(
-                    "Referenced `Storage` object does not exist (id:{})".format(field)
-                )
-
-            elif type_.startswith("data:"):
-                validate_data(field, type_)
-
-            elif type_.startswith("list:data:"):
-                for data_id in field:
-                    validate_data(data_id, type_[5:])  # remove `list:` from type
-
-            elif type_ == "basic:integer:" or type_ == "basic:decimal:":
-                validate_range(field, _schema.get("range"), name)
+    # References to other objects are collected and checked in bulk.
+    data_refs = []
+    storage_refs = []
+    with _validation_phase(timings, "fields"):
+        for _schema, _fields, _ in iterate_schema(instance, schema):
+            name = _schema["name"]
+            is_required = _schema.get("required", True)
+
+            if test_required and is_required and name not in _fields:
+                is_dirty = True
+                dirty_fields.append(name)
+
+            if name in _fields:
+                field = _fields[name]
+                type_ = _schema.get("type", "")
+
+                # Treat None as if the field is missing.
+                if not is_required and field is None:
+                    continue
 
-            elif type_ == "list:basic:integer:" or type_ == "list:basic:decimal:":
-                for obj in field:
-                    validate_range(obj, _schema.get("range"), name)
+                try:
+                    type_validator = get_type_validator(type_)
+                    if type_validator is not None:
+                        type_validator.validate({"type": type_, "value": field})
+                    else:
+                        TYPE_VALIDATOR.validate([{"type": type_, "value": field}])
+                except jsonschema.exceptions.ValidationError as ex:
+                    raise ValidationError(ex.message)
+
+                choices = [choice["value"] for choice in _schema.get("choices", [])]
+                allow_custom_choice = _schema.get("allow_custom_choice", False)
+                if choices and not allow_custom_choice and field not in choices:
+                    raise ValidationError(
+                        "Value of field '{}' must match one of predefined choices. "
+                        "Current value: {}".format(name, field)
+                    )
 
-    try:
-        # Check that schema definitions exist for all fields
-        for _, _ in iterate_fields(instance, schema):
-            pass
-    except KeyError as ex:
-        raise ValidationError(str(ex))
+                if type_ == "basic:file:":
+                    validate_file(field, _schema.get("validate_regex"))
+
+                elif type_ == "list:basic:file:":
+                    for obj in field:
+                        validate_file(obj, _schema.get("validate_regex"))
+
+                elif type_ == "basic:dir:":
+                    validate_dir(field)
+
+                elif type_ == "list:basic:dir:":
+                    for obj in field:
+                        validate_dir(obj)
+
+                elif type_ == "basic:json:":
+                    storage_refs.append(field)
+
+                elif type_.startswith("data:"):
+                    data_refs.append((field, type_))
+
+                elif type_.startswith("list:data:"):
+                    # Remove `list:` from type.
+                    data_refs.extend((data_id, type_[5:]) for data_id in field)
+
+                elif type_ == "basic:integer:" or type_ == "basic:decimal:":
+                    validate_range(field, _schema.get("range"), name)
+
+                elif type_ == "list:basic:integer:" or type_ == "list:basic:decimal:":
+                    for obj in field:
+                        validate_range(obj, _schema.get("range"), name)
+
+    with _validation_phase(timings, "references"):
+        if storage_refs:
+            validate_storages()
+        if data_refs:
+            validate_data()
+
+    with _validation_phase(timings, "schema"):
+        try:
+            # Check that schema definitions exist for all fields
+            for _, _ in iterate_fields(instance, schema):
+                pass
+        except KeyError as ex:
+            raise ValidationError(str(ex))
+
+    logger.debug(
+        __(
+            "Schema validated ({} data and {} storage references) in {}.",
+            len(data_refs),
+            len(storage_refs),
+            ", ".join(
+                "{}: {:.6f}s".format(phase, duration)
+                for phase, duration in timings.items()
+            ),
+        )
+    )
 
     if is_dirty:
         dirty_fields = ['"{}"'.format(field) for field in dirty_fields]
@@ -288,33 +385,40 @@ def _hydrate_values(output, output_schema, data):
 
         return LazyStorageJSON(pk=storage_id)
 
-    for field_schema, fields in iterate_fields(output, output_schema):
+    for field_schema, fields in compile_schema(output_schema).iterate_fields(
+        output,
+        "basic:file:",
+        "list:basic:file:",
+        "basic:dir:",
+        "list:basic:dir:",
+        "basic:json:",
+        "list:basic:json:",
+    ):
         name = field_schema["name"]
         value = fields[name]
-        if "type" in field_schema:
-            if field_schema["type"].startswith("basic:file:"):
-                value["file"] = hydrate_path(value["file"])
-                value["refs"] = [hydrate_path(ref) for ref in value.get("refs", [])]
+        if field_schema["type"].startswith("basic:file:"):
+            value["file"] = hydrate_path(value["file"])
+            value["refs"] = [hydrate_path(ref) for ref in value.get("refs", [])]
 
-            elif field_schema["type"].startswith("list:basic:file:"):
-                for obj in value:
-                    obj["file"] = hydrate_path(obj["file"])
-                    obj["refs"] = [hydrate_path(ref) for ref in obj.get("refs", [])]
+        elif field_schema["type"].startswith("list:basic:file:"):
+            for obj in value:
+                obj["file"] = hydrate_path(obj["file"])
+                obj["refs"] = [hydrate_path(ref) for ref in obj.get("refs", [])]
 
-            if field_schema["type"].startswith("basic:dir:"):
-                value["dir"] = hydrate_path(value["dir"])
-                value["refs"] = [hydrate_path(ref) for ref in value.get("refs", [])]
+        elif field_schema["type"].startswith("basic:dir:"):
+            value["dir"] = hydrate_path(value["dir"])
+            value["refs"] = [hydrate_path(ref) for ref in value.get("refs", [])]
 
-            elif field_schema["type"].startswith("list:basic:dir:"):
-                for obj in value:
-                    obj["dir"] = hydrate_path(obj["dir"])
-                    obj["refs"] = [hydrate_path(ref) for ref in obj.get("refs", [])]
+        elif field_schema["type"].startswith("list:basic:dir:"):
+            for obj in value:
+                obj["dir"] = hydrate_path(obj["dir"])
+                obj["refs"] = [hydrate_path(ref) for ref in obj.get("refs", [])]
 
-            elif field_schema["type"].startswith("basic:json:"):
-                fields[name] = hydrate_storage(value)
+        elif field_schema["type"].startswith("basic:json:"):
+            fields[name] = hydrate_storage(value)
 
-            elif field_schema["type"].startswith("list:basic:json:"):
-                fields[name] = [hydrate_storage(storage_id) for storage_id in value]
+        elif field_schema["type"].startswith("list:basic:json:"):
+            fields[name] = [hydrate_storage(storage_id) for storage_id in value]
 
 
 def hydrate_input_references(input_, input_schema, hydrate_values=True):
@@ -326,24 +430,51 @@ def hydrate_input_references(input_, input_schema, hydrate_values=True):
     """
     from .data import Data  # prevent circular import
 
-    for field_schema, fields in iterate_fields(input_, input_schema):
+    for field_schema, fields in compile_schema(input_schema).iterate_fields(
+        input_, "data:", "list:data:"
+    ):
         name = field_schema["name"]
         value = fields[name]
-        if "type" in field_schema:
-            if field_schema["type"].startswith("data:"):
-                if value is None:
+        if field_schema["type"].startswith("data:"):
+            if value is None:
+                continue
+
+            try:
+                data = Data.objects.get(id=value)
+            except Data.DoesNotExist:
+                fields[name] = {}
+                continue
+
+            output = copy.deepcopy(data.output)
+            hydrate_input_references(output, data.process.compiled_output_schema)
+            if hydrate_values:
+                _hydrate_values(output, data.process.compiled_output_schema, data)
+            output["__id"] = data.id
+            output["__type"] = data.process.type
+            output["__descriptor"] = data.descriptor
+            output["__name"] = getattr(data, "name", None)
+            output["__entity_name"] = getattr(data.entity, "name", None)
+            output["__output_schema"] = data.process.output_schema
+
+            fields[name] = output
+
+        elif field_schema["type"].startswith("list:data:"):
+            outputs = []
+            for val in value:
+                if val is None:
                     continue
 
                 try:
-                    data = Data.objects.get(id=value)
+                    data = Data.objects.get(id=val)
                 except Data.DoesNotExist:
-                    fields[name] = {}
+                    outputs.append({})
                     continue
 
                 output = copy.deepcopy(data.output)
-                hydrate_input_references(output, data.process.output_schema)
+                hydrate_input_references(output, data.process.compiled_output_schema)
                 if hydrate_values:
-                    _hydrate_values(output, data.process.output_schema, data)
+                    _hydrate_values(output, data.process.compiled_output_schema, data)
+
                 output["__id"] = data.id
                 output["__type"] = data.process.type
                 output["__descriptor"] = data.descriptor
@@ -351,35 +482,9 @@ def hydrate_input_references(input_, input_schema, hydrate_values=True):
                 output["__entity_name"] = getattr(data.entity, "name", None)
                 output["__output_schema"] = data.process.output_schema
 
-                fields[name] = output
-
-            elif field_schema["type"].startswith("list:data:"):
-                outputs = []
-                for val in value:
-                    if val is None:
-                        continue
-
-                    try:
-                        data = Data.objects.get(id=val)
-                    except Data.DoesNotExist:
-                        outputs.append({})
-                        continue
-
-                    output = copy.deepcopy(data.output)
-                    hydrate_input_references(output, data.process.output_schema)
-                    if hydrate_values:
-                        _hydrate_values(output, data.process.output_schema, data)
+                outputs.append(output)
 
-                    output["__id"] = data.id
-                    output["__type"] = data.process.type
-                    output["__descriptor"] = data.descriptor
-                    output["__name"] = getattr(data, "name", None)
-                    output["__entity_name"] = getattr(data.entity, "name", None)
-                    output["__output_schema"] = data.process.output_schema
-
-                    outputs.append(output)
-
-                fields[name] = outputs
+            fields[name] = outputs
 
 
 def hydrate_input_uploads(input_, input_schema, hydrate_values=True):
@@ -392,15 +497,16 @@ def hydrate_input_uploads(input_, input_schema, hydrate_values=True):
     from resolwe.flow.managers import manager
 
     files = []
-    for field_schema, fields in iterate_fields(input_, input_schema):
+    for field_schema, fields in compile_schema(input_schema).iterate_fields(
+        input_, "basic:file:", "list:basic:file:"
+    ):
         name = field_schema["name"]
         value = fields[name]
-        if "type" in field_schema:
-            if field_schema["type"] == "basic:file:":
-                files.append(value)
+        if field_schema["type"] == "basic:file:":
+            files.append(value)
 
-            elif field_schema["type"] == "list:basic:file:":
-                files.extend(value)
+        elif field_schema["type"] == "list:basic:file:":
+            files.extend(value)
 
     urlregex = re.compile(
         r"^(https?|ftp)://[-A-Za-z0-9\+&@#/%?=~_|!:,.;]*[-A-Za-z0-9\+&@#/%=~_|]"
@@ -496,24 +602,25 @@ def hydrate_size(data, force=False):
         obj["total_size"] = obj["size"] + get_refs_size(obj, path)
 
     data_size = 0
-    for field_schema, fields in iterate_fields(data.output, data.process.output_schema):
+    for field_schema, fields in data.process.compiled_output_schema.iterate_fields(
+        data.output, "basic:file:", "list:basic:file:", "basic:dir:", "list:basic:dir:"
+    ):
         name = field_schema["name"]
         value = fields[name]
-        if "type" in field_schema:
-            if field_schema["type"].startswith("basic:file:"):
-                add_file_size(value)
-                data_size += value.get("total_size", 0)
-            elif field_schema["type"].startswith("list:basic:file:"):
-                for obj in value:
-                    add_file_size(obj)
-                    data_size += obj.get("total_size", 0)
-            elif field_schema["type"].startswith("basic:dir:"):
-                add_dir_size(value)
-                data_size += value.get("total_size", 0)
-            elif field_schema["type"].startswith("list:basic:dir:"):
-                for obj in value:
-                    add_dir_size(obj)
-                    data_size += obj.get("total_size", 0)
+        if field_schema["type"].startswith("basic:file:"):
+            add_file_size(value)
+            data_size += value.get("total_size", 0)
+        elif field_schema["type"].startswith("list:basic:file:"):
+            for obj in value:
+                add_file_size(obj)
+                data_size += obj.get("total_size", 0)
+        elif field_schema["type"].startswith("basic:dir:"):
+            add_dir_size(value)
+            data_size += value.get("total_size", 0)
+        elif field_schema["type"].startswith("list:basic:dir:"):
+            for obj in value:
+                add_dir_size(obj)
+                data_size += obj.get("total_size", 0)
 
     data.size = data_size
 
@@ -4,3 +4,5 @@
 CHANNEL_PURGE_WORKER = "flow.purge"
 # Message type for starting the Data purge.
 TYPE_PURGE_RUN = "purge.run"
+# Message type for purging finished Data not purged yet.
+TYPE_PURGE_SWEEP = "purge.sweep"
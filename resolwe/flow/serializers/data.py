@@ -60,6 +60,7 @@ class DataSerializer(ResolweBaseSerializer):
             "process_memory",
             "process_progress",
             "process_rc",
+            "process_resources",
             "process_warning",
             "output",
             "scheduled",
@@ -20,6 +20,26 @@ class RelationPartitionSerializer(SelectiveFieldMixin, serializers.ModelSerializ
         fields = ("id", "entity", "position", "label")
 
 
+class RelationListSerializer(serializers.ListSerializer):
+    """Serializer for creating multiple Relation objects at once."""
+
+    def create(self, validated_data):
+        """Create ``Relation`` objects and insert all their partitions at once."""
+        relations, partitions = [], []
+        with transaction.atomic():
+            for attrs in validated_data:
+                relation_partitions = attrs.pop("relationpartition_set")
+                relation = Relation.objects.create(**attrs)
+                relations.append(relation)
+                partitions.extend(
+                    self.child._build_partitions(relation, relation_partitions)
+                )
+
+            RelationPartition.objects.bulk_create(partitions)
+
+        return relations
+
+
 class RelationSerializer(ResolweBaseSerializer):
     """Serializer for Relation objects."""
 
@@ -33,6 +53,7 @@ class RelationSerializer(ResolweBaseSerializer):
         """RelationSerializer Meta options."""
 
         model = Relation
+        list_serializer_class = RelationListSerializer
         read_only_fields = (
             "created",
             "id",
@@ -55,15 +76,52 @@ class RelationSerializer(ResolweBaseSerializer):
 
         return partitions
 
-    def _create_partitions(self, instance, partitions):
-        """Create partitions."""
-        for partition in partitions:
-            RelationPartition.objects.create(
+    def _build_partitions(self, instance, partitions):
+        """Build (unsaved) partitions of the relation."""
+        return [
+            RelationPartition(
                 relation=instance,
                 entity=partition["entity"],
                 label=partition.get("label", None),
                 position=partition.get("position", None),
             )
+            for partition in partitions
+        ]
+
+    def _create_partitions(self, instance, partitions):
+        """Create partitions."""
+        RelationPartition.objects.bulk_create(
+            self._build_partitions(instance, partitions)
+        )
+
+    def _update_partitions(self, instance, partitions):
+        """Insert, update and delete only partitions that changed."""
+        existing = {
+            partition.entity_id: partition
+            for partition in instance.relationpartition_set.all()
+        }
+
+        created, updated = [], []
+        for partition in self._build_partitions(instance, partitions):
+            current = existing.pop(partition.entity_id, None)
+            if current is None:
+                created.append(partition)
+            elif (current.label, current.position) != (
+                partition.label,
+                partition.position,
+            ):
+                current.label = partition.label
+                current.position = partition.position
+                updated.append(current)
+
+        # Partitions of entities that are no longer in the relation.
+        if existing:
+            RelationPartition.objects.filter(
+                pk__in=[partition.pk for partition in existing.values()]
+            ).delete()
+        if updated:
+            RelationPartition.objects.bulk_update(updated, ["label", "position"])
+        RelationPartition.objects.bulk_create(created)
 
     def create(self, validated_data):
         """Create ``Relation`` object and add partitions of ``Entities``."""
@@ -85,8 +143,6 @@ class RelationSerializer(ResolweBaseSerializer):
             instance = super().update(instance, validated_data)
 
             if partitions is not None:
-                # TODO: Apply the diff instead of recreating all objects.
-                instance.relationpartition_set.all().delete()
-                self._create_partitions(instance, partitions)
+                self._update_partitions(instance, partitions)
 
         return instance
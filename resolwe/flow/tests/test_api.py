@@ -50,6 +50,8 @@ class TestDataViewSetCase(TestCase):
         )
         self.parents_viewset = DataViewSet.as_view(actions={"get": "parents",})
         self.children_viewset = DataViewSet.as_view(actions={"get": "children",})
+        self.ancestors_viewset = DataViewSet.as_view(actions={"get": "ancestors",})
+        self.descendants_viewset = DataViewSet.as_view(actions={"get": "descendants",})
 
         self.collection = Collection.objects.create(contributor=self.contributor)
 
@@ -427,6 +429,81 @@ class TestDataViewSetCase(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]["id"], parent.pk)
 
+    def test_ancestors_descendants(self):
+        data = {
+            name: Data.objects.create(contributor=self.contributor, process=self.proc)
+            for name in "abcde"
+        }
+        for parent, child, kind in [
+            ("a", "b", DataDependency.KIND_IO),
+            ("b", "c", DataDependency.KIND_IO),
+            ("b", "d", DataDependency.KIND_SUBPROCESS),
+            ("c", "e", DataDependency.KIND_IO),
+        ]:
+            DataDependency.objects.create(
+                parent=data[parent], child=data[child], kind=kind
+            )
+        for name in "abcd":
+            assign_perm("view_data", self.user, data[name])
+
+        def get_lineage(viewset, name, **params):
+            request = factory.get("/", params, format="json")
+            force_authenticate(request, self.user)
+            response = viewset(request, pk=data[name].pk)
+            if response.status_code != status.HTTP_200_OK:
+                return response.status_code
+            return {item["id"] for item in response.data}
+
+        def ids(names):
+            return {data[name].pk for name in names}
+
+        # Data object "e" is not visible to the user.
+        self.assertEqual(get_lineage(self.descendants_viewset, "a"), ids("bcd"))
+        self.assertEqual(get_lineage(self.descendants_viewset, "a", depth=1), ids("b"))
+        self.assertEqual(
+            get_lineage(self.descendants_viewset, "a", kind="io"), ids("bc")
+        )
+        self.assertEqual(
+            get_lineage(self.descendants_viewset, "b", kind="subprocess"), ids("d")
+        )
+        self.assertEqual(get_lineage(self.ancestors_viewset, "d"), ids("ab"))
+        self.assertEqual(get_lineage(self.ancestors_viewset, "c", depth=1), ids("b"))
+        self.assertEqual(get_lineage(self.ancestors_viewset, "d", kind="io"), set())
+        self.assertEqual(
+            get_lineage(self.ancestors_viewset, "d", kind="io,subprocess"), ids("ab")
+        )
+        self.assertEqual(
+            get_lineage(self.ancestors_viewset, "e"), status.HTTP_404_NOT_FOUND
+        )
+
+        self.assertEqual(
+            get_lineage(self.descendants_viewset, "a", depth=0),
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            get_lineage(self.descendants_viewset, "a", kind="unknown"),
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_lineage_depth(self):
+        chain = [Data.objects.create(contributor=self.contributor, process=self.proc)]
+        for _ in range(10):
+            child = Data.objects.create(contributor=self.contributor, process=self.proc)
+            DataDependency.objects.create(
+                parent=chain[-1], child=child, kind=DataDependency.KIND_IO
+            )
+            chain.append(child)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                set(chain[0].descendants().values_list("id", flat=True)),
+                {data.pk for data in chain[1:]},
+            )
+        self.assertEqual(
+            set(chain[-1].ancestors(depth=3).values_list("id", flat=True)),
+            {data.pk for data in chain[-4:-1]},
+        )
+
 
 class TestCollectionViewSetCase(TestCase):
     def setUp(self):
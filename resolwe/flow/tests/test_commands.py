@@ -1,6 +1,9 @@
 # pylint: disable=missing-docstring
+import json
 import os
+import tempfile
 from io import StringIO
+from unittest import mock
 
 import yaml
 
@@ -12,8 +15,13 @@ from django.test import override_settings
 from guardian.models import UserObjectPermission
 from guardian.shortcuts import assign_perm, get_perms
 
+from resolwe.flow.management.commands.benchmark_flow import build_topology, percentile
+from resolwe.flow.management.commands.list_docker_images import (
+    Command as ListDockerImagesCommand,
+)
+from resolwe.flow.managers import manager, state
 from resolwe.flow.models import Data, Process
-from resolwe.test import ProcessTestCase, TestCase
+from resolwe.test import ProcessTestCase, TestCase, TransactionTestCase
 
 PROCESSES_DIR = os.path.join(os.path.dirname(__file__), "processes")
 
@@ -90,6 +98,32 @@ class ProcessRegisterTest(TestCase):
         self.assertEqual(UserObjectPermission.objects.filter(user=self.user).count(), 2)
         self.assertTrue(self.user.has_perm("flow.view_process", process))
 
+    def test_cache(self):
+        process_dir = os.path.join(PROCESSES_DIR, "first_version")
+        out, err = StringIO(), StringIO()
+
+        with self.settings(
+            FLOW_PROCESSES_DIRS=[process_dir], FLOW_DESCRIPTORS_DIRS=[process_dir]
+        ):
+            call_command("register", workers=1, stdout=out, stderr=err)
+            self.assertEqual(Process.objects.get(slug="test-proc").version, "1.0.0")
+
+            with mock.patch(
+                "resolwe.flow.management.commands.register.discover_schemas"
+            ) as discover_mock:
+                discover_mock.return_value = ([], None)
+
+                # Unchanged files are not parsed again.
+                out = StringIO()
+                call_command("register", force=True, stdout=out, stderr=err)
+                discover_mock.assert_not_called()
+                self.assertIn("Updated test-proc", out.getvalue())
+
+                call_command(
+                    "register", workers=1, no_cache=True, stdout=out, stderr=err
+                )
+                self.assertTrue(discover_mock.called)
+
     def test_retire(self):
         # No process should be in data base initially
         self.assertEqual(Process.objects.count(), 0)
@@ -230,3 +264,119 @@ class ListDockerImagesTest(ProcessTestCase):
         self.assertEqual("", err.getvalue())
         self.assertIn("resolwe/test:versioning-2", out.getvalue())
         self.assertNotIn("resolwe/test:versioning-1", out.getvalue())
+
+
+class PruneDockerImagesTest(TestCase):
+    @mock.patch.object(ListDockerImagesCommand, "_docker")
+    def test_prune(self, docker_mock):
+        docker_mock.return_value = (
+            0,
+            "\n".join(
+                [
+                    "resolwe/test:base",
+                    "resolwe/test:versioning-1",
+                    "resolwe/base:ubuntu-18.04",
+                    "resolwe/base:latest",
+                    "localhost:5000/tool:1",
+                    "localhost:5000/tool:2",
+                    "other/image:1",
+                    "resolwe/pinned:latest",
+                    "resolwe/pinned:1",
+                    "<none>:<none>",
+                ]
+            ),
+        )
+
+        command = ListDockerImagesCommand()
+        command.prune_images(
+            {
+                "resolwe/test:base",
+                "resolwe/base",
+                "localhost:5000/tool:2",
+                "resolwe/pinned@sha256:0123",
+            },
+            verbosity=0,
+        )
+
+        removed = [
+            call[0][2]
+            for call in docker_mock.call_args_list
+            if call[0][:2] == ("image", "rm")
+        ]
+        self.assertEqual(
+            removed,
+            [
+                "resolwe/test:versioning-1",
+                "resolwe/base:ubuntu-18.04",
+                "localhost:5000/tool:1",
+            ],
+        )
+
+
+class DockerPoolStatsTest(TestCase):
+    def test_stats(self):
+        manager.state.redis.hset(
+            state.MANAGER_DOCKER_POOL_STATS, "hits:resolwe/test:base", 3
+        )
+        manager.state.redis.hset(
+            state.MANAGER_DOCKER_POOL_STATS, "misses:resolwe/test:base", 1
+        )
+
+        out, err = StringIO(), StringIO()
+        call_command("docker_pool_stats", reset=True, stdout=out, stderr=err)
+        self.assertEqual("", err.getvalue())
+        self.assertEqual(
+            out.getvalue(), "resolwe/test:base: 3 hits, 1 misses, 75.0% hit rate\n"
+        )
+
+        out = StringIO()
+        call_command("docker_pool_stats", stdout=out)
+        self.assertEqual(out.getvalue(), "")
+
+
+class BenchmarkFlowTest(TransactionTestCase):
+    def test_topology(self):
+        topology = build_topology(jobs=7, depth=3, fan_out=2, seed=1)
+        self.assertEqual(len(topology), 7)
+        # Jobs of the first level have no parents.
+        self.assertEqual(topology[:2], [[], []])
+        for parents in topology[2:4]:
+            self.assertEqual(len(parents), 2)
+            self.assertTrue(all(parent < 2 for parent in parents))
+        for parents in topology[4:]:
+            self.assertEqual(len(parents), 2)
+            self.assertTrue(all(2 <= parent < 4 for parent in parents))
+
+        self.assertEqual(build_topology(jobs=2, depth=5, fan_out=3), [[], [0]])
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile([3, 1, 2, 4], 99), 4)
+        self.assertEqual(percentile([3, 1, 2, 4], 0), 1)
+
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "results.json")
+            call_command(
+                "benchmark_flow",
+                jobs=4,
+                depth=2,
+                fan_out=2,
+                spawn=1,
+                lines=10,
+                updates=2,
+                external_listener=True,
+                output=output,
+                stdout=StringIO(),
+            )
+            with open(output) as handle:
+                results = json.load(handle)
+
+        # Each of the created jobs spawns another one.
+        self.assertEqual(results["jobs"], 8)
+        self.assertEqual(results["statuses"], {Data.STATUS_DONE: 8})
+        self.assertEqual(results["parameters"]["fan_out"], 2)
+        self.assertEqual(results["latency"]["turnaround"]["count"], 8)
+        self.assertGreater(results["jobs_per_second"], 0)
+        self.assertFalse(Data.objects.exists())
@@ -1,6 +1,8 @@
 # pylint: disable=missing-docstring
 import os
+import shutil
 import subprocess
+import tempfile
 import unittest
 from unittest import mock
 
@@ -9,6 +11,7 @@ from django.test import override_settings
 
 from guardian.shortcuts import assign_perm
 
+from resolwe.flow.executors import resources, transfer
 from resolwe.flow.executors.prepare import BaseFlowExecutorPreparer
 from resolwe.flow.managers import manager
 from resolwe.flow.models import Data, DataDependency, Process
@@ -55,6 +58,121 @@ class GetToolsTestCase(TestCase):
             base_executor.get_tools_paths()
 
 
+class TransferFileTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp_dir, "src.txt")
+        self.dst = os.path.join(self.tmp_dir, "dst.txt")
+        with open(self.src, "w") as handle:
+            handle.write("content")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def read(self, path):
+        with open(path) as handle:
+            return handle.read()
+
+    def test_move(self):
+        mechanism = transfer.transfer_file(self.src, self.dst, move=True)
+        self.assertEqual(mechanism, transfer.TRANSFER_RENAME)
+        self.assertFalse(os.path.exists(self.src))
+        self.assertEqual(self.read(self.dst), "content")
+
+    def test_link(self):
+        mechanism = transfer.transfer_file(self.src, self.dst)
+        self.assertEqual(mechanism, transfer.TRANSFER_HARDLINK)
+        self.assertEqual(os.stat(self.src).st_ino, os.stat(self.dst).st_ino)
+
+    @mock.patch("resolwe.flow.executors.transfer.os.link")
+    @mock.patch("resolwe.flow.executors.transfer.os.rename")
+    def test_fallback(self, rename_mock, link_mock):
+        rename_mock.side_effect = OSError("Cross-device link")
+        link_mock.side_effect = OSError("Cross-device link")
+
+        mechanism = transfer.transfer_file(self.src, self.dst, move=True)
+        self.assertIn(mechanism, [transfer.TRANSFER_REFLINK, transfer.TRANSFER_COPY])
+        self.assertFalse(os.path.exists(self.src))
+        self.assertEqual(self.read(self.dst), "content")
+
+
+class ResourceUsageTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cgroup_root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cgroup_root)
+        super().tearDown()
+
+    def write(self, path, content):
+        path = os.path.join(self.cgroup_root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as handle:
+            handle.write(content)
+
+    def test_cgroup2_usage(self):
+        path = "system.slice/docker-abc.scope"
+        self.write(os.path.join(path, "cgroup.controllers"), "cpu io memory\n")
+        self.write(os.path.join(path, "memory.current"), "{}\n".format(300 * 2 ** 20))
+        self.write(os.path.join(path, "cpu.stat"), "usage_usec 2500000\n")
+        self.write(
+            os.path.join(path, "io.stat"),
+            "8:0 rbytes=1024 wbytes=2048 rios=1 wios=2\n8:16 rbytes=1 wbytes=2\n",
+        )
+
+        with mock.patch.object(resources, "CGROUP_ROOT", self.cgroup_root):
+            usage = resources.cgroup_usage("abc")
+            self.assertIsNone(resources.cgroup_usage("missing"))
+
+        # Without the peak, the current usage is sampled.
+        self.assertEqual(
+            usage,
+            {
+                "max_memory": 300,
+                "cpu_time": 2.5,
+                "io_read": 1025,
+                "io_write": 2050,
+                "sampled": True,
+            },
+        )
+
+        self.write(os.path.join(path, "memory.peak"), "{}\n".format(400 * 2 ** 20))
+        with mock.patch.object(resources, "CGROUP_ROOT", self.cgroup_root):
+            usage = resources.cgroup_usage("abc")
+        self.assertEqual(usage["max_memory"], 400)
+        self.assertNotIn("sampled", usage)
+
+    def test_cgroup1_usage(self):
+        self.write("memory/docker/abc/memory.max_usage_in_bytes", str(512 * 2 ** 20))
+        self.write("cpuacct/docker/abc/cpuacct.usage", "3000000000")
+        self.write(
+            "blkio/docker/abc/blkio.throttle.io_service_bytes",
+            "8:0 Read 100\n8:0 Write 200\n8:0 Total 300\nTotal 300\n",
+        )
+
+        with mock.patch.object(resources, "CGROUP_ROOT", self.cgroup_root):
+            usage = resources.cgroup_usage("abc")
+
+        self.assertEqual(
+            usage,
+            {"max_memory": 512, "cpu_time": 3.0, "io_read": 100, "io_write": 200},
+        )
+
+    def test_usage_difference(self):
+        start = {"max_memory": 10, "cpu_time": 1.0, "io_read": 10, "io_write": 0}
+        end = {"max_memory": 20, "cpu_time": 3.5, "io_read": 30, "io_write": 5}
+        self.assertEqual(
+            resources.usage_difference(start, end),
+            {"max_memory": 20, "cpu_time": 2.5, "io_read": 20, "io_write": 5},
+        )
+
+        start["sampled"] = True
+        self.assertIs(resources.usage_difference(start, end)["sampled"], True)
+
+
 class ManagerRunProcessTest(ProcessTestCase):
     def setUp(self):
         super().setUp()
@@ -3,6 +3,8 @@ import os
 
 from asgiref.sync import async_to_sync
 
+from django.test import override_settings
+
 from guardian.shortcuts import assign_perm
 
 from resolwe.flow.managers import manager
@@ -11,9 +13,11 @@ from resolwe.flow.models import (
     Collection,
     Data,
     DataDependency,
+    DataLocation,
     DescriptorSchema,
     Process,
 )
+from resolwe.flow.utils import metrics
 from resolwe.test import ProcessTestCase, TransactionTestCase
 
 PROCESSES_DIR = os.path.join(os.path.dirname(__file__), "processes")
@@ -192,3 +196,51 @@ class TransactionTestManager(TransactionTestCase):
         async_to_sync(manager.communicate)(run_sync=True)
 
         self.assertEqual(Data.objects.filter(status=Data.STATUS_RESOLVING).count(), 0)
+
+    @disable_auto_calls()
+    def test_reuse_cached_result(self):
+        self.addCleanup(metrics.manager_cache_lookups.reset)
+        process = Process.objects.create(
+            name="Cached process",
+            contributor=self.contributor,
+            type="data:test:",
+            persistence=Process.PERSISTENCE_CACHED,
+            input_schema=[{"name": "value", "type": "basic:integer"}],
+            output_schema=[{"name": "result", "type": "basic:integer"}],
+        )
+        location = DataLocation.objects.create(subpath="cached")
+        cached = Data.objects.create(
+            contributor=self.contributor,
+            process=process,
+            input={"value": 1},
+            output={"result": 2},
+            location=location,
+            status=Data.STATUS_DONE,
+        )
+        assign_perm("view_data", self.contributor, cached)
+
+        data = Data.objects.create(
+            contributor=self.contributor, process=process, input={"value": 1}
+        )
+        # The user may not view the cached data object.
+        data_user = Data.objects.create(
+            contributor=self.user, process=process, input={"value": 1}
+        )
+
+        with override_settings(FLOW_MANAGER_REUSE_RESULTS=True):
+            async_to_sync(manager.communicate)(run_sync=True)
+
+        data.refresh_from_db()
+        self.assertEqual(data.status, Data.STATUS_DONE)
+        self.assertEqual(data.output, {"result": 2})
+        self.assertEqual(data.location, location)
+        self.assertEqual(location.data.count(), 2)
+
+        data_user.refresh_from_db()
+        self.assertEqual(data_user.status, Data.STATUS_WAITING)
+        self.assertIsNone(data_user.location)
+
+        self.assertEqual(
+            metrics.cache_hit_stats(),
+            [{"process": process.slug, "hits": 1, "misses": 1, "hit_rate": 0.5}],
+        )
@@ -0,0 +1,60 @@
+# pylint: disable=missing-docstring
+import math
+
+from resolwe.flow.utils import metrics
+from resolwe.test import TestCase
+
+test_counter = metrics.Counter("test_counter", "Test counter.", labels=("kind",))
+test_gauge = metrics.Gauge("test_gauge", "Test gauge.")
+test_histogram = metrics.Histogram(
+    "test_histogram", "Test histogram.", labels=("kind",), buckets=(1, 10, math.inf)
+)
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        super().setUp()
+        for metric in [test_counter, test_gauge, test_histogram]:
+            self.addCleanup(metric.reset)
+
+    def test_counter(self):
+        test_counter.inc(kind="a")
+        test_counter.inc(2, kind="a")
+        test_counter.inc(kind="b")
+        self.assertEqual(test_counter.collect(), {("a",): 3, ("b",): 1})
+
+    def test_gauge(self):
+        test_gauge.set(5)
+        test_gauge.set(3)
+        self.assertEqual(test_gauge.collect(), {(): 3})
+
+    def test_histogram(self):
+        for value in [0.5, 2, 3, 20]:
+            test_histogram.observe(value, kind="a")
+        test_histogram.observe(5, kind="b")
+
+        samples = test_histogram.collect()
+        self.assertEqual(samples[("a",)]["buckets"], [1, 3, 4])
+        self.assertEqual(samples[("a",)]["count"], 4)
+        self.assertAlmostEqual(samples[("a",)]["sum"], 25.5)
+        self.assertEqual(samples[("b",)]["buckets"], [0, 1, 1])
+
+        self.assertEqual(test_histogram.quantile(samples[("a",)], 0.5), 10)
+        self.assertEqual(test_histogram.quantile(samples[("a",)], 0.99), math.inf)
+
+        test_histogram.reset()
+        self.assertEqual(test_histogram.collect(), {})
+
+    def test_export(self):
+        test_counter.inc(kind='quoted "a"')
+        test_histogram.observe(2, kind="a")
+
+        exported = metrics.export_metrics()
+        self.assertIn("# TYPE resolwe_test_counter counter\n", exported)
+        self.assertIn('resolwe_test_counter{kind="quoted \\"a\\""} 1.0\n', exported)
+        self.assertIn("# TYPE resolwe_test_histogram histogram\n", exported)
+        self.assertIn('resolwe_test_histogram_bucket{kind="a",le="1"} 0\n', exported)
+        self.assertIn('resolwe_test_histogram_bucket{kind="a",le="10"} 1\n', exported)
+        self.assertIn('resolwe_test_histogram_bucket{kind="a",le="+Inf"} 1\n', exported)
+        self.assertIn('resolwe_test_histogram_sum{kind="a"} 2.0\n', exported)
+        self.assertIn('resolwe_test_histogram_count{kind="a"} 1\n', exported)
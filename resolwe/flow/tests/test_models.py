@@ -9,6 +9,7 @@ from unittest.mock import MagicMock, patch
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.test import override_settings
 from django.utils.timezone import now
 
 from guardian.shortcuts import assign_perm, get_perms, remove_perm
@@ -177,6 +178,44 @@ class DataModelTest(TestCase):
 
         self.assertEqual(data.output["output_file"]["size"], 7)
 
+    def test_save_changed_fields(self):
+        process = Process.objects.create(
+            contributor=self.contributor,
+            input_schema=[{"name": "value", "type": "basic:integer:"}],
+            output_schema=[{"name": "result", "type": "basic:integer:"}],
+        )
+        data = Data.objects.create(
+            contributor=self.contributor, process=process, input={"value": 42}
+        )
+        self.assertEqual(data.get_changed_fields(), set())
+
+        with patch("resolwe.flow.models.data.validate_schema") as validate_mock:
+            data.process_progress = 50
+            data.save(update_fields=["process_progress"])
+            self.assertEqual(validate_mock.call_count, 0)
+
+            data.save()
+            self.assertEqual(validate_mock.call_count, 0)
+
+            data.output = {"result": 1}
+            self.assertEqual(data.get_changed_fields(), {"output"})
+            data.save()
+            self.assertEqual(validate_mock.call_count, 1)
+            self.assertEqual(data.get_changed_fields(), set())
+
+            data.output["result"] = 2
+            data.save(update_fields=["output"])
+            self.assertEqual(validate_mock.call_count, 2)
+
+        data.refresh_from_db()
+        self.assertEqual(data.output, {"result": 2})
+        self.assertEqual(data.process_progress, 50)
+
+        data = Data.objects.get(pk=data.pk)
+        data.input = {"value": "forty-two"}
+        with self.assertRaisesRegex(ValidationError, "is not valid"):
+            data.save()
+
     def test_dependencies_single(self):
         process = Process.objects.create(
             slug="test-dependencies",
@@ -416,6 +455,133 @@ class EntityModelTest(TestCase):
         entity_2.type = "sample"
         entity_2.save()
 
+    def test_create_many(self):
+        process_no_entity = Process.objects.create(
+            type="data:test:", contributor=self.contributor
+        )
+        children = Data.objects.create_many(
+            [
+                {
+                    "name": "Child {}".format(index),
+                    "contributor": self.contributor,
+                    "process": self.process,
+                }
+                for index in range(3)
+            ]
+            + [{"contributor": self.contributor, "process": process_no_entity}],
+            subprocess_parent=self.data,
+        )
+
+        # Children are added to the entity of their parent.
+        self.assertEqual(len(children), 4)
+        self.assertEqual(Entity.objects.count(), 1)
+        for child in children[:3]:
+            child.refresh_from_db()
+            self.assertEqual(child.entity, self.data.entity)
+            self.assertIn("view_data", get_perms(self.contributor, child))
+        children[3].refresh_from_db()
+        self.assertIsNone(children[3].entity)
+        self.assertEqual(
+            DataDependency.objects.filter(
+                parent=self.data, kind=DataDependency.KIND_SUBPROCESS
+            ).count(),
+            4,
+        )
+
+        # New entities are added to the collection of data objects.
+        collection = Collection.objects.create(
+            contributor=self.contributor, tags=["foo"]
+        )
+        assign_perm("view_collection", self.user, collection)
+        data = Data.objects.create_many(
+            [
+                {
+                    "name": "Sample {}".format(index),
+                    "contributor": self.contributor,
+                    "process": self.process,
+                    "collection": collection,
+                }
+                for index in range(3)
+            ]
+        )
+
+        self.assertEqual(Entity.objects.count(), 4)
+        self.assertEqual(len({datum.entity.slug for datum in data}), 3)
+        for datum in data:
+            datum.refresh_from_db()
+            self.assertEqual(datum.entity.name, datum.name)
+            self.assertEqual(datum.entity.collection, collection)
+            self.assertEqual(datum.entity.tags, ["foo"])
+            self.assertEqual(get_perms(self.user, datum), ["view_data"])
+            self.assertEqual(get_perms(self.user, datum.entity), ["view_entity"])
+            self.assertIn("owner_entity", get_perms(self.contributor, datum.entity))
+
+    def test_create_many_indexes_permissions(self):
+        from resolwe.flow.elastic_indexes.data import DataDocument
+        from resolwe.flow.elastic_indexes.entity import EntityDocument
+
+        collection = Collection.objects.create(contributor=self.contributor)
+        assign_perm("view_collection", self.user, collection)
+        data = Data.objects.create_many(
+            [
+                {
+                    "name": "Sample {}".format(index),
+                    "contributor": self.contributor,
+                    "process": self.process,
+                    "collection": collection,
+                }
+                for index in range(2)
+            ]
+        )
+
+        # Permissions assigned in bulk are in the search indexes.
+        for datum in data:
+            datum.refresh_from_db()
+            for document_class, obj in [
+                (DataDocument, datum),
+                (EntityDocument, datum.entity),
+            ]:
+                es_objects = document_class.search().filter("term", id=obj.pk).execute()
+                self.assertEqual(len(es_objects), 1)
+                self.assertCountEqual(
+                    es_objects[0].users_with_permissions,
+                    [self.contributor.pk, self.user.pk],
+                )
+
+    def test_move_to_collection(self):
+        data_2 = Data.objects.create(
+            name="Test data 2", contributor=self.contributor, process=self.process
+        )
+        source = Collection.objects.create(contributor=self.contributor)
+        destination = Collection.objects.create(
+            contributor=self.contributor, tags=["foo", "bar"]
+        )
+        assign_perm("view_collection", self.user, destination)
+        Entity.objects.update(collection=source)
+        Data.objects.update(collection=source)
+
+        Entity.objects.all().move_to_collection(source, destination)
+
+        self.assertEqual(destination.entity_set.count(), 2)
+        self.assertEqual(source.entity_set.count(), 0)
+        for data in [self.data, data_2]:
+            data.refresh_from_db()
+            self.assertEqual(data.collection, destination)
+            self.assertEqual(data.tags, ["foo", "bar"])
+            self.assertEqual(data.entity.collection, destination)
+            self.assertEqual(data.entity.tags, ["foo", "bar"])
+            self.assertEqual(get_perms(self.user, data), ["view_data"])
+            self.assertEqual(get_perms(self.user, data.entity), ["view_entity"])
+
+        # Moving out of collection keeps tags and permissions.
+        entity = self.data.entity
+        entity.move_to_collection(destination, None)
+        self.assertEqual(entity.collection, None)
+        self.data.refresh_from_db()
+        self.assertEqual(self.data.collection, None)
+        self.assertEqual(self.data.tags, ["foo", "bar"])
+        self.assertEqual(get_perms(self.user, self.data), ["view_data"])
+
 
 class GetOrCreateTestCase(APITestCase):
     def setUp(self):
@@ -1058,6 +1224,105 @@ class DuplicateTestCase(TestCase):
         # Assert permissions.
         self.assertEqual(len(get_perms(self.contributor, duplicate)), 4)
 
+    def test_collection_duplicate_bulk(self):
+        process1 = Process.objects.create(
+            contributor=self.user, type="data:test:first:",
+        )
+        process2 = Process.objects.create(
+            contributor=self.user,
+            input_schema=[{"name": "data_field", "type": "data:test:first:"}],
+        )
+
+        collection = Collection.objects.create(name="Collection", contributor=self.user)
+        for _ in range(3):
+            entity = Entity.objects.create(
+                name="Entity", contributor=self.user, collection=collection
+            )
+            assign_perm("view_entity", self.contributor, entity)
+            parent = Data.objects.create(
+                name="Parent",
+                contributor=self.user,
+                process=process1,
+                status=Data.STATUS_DONE,
+                entity=entity,
+                collection=collection,
+            )
+            child = Data.objects.create(
+                name="Child",
+                contributor=self.user,
+                process=process2,
+                input={"data_field": parent.id},
+                status=Data.STATUS_DONE,
+                entity=entity,
+                collection=collection,
+            )
+            assign_perm("view_data", self.contributor, parent)
+            assign_perm("view_data", self.contributor, child)
+
+        progress = MagicMock()
+        duplicate = Collection.objects.filter(id=collection.id).duplicate(
+            self.contributor, progress=progress
+        )[0]
+
+        # Collection, 3 entities and 6 data objects are copied.
+        progress.assert_called_with(10, 10)
+
+        entities = duplicate.entity_set.order_by("id")
+        self.assertEqual(
+            [entity.slug for entity in entities],
+            ["copy-of-entity", "copy-of-entity-2", "copy-of-entity-3"],
+        )
+        self.assertEqual(duplicate.data.count(), 6)
+
+        for entity in entities:
+            self.assertEqual(len(get_perms(self.contributor, entity)), 4)
+            parent = entity.data.get(name="Copy of Parent")
+            child = entity.data.get(name="Copy of Child")
+            self.assertEqual(child.collection, duplicate)
+            self.assertEqual(len(get_perms(self.contributor, child)), 4)
+
+            # Inputs are rewired to copies and dependencies are copied.
+            self.assertEqual(child.input["data_field"], parent.id)
+            original = child.parents.exclude(id=parent.id).get()
+            self.assertEqual(original.name, "Parent")
+            self.assertEqual(original.entity.collection, collection)
+
+    def test_collection_duplicate_across_entities(self):
+        process1 = Process.objects.create(
+            contributor=self.user, type="data:test:first:",
+        )
+        process2 = Process.objects.create(
+            contributor=self.user,
+            input_schema=[{"name": "data_field", "type": "data:test:first:"}],
+        )
+
+        collection = Collection.objects.create(name="Collection", contributor=self.user)
+        parent = Data.objects.create(
+            name="Parent",
+            contributor=self.user,
+            process=process1,
+            status=Data.STATUS_DONE,
+            entity=Entity.objects.create(contributor=self.user, collection=collection),
+            collection=collection,
+        )
+        Data.objects.create(
+            name="Child",
+            contributor=self.user,
+            process=process2,
+            input={"data_field": parent.id},
+            status=Data.STATUS_DONE,
+            entity=Entity.objects.create(contributor=self.user, collection=collection),
+            collection=collection,
+        )
+
+        duplicate = Collection.objects.filter(id=collection.id).duplicate(self.user)[0]
+
+        # Inputs are not rewired across entities, so the copy only
+        # depends on the original parent.
+        child = duplicate.data.get(name="Copy of Child")
+        self.assertEqual(child.input["data_field"], parent.id)
+        self.assertEqual(list(child.parents.all()), [parent])
+
 
 class ProcessModelTest(TestCase):
     def test_process_isactive(self):
@@ -1070,6 +1335,76 @@ class ProcessModelTest(TestCase):
         # the is_active flag is saved
         self.assertFalse(process_fetched.is_active)
 
+    def test_adaptive_resource_limits(self):
+        process = Process.objects.create(
+            contributor=self.contributor,
+            requirements={"resources": {"cores": 4, "memory": 8192}},
+        )
+        started = now()
+        for memory in range(100, 1100, 100):
+            data = Data.objects.create(contributor=self.contributor, process=process)
+            Data.objects.filter(pk=data.pk).update(
+                status=Data.STATUS_DONE,
+                started=started,
+                finished=started + timedelta(seconds=100),
+                process_resources={
+                    "max_memory": memory,
+                    "cpu_time": 150.0,
+                    "io_read": 0,
+                    "io_write": 0,
+                },
+            )
+
+        static_limits = {"cores": 4, "memory": 8192}
+        self.assertEqual(process.get_resource_limits(), static_limits)
+
+        with override_settings(FLOW_PROCESS_ADAPTIVE_RESOURCES={"APPLY": True}):
+            # The 95th percentile of peak memory with a 20% margin and
+            # the 95th percentile of average used cores rounded up.
+            self.assertEqual(
+                process.get_resource_limits(), {"cores": 2, "memory": 1200}
+            )
+            self.assertEqual(process.get_resource_limits(adaptive=False), static_limits)
+
+        with override_settings(
+            FLOW_PROCESS_ADAPTIVE_RESOURCES={"APPLY": True, "MIN_MEMORY": 2048}
+        ):
+            self.assertEqual(
+                process.get_resource_limits(), {"cores": 2, "memory": 2048}
+            )
+
+        # Inaccurate measurements are not used.
+        for flag in ["sampled", "pooled"]:
+            data = Data.objects.create(contributor=self.contributor, process=process)
+            Data.objects.filter(pk=data.pk).update(
+                status=Data.STATUS_DONE,
+                process_resources={"max_memory": 5000, "cpu_time": 0.0, flag: True},
+            )
+
+        with override_settings(
+            FLOW_PROCESS_ADAPTIVE_RESOURCES={"APPLY": True, "MIN_SAMPLES": 11}
+        ):
+            self.assertEqual(process.get_resource_limits(), static_limits)
+
+        # Jobs that failed at their memory limit raise it.
+        data = Data.objects.create(contributor=self.contributor, process=process)
+        Data.objects.filter(pk=data.pk).update(
+            status=Data.STATUS_ERROR,
+            process_memory=1200,
+            process_resources={"max_memory": 1200, "cpu_time": 0.0},
+        )
+        with override_settings(FLOW_PROCESS_ADAPTIVE_RESOURCES={"APPLY": True}):
+            self.assertEqual(
+                process.get_resource_limits(), {"cores": 2, "memory": 1800}
+            )
+
+            # Limits of a dispatched job are stored and reused.
+            data.refresh_from_db()
+            self.assertEqual(data.get_resource_limits(), {"cores": 2, "memory": 1800})
+            data.process_memory = 1000
+            data.process_cores = 1
+            self.assertEqual(data.get_resource_limits(), {"cores": 1, "memory": 1000})
+
 
 @patch("resolwe.flow.models.utils.os")
 class HydrateFileSizeUnitTest(TestCase):
@@ -558,3 +558,67 @@ class PurgeUnitTest(PurgeTestFieldsMixin, ProcessTestCase):
 
         purge._storage_purge_all(delete=True)
         self.assertEqual(Storage.objects.count(), 1)
+
+    # This patch is required so that the manager is not invoked while saving Data.
+    @disable_auto_calls()
+    def test_report(self):
+        data = Data.objects.create(**self.data)
+        data_location = DataLocation.objects.create(subpath="")
+        data_location.subpath = str(data_location.id)
+        data_location.save()
+        data_location.data.add(data)
+        data.status = Data.STATUS_DONE
+        data.output = {"sample": {"file": "test-file"}}
+        self.create_test_file(data.location, "test-file")
+        self.create_test_file(data.location, "removeme")
+        with open(data.location.get_path(filename="removeme"), "w") as handle:
+            handle.write("data")
+        data.save()
+
+        report = purge.purge_all(workers=2)
+        self.assertEqual(report, {"locations": 1, "files": 1, "bytes": 4})
+        self.assertTrue(os.path.isfile(data.location.get_path(filename="removeme")))
+
+        report = purge.purge_all(delete=True, workers=2)
+        self.assertEqual(report, {"locations": 1, "files": 1, "bytes": 4})
+        self.assertFalse(os.path.isfile(data.location.get_path(filename="removeme")))
+        self.assertTrue(os.path.isfile(data.location.get_path(filename="test-file")))
+
+    # This patch is required so that the manager is not invoked while saving Data.
+    @disable_auto_calls()
+    def test_sweep(self):
+        locations = {}
+        for status in [Data.STATUS_DONE, Data.STATUS_PROCESSING]:
+            data = Data.objects.create(**self.data)
+            data_location = DataLocation.objects.create(subpath="")
+            data_location.subpath = str(data_location.id)
+            data_location.save()
+            data_location.data.add(data)
+            data.status = status
+            data.output = {"sample": {"file": "test-file"}}
+            self.create_test_file(data.location, "test-file")
+            self.create_test_file(data.location, "removeme")
+            data.save()
+            locations[status] = data_location
+
+        # Orphaned locations are left to the full purge.
+        orphan = DataLocation.objects.create(subpath="orphan")
+
+        report = purge.purge_sweep()
+        self.assertEqual(report["locations"], 1)
+        self.assertFalse(
+            os.path.isfile(locations[Data.STATUS_DONE].get_path(filename="removeme"))
+        )
+        self.assertTrue(
+            os.path.isfile(
+                locations[Data.STATUS_PROCESSING].get_path(filename="removeme")
+            )
+        )
+        self.assertTrue(DataLocation.objects.filter(id=orphan.id).exists())
+
+        locations[Data.STATUS_DONE].refresh_from_db()
+        self.assertTrue(locations[Data.STATUS_DONE].purged)
+
+        # Purged locations are not swept again.
+        report = purge.purge_sweep()
+        self.assertEqual(report["locations"], 0)
@@ -4,8 +4,9 @@ import os
 from django.apps import apps
 from django.core.management import call_command
 
-from guardian.shortcuts import assign_perm
+from guardian.shortcuts import assign_perm, get_perms
 from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
 
 from resolwe.flow.models import Collection, Entity, Relation
 from resolwe.flow.models.entity import RelationPartition, RelationType
@@ -384,6 +385,88 @@ class TestRelationsAPI(TransactionResolweAPITestCase):
             ).exists()
         )
 
+    def test_update_partitions_diff(self):
+        data = {
+            "partitions": [
+                {"entity": self.entity_1.pk, "label": "beginning", "position": 0},
+                {"entity": self.entity_2.pk, "label": "middle", "position": 1},
+                {"entity": self.entity_4.pk, "label": "end", "position": 2},
+            ],
+        }
+        resp = self._patch(self.relation_series.pk, data, user=self.contributor)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        partitions = {
+            partition.entity_id: partition
+            for partition in self.relation_series.relationpartition_set.all()
+        }
+        self.assertEqual(
+            set(partitions), {self.entity_1.pk, self.entity_2.pk, self.entity_4.pk}
+        )
+        # Existing partitions are kept and only changed ones are updated.
+        self.assertEqual(partitions[self.entity_1.pk].pk, self.series_partiton_1.pk)
+        self.assertEqual(partitions[self.entity_2.pk].pk, self.series_partiton_2.pk)
+        self.assertEqual(partitions[self.entity_2.pk].label, "middle")
+        self.assertEqual(partitions[self.entity_2.pk].position, 1)
+        self.assertEqual(partitions[self.entity_4.pk].pk, self.series_partiton_4.pk)
+        self.assertEqual(partitions[self.entity_4.pk].position, 2)
+        self.assertFalse(
+            RelationPartition.objects.filter(pk=self.series_partiton_3.pk).exists()
+        )
+
+    def test_bulk_create(self):
+        bulk_create_viewset = RelationViewSet.as_view(actions={"post": "bulk_create"})
+        data = [
+            {
+                "collection": self.collection.pk,
+                "type": "group",
+                "category": "clones",
+                "partitions": [
+                    {"entity": self.entity_3.pk},
+                    {"entity": self.entity_4.pk},
+                ],
+            },
+            {
+                "collection": self.collection.pk,
+                "type": "series",
+                "category": "time series",
+                "partitions": [
+                    {"entity": self.entity_3.pk, "position": 1},
+                    {"entity": self.entity_4.pk, "position": 2},
+                ],
+            },
+        ]
+
+        request = APIRequestFactory().post("", data, format="json")
+        force_authenticate(request, self.contributor)
+        resp = bulk_create_viewset(request)
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(resp.data), 2)
+        self.assertEqual(len(resp.data[1]["partitions"]), 2)
+
+        relation = Relation.objects.get(category="time series")
+        self.assertEqual(relation.contributor, self.contributor)
+        self.assertIn("owner_relation", get_perms(self.contributor, relation))
+        self.assertTrue(
+            relation.relationpartition_set.filter(
+                entity=self.entity_4.pk, position=2
+            ).exists()
+        )
+
+        # Nothing is created if any of the relations is invalid.
+        data[0]["category"] = "other clones"
+        data[1]["type"] = "unknown"
+        request = APIRequestFactory().post("", data, format="json")
+        force_authenticate(request, self.contributor)
+        resp = bulk_create_viewset(request)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Relation.objects.filter(category="other clones").exists())
+
+        request = APIRequestFactory().post("", data[0], format="json")
+        force_authenticate(request, self.contributor)
+        resp = bulk_create_viewset(request)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_update_superuser(self):
         data = {"collection": self.collection_2.pk}
         resp = self._patch(self.relation_group.pk, data, user=self.admin)
@@ -6,7 +6,7 @@ from django.core.exceptions import ValidationError
 from rest_framework.response import Response
 
 from resolwe.flow.models import Data, Process
-from resolwe.flow.utils import get_data_checksum
+from resolwe.flow.utils import compile_schema, get_data_checksum, iterate_fields
 from resolwe.flow.utils.exceptions import resolwe_exception_handler
 from resolwe.test import TestCase
 
@@ -45,3 +45,78 @@ class ExceptionsTestCase(TestCase):
         self.assertEqual(
             checksum, "ca322c2bb48b58eea3946e624fe6cfdc53c2cc12478465b6f0ca2d722e280c4c"
         )
+
+
+class CompiledSchemaTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.schema = [
+            {"name": "reads", "type": "data:reads:"},
+            {
+                "name": "options",
+                "group": [
+                    {"name": "genome", "type": "basic:file:"},
+                    {"name": "annotation", "type": "basic:file:html:"},
+                    {"name": "threads", "type": "basic:integer:"},
+                ],
+            },
+        ]
+
+    def test_lookups(self):
+        compiled = compile_schema(self.schema)
+        self.assertEqual(list(compiled), self.schema)
+        self.assertEqual(len(compiled), 2)
+        self.assertEqual(set(compiled.fields), {"reads", "options"})
+        self.assertEqual(set(compiled.groups), {"options"})
+        self.assertEqual(
+            set(compiled.paths),
+            {"reads", "options.genome", "options.annotation", "options.threads"},
+        )
+        self.assertEqual(
+            [path for path, _ in compiled.fields_of_type("basic:file:")],
+            [("options", "genome"), ("options", "annotation")],
+        )
+        self.assertIs(compile_schema(compiled), compiled)
+
+    def test_iterate_fields(self):
+        compiled = compile_schema(self.schema)
+        values = {
+            "reads": 1,
+            "options": {"genome": {"file": "genome.fa"}, "threads": 4},
+        }
+
+        fields = list(compiled.iterate_fields(values, "basic:file:", "data:"))
+        self.assertEqual(
+            [field_schema["name"] for field_schema, _ in fields], ["reads", "genome"]
+        )
+        self.assertIs(fields[0][1], values)
+        self.assertIs(fields[1][1], values["options"])
+
+        self.assertEqual(list(compiled.iterate_fields({}, "basic:file:")), [])
+        self.assertEqual(
+            list(compiled.iterate_fields({"options": None}, "basic:file:")), []
+        )
+
+        # Compiled schemas can be used in place of plain schemas.
+        self.assertEqual(
+            list(iterate_fields(values, compiled)),
+            list(iterate_fields(values, self.schema)),
+        )
+
+    def test_cache(self):
+        process = Process.objects.create(
+            contributor=self.contributor, input_schema=self.schema
+        )
+        self.assertIs(process.compiled_input_schema, process.compiled_input_schema)
+
+        # Compiled schema is reused by other instances of the same process.
+        fetched = Process.objects.get(pk=process.pk)
+        self.assertIs(fetched.compiled_input_schema, process.compiled_input_schema)
+
+        # Saved changes update the modification time and the cache key.
+        process.input_schema = [{"name": "reads", "type": "data:reads:"}]
+        process.save()
+        self.assertEqual(set(process.compiled_input_schema.paths), {"reads"})
+        process.input_schema.append({"name": "threads", "type": "basic:integer:"})
+        process.save()
+        self.assertEqual(set(process.compiled_input_schema.paths), {"reads", "threads"})
@@ -205,6 +205,32 @@ class ValidationTest(TestCase):
         with self.assertRaisesRegex(ValidationError, "`Data` object does not exist"):
             Data.objects.create(**data)
 
+    def test_referenced_data_batched(self):
+        proc = Process.objects.create(
+            name="Referenced process",
+            contributor=self.user,
+            type="data:referenced:object:",
+        )
+        data_ids = [
+            Data.objects.create(contributor=self.user, process=proc).pk
+            for _ in range(5)
+        ]
+        schema = [{"name": "data_list", "type": "list:data:referenced:"}]
+
+        timings = {}
+        with self.assertNumQueries(1):
+            validate_schema({"data_list": data_ids}, schema, timings=timings)
+        self.assertEqual(set(timings), {"fields", "references", "schema"})
+
+        with self.assertRaisesRegex(ValidationError, "`Data` object does not exist"):
+            validate_schema({"data_list": data_ids + [data_ids[-1] + 1000]}, schema)
+
+        schema = [{"name": "data_list", "type": "list:data:wrong:"}]
+        with self.assertRaisesRegex(
+            ValidationError, "Data object of type .* is required"
+        ):
+            validate_schema({"data_list": data_ids}, schema)
+
     def test_delete_input(self):
         proc1 = Process.objects.create(
             name="Referenced process",
@@ -7,12 +7,24 @@ Flow Utilities
 .. automodule:: resolwe.flow.utils.purge
    :members:
 
+.. automodule:: resolwe.flow.utils.duplicate
+   :members:
+
 .. automodule:: resolwe.flow.utils.exceptions
    :members:
 
 .. automodule:: resolwe.flow.utils.stats
    :members:
 
+.. automodule:: resolwe.flow.utils.metrics
+   :members:
+
+.. automodule:: resolwe.flow.utils.resources
+   :members:
+
+.. automodule:: resolwe.flow.utils.schema
+   :members:
+
 """
 import functools
 import hashlib
@@ -24,14 +36,18 @@ from django.conf import settings
 from django.db import models
 
 from .iterators import iterate_dict, iterate_fields, iterate_schema
+from .schema import CompiledSchema, compile_schema
 
 __all__ = (
+    "CompiledSchema",
+    "compile_schema",
     "dict_dot",
     "get_apps_tools",
     "get_data_checksum",
     "iterate_dict",
     "iterate_fields",
     "iterate_schema",
+    "rewire_input",
     "rewire_inputs",
 )
 
@@ -118,6 +134,37 @@ def get_apps_tools():
     return tools_paths
 
 
+def rewire_input(data, mapped_ids):
+    """Replace references to original data objects on the input.
+
+    :param data: data object model instance whose input is mutated
+    :param dict mapped_ids: ids of original data objects mapped to ids
+        of their copies
+    :return: ``True`` if the input was changed
+    :rtype: bool
+    """
+    updated = False
+    for field_schema, fields in data.process.compiled_input_schema.iterate_fields(
+        data.input, "data:", "list:data:"
+    ):
+        name = field_schema["name"]
+        value = fields[name]
+
+        if field_schema["type"].startswith("data:") and value in mapped_ids:
+            fields[name] = mapped_ids[value]
+            updated = True
+
+        elif field_schema["type"].startswith("list:data:") and any(
+            [id_ in mapped_ids for id_ in value]
+        ):
+            fields[name] = [
+                mapped_ids[id_] if id_ in mapped_ids else id_ for id_ in value
+            ]
+            updated = True
+
+    return updated
+
+
 def rewire_inputs(data_list):
     """Rewire inputs of provided data objects.
 
@@ -134,28 +181,7 @@ def rewire_inputs(data_list):
     mapped_ids = {bundle["original"].id: bundle["copy"].id for bundle in data_list}
 
     for bundle in data_list:
-        updated = False
-        copy = bundle["copy"]
-
-        for field_schema, fields in iterate_fields(
-            copy.input, copy.process.input_schema
-        ):
-            name = field_schema["name"]
-            value = fields[name]
-
-            if field_schema["type"].startswith("data:") and value in mapped_ids:
-                fields[name] = mapped_ids[value]
-                updated = True
-
-            elif field_schema["type"].startswith("list:data:") and any(
-                [id_ in mapped_ids for id_ in value]
-            ):
-                fields[name] = [
-                    mapped_ids[id_] if id_ in mapped_ids else id_ for id_ in value
-                ]
-                updated = True
-
-        if updated:
-            copy.save()
+        if rewire_input(bundle["copy"], mapped_ids):
+            bundle["copy"].save()
 
     return data_list
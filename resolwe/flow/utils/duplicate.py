@@ -0,0 +1,461 @@
+""".. Ignore pydocstyle D400.
+
+================
+Bulk Duplication
+================
+
+Collections, entities and data objects are copied with bulk inserts.
+Ids of originals are mapped to ids of their copies in memory, so
+dependencies, storages, migration history and permissions of all copies
+are copied with a few queries per batch instead of several queries per
+object.
+
+"""
+import copy
+import logging
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.utils.timezone import now
+
+from resolwe.elastic.builder import index_builder
+from resolwe.flow.models import (
+    Collection,
+    Data,
+    DataDependency,
+    DataMigrationHistory,
+    Entity,
+    Process,
+    Storage,
+)
+from resolwe.flow.models.base import bulk_create_with_slugs
+from resolwe.flow.utils import rewire_input
+from resolwe.permissions.shortcuts import get_objects_for_user
+from resolwe.permissions.utils import (
+    bulk_assign_contributor_permissions,
+    bulk_copy_permissions,
+)
+from resolwe.utils import BraceMessage as __
+
+logger = logging.getLogger(__name__)
+
+#: Number of objects inserted with a single query.
+DUPLICATE_BATCH_SIZE = 500
+
+
+class BulkDuplicator:
+    """Copy objects of a single duplication request.
+
+    :param contributor: duplication user
+    :param progress: optional callable called with the number of
+        copied objects and the total number of objects after every
+        inserted batch
+    """
+
+    def __init__(self, contributor=None, progress=None):
+        """Initialize duplicator."""
+        self.contributor = contributor
+        self.progress = progress
+        self.duplicated = now()
+
+        #: total number of objects to copy
+        self.total = 0
+        #: number of copied objects
+        self.copied = 0
+
+        # Copies by their model, used to rebuild search indexes.
+        self._copies = defaultdict(list)
+
+    def _report_progress(self, count):
+        """Report that ``count`` more objects were copied."""
+        self.copied += count
+        logger.debug(__("Duplicated {} of {} objects.", self.copied, self.total))
+        if self.progress:
+            self.progress(self.copied, self.total)
+
+    def _check_edit_permission(self, model, ids):
+        """Ensure that contributor can edit objects with the given ids."""
+        objects = model.objects.in_bulk([id_ for id_ in ids if id_ is not None])
+        model_name = model._meta.model_name
+        for id_ in ids:
+            obj = objects.get(id_)
+            if not self.contributor.has_perm("edit_{}".format(model_name), obj):
+                raise ValidationError(
+                    "You do not have edit permission on {} {}.".format(model_name, obj)
+                )
+
+        return objects
+
+    def _copy(self, original):
+        """Return an unsaved copy of the original object."""
+        model = type(original)
+        duplicate = model(
+            **{
+                field.attname: copy.deepcopy(getattr(original, field.attname))
+                for field in model._meta.concrete_fields
+                if not field.primary_key
+            }
+        )
+
+        duplicate.slug = None
+        duplicate.name = "Copy of {}".format(original.name)
+        name_max_len = model._meta.get_field("name").max_length
+        if len(duplicate.name) > name_max_len:
+            duplicate.name = duplicate.name[: (name_max_len - 3)] + "..."
+        duplicate.duplicated = self.duplicated
+        if self.contributor:
+            duplicate.contributor = self.contributor
+
+        return duplicate
+
+    def _insert(self, originals, copies):
+        """Insert copies in batches and inherit creation times."""
+        if not copies:
+            return
+
+        model = type(copies[0])
+        for start in range(0, len(copies), DUPLICATE_BATCH_SIZE):
+            batch = copies[start : start + DUPLICATE_BATCH_SIZE]
+            bulk_create_with_slugs(model, batch)
+            self._report_progress(len(batch))
+
+        # Override fields that are automatically set on create.
+        for original, duplicate in zip(originals, copies):
+            duplicate.created = original.created
+        model.objects.bulk_update(copies, ["created"], batch_size=DUPLICATE_BATCH_SIZE)
+
+        self._copies[model].extend(copies)
+
+    def copy_collections(self, collections):
+        """Copy collections.
+
+        :return: list of copies in the order of originals
+        """
+        copies = [self._copy(collection) for collection in collections]
+        self._insert(collections, copies)
+        bulk_assign_contributor_permissions(copies)
+
+        return copies
+
+    def copy_entities(self, entities, inherit_collection=False, assign=None):
+        """Copy entities.
+
+        :param inherit_collection: If ``True`` then copies are added to
+            collections of originals and inherit their permissions
+        :param assign: optional callable called with the original and
+            its copy before the copy is inserted, used to add copies to
+            duplicated collections
+        :return: list of copies in the order of originals
+        """
+        collections = {}
+        if inherit_collection:
+            collections = self._check_edit_permission(
+                Collection, {entity.collection_id for entity in entities}
+            )
+
+        copies = []
+        for entity in entities:
+            duplicate = self._copy(entity)
+            duplicate.collection_id = (
+                entity.collection_id if inherit_collection else None
+            )
+            copies.append(duplicate)
+
+        permission_sources = [
+            collections.get(duplicate.collection_id) for duplicate in copies
+        ]
+
+        if assign:
+            for entity, duplicate in zip(entities, copies):
+                assign(entity, duplicate)
+
+        self._insert(entities, copies)
+        bulk_assign_contributor_permissions(copies)
+        bulk_copy_permissions(zip(permission_sources, copies))
+
+        return copies
+
+    def copy_data(
+        self,
+        data,
+        inherit_entity=False,
+        inherit_collection=False,
+        assign=None,
+        rewire_key=None,
+    ):
+        """Copy data objects.
+
+        Inputs of copies referencing other copied data objects are
+        rewired to their copies.
+
+        :param inherit_entity: If ``True`` then copies are added to
+            entities of originals and inherit their permissions
+        :param inherit_collection: If ``True`` then copies are added to
+            collections of originals and inherit their permissions
+        :param assign: optional callable called with the original and
+            its copy before the copy is inserted, used to add copies to
+            duplicated entities and collections
+        :param rewire_key: optional callable returning the group of the
+            original, inputs are only rewired to copies of data objects
+            in the same group
+        :return: list of copies in the order of originals
+        """
+        for datum in data:
+            if datum.status not in [Data.STATUS_DONE, Data.STATUS_ERROR]:
+                raise ValidationError(
+                    "Data object must have done or error status to be duplicated"
+                )
+
+        entities = {}
+        if inherit_entity:
+            entities = self._check_edit_permission(
+                Entity, {datum.entity_id for datum in data}
+            )
+        collections = {}
+        if inherit_collection:
+            collections = self._check_edit_permission(
+                Collection, {datum.collection_id for datum in data}
+            )
+
+        processes = Process.objects.in_bulk({datum.process_id for datum in data})
+        copies = []
+        for datum in data:
+            duplicate = self._copy(datum)
+            duplicate.process = processes[datum.process_id]
+            duplicate.entity_id = datum.entity_id if inherit_entity else None
+            duplicate.collection_id = (
+                datum.collection_id if inherit_collection else None
+            )
+            copies.append(duplicate)
+
+        permission_sources = [
+            (
+                entities.get(duplicate.entity_id),
+                collections.get(duplicate.collection_id),
+            )
+            for duplicate in copies
+        ]
+
+        if assign:
+            for datum, duplicate in zip(data, copies):
+                assign(datum, duplicate)
+
+        self._insert(data, copies)
+        mapped_ids = {datum.id: duplicate.id for datum, duplicate in zip(data, copies)}
+
+        storages = Storage.data.through
+        storages.objects.bulk_create(
+            [
+                storages(storage_id=storage_id, data_id=mapped_ids[data_id])
+                for data_id, storage_id in storages.objects.filter(
+                    data_id__in=mapped_ids.keys()
+                ).values_list("data_id", "storage_id")
+            ],
+            batch_size=DUPLICATE_BATCH_SIZE,
+        )
+
+        DataMigrationHistory.objects.bulk_create(
+            [
+                DataMigrationHistory(
+                    migration=migration.migration,
+                    metadata=migration.metadata,
+                    data_id=mapped_ids[migration.data_id],
+                )
+                for migration in DataMigrationHistory.objects.filter(
+                    data_id__in=mapped_ids.keys()
+                ).order_by("created")
+            ],
+            batch_size=DUPLICATE_BATCH_SIZE,
+        )
+
+        # Inputs are only rewired to copies in the same group.
+        groups = defaultdict(dict)
+        datum_groups = {}
+        for datum, duplicate in zip(data, copies):
+            key = rewire_key(datum) if rewire_key else None
+            groups[key][datum.id] = duplicate.id
+            datum_groups[datum.id] = key
+
+        dependencies = []
+        # Inherit existing child dependencies.
+        for child_id, parent_id, kind in DataDependency.objects.filter(
+            child_id__in=mapped_ids.keys()
+        ).values_list("child_id", "parent_id", "kind"):
+            dependencies.append(
+                DataDependency(
+                    child_id=mapped_ids[child_id], parent_id=parent_id, kind=kind
+                )
+            )
+            # Copy also depends on the copy of its parent if its input
+            # is rewired to it.
+            if parent_id in groups[datum_groups[child_id]]:
+                dependencies.append(
+                    DataDependency(
+                        child_id=mapped_ids[child_id],
+                        parent_id=mapped_ids[parent_id],
+                        kind=kind,
+                    )
+                )
+        # Inherit existing parent dependencies.
+        for child_id, parent_id, kind in DataDependency.objects.filter(
+            parent_id__in=mapped_ids.keys()
+        ).values_list("child_id", "parent_id", "kind"):
+            dependencies.append(
+                DataDependency(
+                    child_id=child_id, parent_id=mapped_ids[parent_id], kind=kind
+                )
+            )
+        DataDependency.objects.bulk_create(
+            dependencies, batch_size=DUPLICATE_BATCH_SIZE
+        )
+
+        rewired = [
+            duplicate
+            for datum, duplicate in zip(data, copies)
+            if rewire_input(duplicate, groups[datum_groups[datum.id]])
+        ]
+        Data.objects.bulk_update(rewired, ["input"], batch_size=DUPLICATE_BATCH_SIZE)
+
+        bulk_assign_contributor_permissions(copies)
+        bulk_copy_permissions(
+            (source, duplicate)
+            for sources, duplicate in zip(permission_sources, copies)
+            for source in sources
+        )
+
+        return copies
+
+    def finish(self):
+        """Build search indexes of all copies."""
+        for model, copies in self._copies.items():
+            index_builder.build(
+                queryset=model.objects.filter(pk__in=[obj.pk for obj in copies])
+            )
+
+
+def duplicate_data(
+    data,
+    contributor=None,
+    inherit_entity=False,
+    inherit_collection=False,
+    progress=None,
+):
+    """Duplicate data objects.
+
+    :param data: queryset or list of data objects
+    :param contributor: duplication user
+    :param inherit_entity: If ``True`` then duplicated data objects are
+        added to entities of originals
+    :param inherit_collection: If ``True`` then duplicated data objects
+        are added to collections of originals
+    :param progress: optional callable called with the number of copied
+        objects and the total number of objects
+    :return: list of copies in the order of originals
+    """
+    data = list(data)
+    duplicator = BulkDuplicator(contributor=contributor, progress=progress)
+    duplicator.total = len(data)
+
+    copies = duplicator.copy_data(
+        data, inherit_entity=inherit_entity, inherit_collection=inherit_collection
+    )
+
+    duplicator.finish()
+    return copies
+
+
+def duplicate_entities(
+    entities, contributor=None, inherit_collection=False, progress=None
+):
+    """Duplicate entities with data objects visible to contributor.
+
+    :param entities: queryset or list of entities
+    :param contributor: duplication user
+    :param inherit_collection: If ``True`` then duplicated entities and
+        their data objects are added to collections of originals
+    :param progress: optional callable called with the number of copied
+        objects and the total number of objects
+    :return: list of copies in the order of originals
+    """
+    entities = list(entities)
+    data = list(
+        get_objects_for_user(
+            contributor, "view_data", Data.objects.filter(entity__in=entities)
+        )
+    )
+    duplicator = BulkDuplicator(contributor=contributor, progress=progress)
+    duplicator.total = len(entities) + len(data)
+
+    copies = duplicator.copy_entities(entities, inherit_collection=inherit_collection)
+    mapped_ids = {
+        entity.id: duplicate.id for entity, duplicate in zip(entities, copies)
+    }
+
+    def assign(datum, duplicate):
+        """Add copy of the data object to copy of its entity."""
+        duplicate.entity_id = mapped_ids[datum.entity_id]
+
+    duplicator.copy_data(
+        data,
+        inherit_collection=inherit_collection,
+        assign=assign,
+        rewire_key=lambda datum: datum.entity_id,
+    )
+
+    duplicator.finish()
+    return copies
+
+
+def duplicate_collections(collections, contributor=None, progress=None):
+    """Duplicate collections with entities visible to contributor.
+
+    Only data objects contained in duplicated entities are duplicated.
+
+    :param collections: queryset or list of collections
+    :param contributor: duplication user
+    :param progress: optional callable called with the number of copied
+        objects and the total number of objects
+    :return: list of copies in the order of originals
+    """
+    collections = list(collections)
+    entities = list(
+        get_objects_for_user(
+            contributor,
+            "view_entity",
+            Entity.objects.filter(collection__in=collections),
+        )
+    )
+    data = list(
+        get_objects_for_user(
+            contributor, "view_data", Data.objects.filter(entity__in=entities)
+        )
+    )
+    duplicator = BulkDuplicator(contributor=contributor, progress=progress)
+    duplicator.total = len(collections) + len(entities) + len(data)
+
+    copies = duplicator.copy_collections(collections)
+    collection_ids = {
+        collection.id: duplicate.id
+        for collection, duplicate in zip(collections, copies)
+    }
+
+    def assign_entity(entity, duplicate):
+        """Add copy of the entity to copy of its collection."""
+        duplicate.collection_id = collection_ids[entity.collection_id]
+
+    entity_copies = duplicator.copy_entities(entities, assign=assign_entity)
+    entity_ids = {
+        entity.id: duplicate for entity, duplicate in zip(entities, entity_copies)
+    }
+
+    def assign_data(datum, duplicate):
+        """Add copy of the data object to copy of its entity and collection."""
+        duplicate.entity_id = entity_ids[datum.entity_id].id
+        duplicate.collection_id = entity_ids[datum.entity_id].collection_id
+
+    duplicator.copy_data(
+        data, assign=assign_data, rewire_key=lambda datum: datum.entity_id
+    )
+
+    duplicator.finish()
+    return copies
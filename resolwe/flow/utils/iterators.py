@@ -1,6 +1,8 @@
 """Iterator utils."""
 import collections
 
+from .schema import CompiledSchema
+
 
 def iterate_fields(fields, schema, path_prefix=None):
     """Iterate over all field values sub-fields.
@@ -11,7 +13,7 @@ def iterate_fields(fields, schema, path_prefix=None):
     :param fields: field values to iterate over
     :type fields: dict
     :param schema: schema to iterate over
-    :type schema: dict
+    :type schema: list or :class:`~resolwe.flow.utils.schema.CompiledSchema`
     :return: (field schema, field value)
     :rtype: tuple
 
@@ -19,15 +21,20 @@ def iterate_fields(fields, schema, path_prefix=None):
     if path_prefix is not None and path_prefix != "" and path_prefix[-1] != ".":
         path_prefix += "."
 
-    schema_dict = {val["name"]: val for val in schema}
+    if isinstance(schema, CompiledSchema):
+        schema_dict = schema.fields
+        groups = schema.groups
+    else:
+        schema_dict = {val["name"]: val for val in schema}
+        groups = {}
+
     for field_id, properties in fields.items():
         path = "{}{}".format(path_prefix, field_id) if path_prefix is not None else None
         if field_id not in schema_dict:
             raise KeyError("Field definition ({}) missing in schema".format(field_id))
         if "group" in schema_dict[field_id]:
-            for rvals in iterate_fields(
-                properties, schema_dict[field_id]["group"], path
-            ):
+            group_schema = groups.get(field_id, schema_dict[field_id]["group"])
+            for rvals in iterate_fields(properties, group_schema, path):
                 yield rvals if path_prefix is not None else rvals[:2]
         else:
             rvals = (schema_dict[field_id], fields, path)
@@ -0,0 +1,488 @@
+""".. Ignore pydocstyle D400.
+
+=======
+Metrics
+=======
+
+Metrics shared between the manager workers and the listener. Values are
+stored in Redis, so observations from all processes are aggregated, and
+can be exported in the Prometheus text format.
+
+.. autoclass:: resolwe.flow.utils.metrics.Counter
+    :members:
+
+.. autoclass:: resolwe.flow.utils.metrics.Gauge
+    :members:
+
+.. autoclass:: resolwe.flow.utils.metrics.Histogram
+    :members:
+
+.. autofunction:: resolwe.flow.utils.metrics.flush_metrics
+.. autofunction:: resolwe.flow.utils.metrics.export_metrics
+.. autofunction:: resolwe.flow.utils.metrics.observe_job_phase
+.. autofunction:: resolwe.flow.utils.metrics.job_phase_stats
+.. autofunction:: resolwe.flow.utils.metrics.cache_hit_stats
+
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import redis
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+#: Default histogram buckets (in seconds).
+DEFAULT_BUCKETS = (
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    10,
+    30,
+    60,
+    300,
+    900,
+    3600,
+    math.inf,
+)
+
+#: Histogram buckets for short operations (in seconds).
+SHORT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, math.inf)
+
+#: Time from creation of a data object until its inputs are resolved.
+PHASE_RESOLVE_WAIT = "resolve_wait"
+#: Evaluation of the process by the execution engine.
+PHASE_EVALUATION = "evaluation"
+#: Preparation of the executor's runtime directory and settings.
+PHASE_RUNTIME_PREP = "runtime_prep"
+#: Time from submitting the job to the connector until the executor runs.
+PHASE_QUEUE_WAIT = "queue_wait"
+#: Start of the executor's process (e.g. a Docker container).
+PHASE_EXECUTOR_START = "executor_start"
+#: Run of the process script.
+PHASE_RUN = "run"
+#: Handling of the finish command in the listener.
+PHASE_FINISH = "finish"
+
+JOB_PHASES = (
+    PHASE_RESOLVE_WAIT,
+    PHASE_EVALUATION,
+    PHASE_RUNTIME_PREP,
+    PHASE_QUEUE_WAIT,
+    PHASE_EXECUTOR_START,
+    PHASE_RUN,
+    PHASE_FINISH,
+)
+
+#: Prefix of names of exported metrics.
+METRICS_NAMESPACE = "resolwe"
+
+#: All defined metrics.
+REGISTRY = []
+
+_redis_conn = None
+
+
+def get_redis():
+    """Return the Redis connection used for storing metrics."""
+    global _redis_conn
+    if _redis_conn is None:
+        _redis_conn = redis.StrictRedis(
+            **getattr(settings, "FLOW_EXECUTOR", {}).get("REDIS_CONNECTION", {})
+        )
+    return _redis_conn
+
+
+class Metric:
+    """Base class of metrics.
+
+    Changes are collected in the process and sent to Redis by
+    :func:`flush_metrics`, so instrumented code does not wait for Redis.
+    """
+
+    #: Type of the metric in the exported metrics.
+    type = None
+
+    def __init__(self, name, description, labels=()):
+        """Initialize attributes.
+
+        :param name: The name of the metric.
+        :param description: The description of the measured values.
+        :param labels: The names of labels of the values.
+        """
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+
+        self._pending = defaultdict(float)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    @property
+    def key(self):
+        """Get the Redis key of the metric."""
+        # Prevent circular import.
+        from resolwe.flow.managers import state
+
+        return "{}.{}".format(state.MANAGER_METRICS_PREFIX, self.name)
+
+    def _field(self, labels, *suffix):
+        """Get the Redis hash field for the given label values."""
+        return json.dumps([str(labels[label]) for label in self.labels] + list(suffix))
+
+    def _add(self, field, value):
+        """Add the value to the pending change of the field."""
+        with self._lock:
+            self._pending[field] += value
+
+    def flush(self, pipeline):
+        """Add pending changes to the Redis pipeline."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+
+        for field, value in pending.items():
+            pipeline.hincrbyfloat(self.key, field, value)
+
+    def _read(self):
+        """Read values of the metric from Redis."""
+        flush_metrics()
+        for field, value in get_redis().hgetall(self.key).items():
+            yield json.loads(field.decode("utf-8")), float(value)
+
+    def collect(self):
+        """Get values grouped by label values.
+
+        :return: dictionary of label value tuples mapped to values
+        """
+        return {tuple(labels): value for labels, value in self._read()}
+
+    def reset(self):
+        """Remove all values."""
+        with self._lock:
+            self._pending.clear()
+        get_redis().delete(self.key)
+
+    def export(self):
+        """Get lines of the metric in the Prometheus text format."""
+        name = "{}_{}".format(METRICS_NAMESPACE, self.name)
+        yield "# HELP {} {}".format(name, self.description)
+        yield "# TYPE {} {}".format(name, self.type)
+        for label_values, value in sorted(self.collect().items()):
+            yield "{}{} {}".format(
+                name, _format_labels(zip(self.labels, label_values)), value
+            )
+
+
+class Counter(Metric):
+    """Counter of events with labels."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Increment the counter for the given label values."""
+        self._add(self._field(labels), amount)
+
+
+class Gauge(Metric):
+    """Gauge of values with labels, only the last value is kept."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        """Set the value of the gauge for the given label values."""
+        with self._lock:
+            self._pending[self._field(labels)] = value
+
+    def flush(self, pipeline):
+        """Add pending changes to the Redis pipeline."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+
+        if pending:
+            pipeline.hmset(self.key, pending)
+
+
+class Histogram(Metric):
+    """Histogram of observed values with labels.
+
+    Only the bucket, the count and the sum are updated on observation,
+    bucket counts are accumulated when the histogram is collected.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        """Initialize attributes.
+
+        :param buckets: Sorted upper bounds of buckets, the last one must
+            be infinite.
+        """
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """Observe a value with the given label values."""
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        with self._lock:
+            self._pending[self._field(labels, bucket)] += 1
+            self._pending[self._field(labels, "sum")] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        """Get observations grouped by label values.
+
+        :return: dictionary of label value tuples mapped to dictionaries
+            with ``buckets`` (list of cumulative counts of values lower
+            or equal to the bucket bound), ``count`` and ``sum``
+        """
+        result = {}
+        for (*label_values, bucket), value in self._read():
+            sample = result.setdefault(
+                tuple(label_values),
+                {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0},
+            )
+            if bucket == "sum":
+                sample["sum"] = value
+                continue
+
+            index = self.buckets.index(bucket)
+            for position in range(index, len(self.buckets)):
+                sample["buckets"][position] += int(value)
+            sample["count"] += int(value)
+
+        return result
+
+    def quantile(self, sample, quantile):
+        """Estimate the upper bound of a quantile of a collected sample."""
+        rank = quantile * sample["count"]
+        return next(
+            bound
+            for bound, count in zip(self.buckets, sample["buckets"])
+            if count >= rank
+        )
+
+    def export(self):
+        """Get lines of the metric in the Prometheus text format."""
+        name = "{}_{}".format(METRICS_NAMESPACE, self.name)
+        yield "# HELP {} {}".format(name, self.description)
+        yield "# TYPE {} {}".format(name, self.type)
+        for label_values, sample in sorted(self.collect().items()):
+            labels = list(zip(self.labels, label_values))
+            for bound, count in zip(self.buckets, sample["buckets"]):
+                yield "{}_bucket{} {}".format(
+                    name, _format_labels(labels + [("le", format_bound(bound))]), count
+                )
+            yield "{}_sum{} {}".format(name, _format_labels(labels), sample["sum"])
+            yield "{}_count{} {}".format(name, _format_labels(labels), sample["count"])
+
+
+def _format_labels(labels):
+    """Format label names and values in the Prometheus text format."""
+    labels = [
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in labels
+    ]
+    return "{{{}}}".format(",".join(labels)) if labels else ""
+
+
+def flush_metrics():
+    """Send changes of metrics collected in this process to Redis."""
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for metric in REGISTRY:
+            metric.flush(pipeline)
+        pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Unable to store metrics.")
+
+
+def export_metrics():
+    """Export all metrics in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.export())
+    return "\n".join(lines) + "\n"
+
+
+#: Durations of job lifecycle phases.
+job_phase_seconds = Histogram(
+    "job_phase_seconds",
+    "Duration of job lifecycle phases in seconds.",
+    labels=("phase", "process", "scheduling_class"),
+)
+
+
+#: Number of executor commands waiting in the listener's queue.
+listener_queue_depth = Gauge(
+    "listener_queue_depth", "Number of executor commands waiting in the listener queue."
+)
+
+#: Load averages of the listener's queue.
+listener_load_average = Gauge(
+    "listener_load_average",
+    "Average number of executor commands waiting in the listener queue.",
+    labels=("interval",),
+)
+
+#: Service time of executor commands.
+listener_service_seconds = Histogram(
+    "listener_service_seconds",
+    "Time of handling executor commands in seconds.",
+    labels=("command",),
+    buckets=SHORT_BUCKETS,
+)
+
+#: Time spent in database queries while handling executor commands.
+listener_db_seconds = Histogram(
+    "listener_db_seconds",
+    "Time of database queries while handling executor commands in seconds.",
+    labels=("command",),
+    buckets=SHORT_BUCKETS,
+)
+
+#: Number of database queries while handling executor commands.
+listener_db_queries = Counter(
+    "listener_db_queries_total",
+    "Number of database queries while handling executor commands.",
+    labels=("command",),
+)
+
+#: Round-trip time of the listener's Redis commands.
+listener_redis_seconds = Histogram(
+    "listener_redis_seconds",
+    "Round-trip time of listener's Redis commands in seconds.",
+    labels=("command",),
+    buckets=SHORT_BUCKETS,
+)
+
+#: Duration of the manager's scans for data objects to process.
+manager_scan_seconds = Histogram(
+    "manager_scan_seconds",
+    "Duration of manager's scans for data objects to process in seconds.",
+)
+
+#: Number of database queries in the manager's scans.
+manager_db_queries = Counter(
+    "manager_db_queries_total",
+    "Number of database queries in manager's scans for data objects to process.",
+)
+
+#: Number of jobs dispatched to each connector.
+manager_dispatched_jobs = Counter(
+    "manager_dispatched_jobs_total",
+    "Number of jobs dispatched to workload connectors.",
+    labels=("connector",),
+)
+
+#: Number of lookups of reusable results of cached processes.
+manager_cache_lookups = Counter(
+    "manager_cache_lookups_total",
+    "Number of lookups of finished data objects whose results can be reused.",
+    labels=("process", "result"),
+)
+
+#: Number of files transferred between processes and the upload directory.
+file_transfers = Counter(
+    "file_transfers_total",
+    "Number of files transferred between processes and the upload directory.",
+    labels=("direction", "mechanism"),
+)
+
+
+def observe_job_phase(phase, data, seconds):
+    """Record the duration of a lifecycle phase of a data object's job.
+
+    :param phase: The phase, one of :data:`JOB_PHASES`.
+    :param data: The :class:`~resolwe.flow.models.Data` object.
+    :param seconds: The duration of the phase.
+    """
+    job_phase_seconds.observe(
+        max(seconds, 0),
+        phase=phase,
+        process=data.process.slug,
+        scheduling_class=data.process.scheduling_class,
+    )
+
+
+def format_bound(bound):
+    """Format the bucket bound, infinity is formatted as ``+Inf``."""
+    return "+Inf" if bound == math.inf else bound
+
+
+def job_phase_stats():
+    """Summarize durations of job lifecycle phases.
+
+    :return: list of dictionaries with the phase, process slug,
+        scheduling class, number of jobs, mean duration, estimated
+        percentiles and cumulative bucket counts
+    """
+    histogram = job_phase_seconds
+    result = []
+    for (phase, process, scheduling_class), sample in histogram.collect().items():
+        result.append(
+            {
+                "phase": phase,
+                "process": process,
+                "scheduling_class": scheduling_class,
+                "count": sample["count"],
+                "mean": sample["sum"] / sample["count"] if sample["count"] else 0.0,
+                "p50": format_bound(histogram.quantile(sample, 0.5)),
+                "p90": format_bound(histogram.quantile(sample, 0.9)),
+                "p99": format_bound(histogram.quantile(sample, 0.99)),
+                "buckets": {
+                    str(format_bound(bound)): count
+                    for bound, count in zip(histogram.buckets, sample["buckets"])
+                },
+            }
+        )
+
+    phase_order = {phase: index for index, phase in enumerate(JOB_PHASES)}
+    return sorted(
+        result,
+        key=lambda stats: (
+            stats["process"],
+            stats["scheduling_class"],
+            phase_order.get(stats["phase"], len(phase_order)),
+        ),
+    )
+
+
+def cache_hit_stats():
+    """Summarize reuse of results of cached processes.
+
+    :return: list of dictionaries with the process slug, numbers of
+        cache hits and misses and the hit rate
+    """
+    lookups = defaultdict(lambda: {"hit": 0, "miss": 0})
+    for (process, result), value in manager_cache_lookups.collect().items():
+        lookups[process][result] += int(value)
+
+    return [
+        {
+            "process": process,
+            "hits": counts["hit"],
+            "misses": counts["miss"],
+            "hit_rate": counts["hit"] / (counts["hit"] + counts["miss"]),
+        }
+        for process, counts in sorted(lookups.items())
+    ]
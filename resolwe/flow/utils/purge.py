@@ -4,99 +4,279 @@
 Data Purge
 ==========
 
+Paths referenced by data objects are stored in a :class:`ReferenceTrie`,
+so finding unreferenced files requires a single pass over the data
+location. Locations are prepared in the calling thread (all database
+access happens there) and scanned and deleted in parallel by a pool of
+worker threads.
+
 """
 import logging
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from django.db.models import Q
 
 from resolwe.flow.models import Data, DataLocation, Storage
-from resolwe.flow.utils import iterate_fields
+from resolwe.flow.utils import compile_schema
 from resolwe.utils import BraceMessage as __
 
 logger = logging.getLogger(__name__)
 
+#: Default number of threads used to purge data locations.
+DEFAULT_PURGE_WORKERS = 4
+
+#: Number of data locations prepared for purging at once.
+PURGE_BATCH_SIZE = 100
+
+#: Files written by the executor, which are never purged.
+EXECUTOR_FILES = ("jsonout.txt", "stderr.txt", "stdout.txt")
+
+
+class ReferenceTrie:
+    """Trie of paths referenced by data objects.
+
+    A path is referenced if it is a referenced file or directory, one of
+    their parent directories or if it is contained in a referenced
+    directory.
+    """
+
+    #: Key of nodes whose whole subtree is referenced.
+    SUBTREE = None
+
+    def __init__(self):
+        """Initialize an empty trie."""
+        self.root = {}
+
+    @staticmethod
+    def _components(path):
+        """Split relative path into its components."""
+        return [part for part in path.split("/") if part and part != "."]
+
+    def _add(self, components):
+        """Add path components to the trie and return the last node."""
+        node = self.root
+        for part in components:
+            node = node.setdefault(part, {})
+        return node
+
+    def add_file(self, path):
+        """Mark file and its parent directories as referenced."""
+        components = self._components(path)
+        if components:
+            self._add(components)
+
+    def add_tree(self, path):
+        """Mark directory, its contents and its parents as referenced."""
+        components = self._components(path)
+        if components:
+            self._add(components)[self.SUBTREE] = True
+
+    def add_fields(self, fields, schema):
+        """Add paths referenced in file and directory fields.
+
+        :param dict fields: output or descriptor of a data object
+        :param schema: schema of ``fields``
+        """
+        for field_schema, container in compile_schema(schema).iterate_fields(
+            fields, "basic:file:", "list:basic:file:", "basic:dir:", "list:basic:dir:"
+        ):
+            field_type = field_schema["type"]
+            value = container[field_schema["name"]]
+            values = value if field_type.startswith("list:") else [value]
+
+            for item in values:
+                if "file" in field_type:
+                    self.add_file(item["file"])
+                else:
+                    self.add_tree(item["dir"])
+
+                for ref in item.get("refs", []):
+                    self.add_tree(ref)
+
+    def is_referenced(self, path):
+        """Check if the given relative path is referenced."""
+        node = self.root
+        for part in self._components(path):
+            if self.SUBTREE in node:
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+
+        return True
+
+
+def _scan_unreferenced(root, trie):
+    """Find files and directories under ``root`` not referenced in ``trie``.
+
+    :return: dictionary mapping absolute paths to file sizes (``None``
+        for directories)
+    """
+    unreferenced = {}
+
+    def add_all(path):
+        """Add all contents of an unreferenced directory."""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    unreferenced[entry.path] = None
+                    add_all(entry.path)
+                else:
+                    unreferenced[entry.path] = entry.stat(follow_symlinks=False).st_size
+
+    def scan(path, node):
+        """Scan directory whose trie node is ``node``."""
+        if ReferenceTrie.SUBTREE in node:
+            return
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                child = node.get(entry.name)
+                if child is not None:
+                    if is_dir:
+                        scan(entry.path, child)
+                elif is_dir:
+                    unreferenced[entry.path] = None
+                    add_all(entry.path)
+                else:
+                    unreferenced[entry.path] = entry.stat(follow_symlinks=False).st_size
+
+    if os.path.isdir(root):
+        scan(root, trie.root)
+
+    return unreferenced
+
+
+def _delete_paths(paths):
+    """Delete files and directories, skipping contents of deleted directories."""
+    deleted_dir = None
+    # Sorting by components puts directory contents right after the directory.
+    for name in sorted(paths, key=lambda path: path.split("/")):
+        if deleted_dir and name.startswith(deleted_dir):
+            continue
+
+        if os.path.isfile(name) or os.path.islink(name):
+            os.remove(name)
+        elif os.path.isdir(name):
+            shutil.rmtree(name)
+            deleted_dir = os.path.join(name, "")
+
 
 def get_purge_files(root, output, output_schema, descriptor, descriptor_schema):
     """Get files to purge."""
+    trie = ReferenceTrie()
+    for name in EXECUTOR_FILES:
+        trie.add_file(name)
+
+    trie.add_fields(output, output_schema)
+    trie.add_fields(descriptor, descriptor_schema)
+
+    return set(_scan_unreferenced(root, trie))
+
+
+class LocationPurge:
+    """Purge of unreferenced files in a single data location.
+
+    Only :meth:`run` may be called outside of the thread which created
+    the object, as it does not access the database.
+    """
+
+    def __init__(self, location, trie=None):
+        """Initialize purge.
+
+        :param location: :class:`~resolwe.flow.models.DataLocation` to
+            purge
+        :param trie: :class:`ReferenceTrie` of paths referenced by data
+            objects in the location or ``None`` if the location is not
+            referenced by any data object and will be removed completely
+        """
+        self.location = location
+        self.trie = trie
+        #: unreferenced paths
+        self.paths = set()
+        #: number of unreferenced files
+        self.files = 0
+        #: size of unreferenced files in bytes
+        self.bytes = 0
+
+    @property
+    def referenced_by_data(self):
+        """Check if location is referenced by any data object."""
+        return self.trie is not None
+
+    def run(self, delete=False):
+        """Find unreferenced files and optionally delete them."""
+        if self.trie is None:
+            self.paths = {self.location.get_path(), self.location.get_runtime_path()}
+            sizes = {}
+            for path in self.paths:
+                sizes.update(_scan_unreferenced(path, ReferenceTrie()))
+        else:
+            sizes = _scan_unreferenced(self.location.get_path(), self.trie)
+            self.paths = set(sizes)
+
+        file_sizes = [size for size in sizes.values() if size is not None]
+        self.files = len(file_sizes)
+        self.bytes = sum(file_sizes)
+
+        if delete:
+            _delete_paths(self.paths)
+
+        return self
+
+
+def _prepare_location_purge(location):
+    """Prepare purge of the given location.
+
+    :return: :class:`LocationPurge` or ``None`` if the location is used
+        by data objects that are not finished yet
+    """
+    if not location.data.exists():
+        return LocationPurge(location)
+
+    if location.data.exclude(status__in=[Data.STATUS_DONE, Data.STATUS_ERROR]).exists():
+        return None
+
+    trie = ReferenceTrie()
+    for name in EXECUTOR_FILES:
+        trie.add_file(name)
+
+    for data in location.data.select_related("process", "descriptor_schema"):
+        trie.add_fields(data.output, data.process.compiled_output_schema)
+        trie.add_fields(
+            data.descriptor, getattr(data.descriptor_schema, "compiled_schema", [])
+        )
+
+    return LocationPurge(location, trie)
+
+
+def _finish_location_purge(purge, delete=False, verbosity=0):
+    """Report results of the location purge and update the location."""
+    location_id = purge.location.id
+    if verbosity >= 1:
+        # Print unreferenced files
+        if purge.paths:
+            logger.info(
+                __(
+                    "Unreferenced files for location id {} ({}):",
+                    location_id,
+                    len(purge.paths),
+                )
+            )
+            for name in purge.paths:
+                logger.info(__("  {}", name))
+        else:
+            logger.info(__("No unreferenced files for location id {}", location_id))
+
+    if delete:
+        purge.location.purged = True
+        purge.location.save()
 
-    def remove_file(fn, paths):
-        """From paths remove fn and dirs before fn in dir tree."""
-        while fn:
-            for i in range(len(paths) - 1, -1, -1):
-                if fn == paths[i]:
-                    paths.pop(i)
-            fn, _ = os.path.split(fn)
-
-    def remove_tree(fn, paths):
-        """From paths remove fn and dirs before or after fn in dir tree."""
-        for i in range(len(paths) - 1, -1, -1):
-            head = paths[i]
-            while head:
-                if fn == head:
-                    paths.pop(i)
-                    break
-                head, _ = os.path.split(head)
-
-        remove_file(fn, paths)
-
-    def subfiles(root):
-        """Extend unreferenced list with all subdirs and files in top dir."""
-        subs = []
-        for path, dirs, files in os.walk(root, topdown=False):
-            path = path[len(root) + 1 :]
-            subs.extend(os.path.join(path, f) for f in files)
-            subs.extend(os.path.join(path, d) for d in dirs)
-        return subs
-
-    unreferenced_files = subfiles(root)
-
-    remove_file("jsonout.txt", unreferenced_files)
-    remove_file("stderr.txt", unreferenced_files)
-    remove_file("stdout.txt", unreferenced_files)
-
-    meta_fields = [[output, output_schema], [descriptor, descriptor_schema]]
-
-    for meta_field, meta_field_schema in meta_fields:
-        for field_schema, fields in iterate_fields(meta_field, meta_field_schema):
-            if "type" in field_schema:
-                field_type = field_schema["type"]
-                field_name = field_schema["name"]
-
-                # Remove basic:file: entries
-                if field_type.startswith("basic:file:"):
-                    remove_file(fields[field_name]["file"], unreferenced_files)
-
-                # Remove list:basic:file: entries
-                elif field_type.startswith("list:basic:file:"):
-                    for field in fields[field_name]:
-                        remove_file(field["file"], unreferenced_files)
-
-                # Remove basic:dir: entries
-                elif field_type.startswith("basic:dir:"):
-                    remove_tree(fields[field_name]["dir"], unreferenced_files)
-
-                # Remove list:basic:dir: entries
-                elif field_type.startswith("list:basic:dir:"):
-                    for field in fields[field_name]:
-                        remove_tree(field["dir"], unreferenced_files)
-
-                # Remove refs entries
-                if field_type.startswith("basic:file:") or field_type.startswith(
-                    "basic:dir:"
-                ):
-                    for ref in fields[field_name].get("refs", []):
-                        remove_tree(ref, unreferenced_files)
-
-                elif field_type.startswith("list:basic:file:") or field_type.startswith(
-                    "list:basic:dir:"
-                ):
-                    for field in fields[field_name]:
-                        for ref in field.get("refs", []):
-                            remove_tree(ref, unreferenced_files)
-
-    return set([os.path.join(root, filename) for filename in unreferenced_files])
+        if not purge.referenced_by_data:
+            purge.location.delete()
 
 
 def location_purge(location_id, delete=False, verbosity=0):
@@ -106,6 +286,8 @@ def location_purge(location_id, delete=False, verbosity=0):
         :class:`~resolwe.flow.models.DataLocation` model that data
         objects reference to.
     :param delete: If ``True``, then delete unreferenced files.
+    :return: :class:`LocationPurge` or ``None`` if the location was not
+        purged
     """
     try:
         location = DataLocation.objects.get(id=location_id)
@@ -115,75 +297,128 @@ def location_purge(location_id, delete=False, verbosity=0):
         )
         return
 
-    unreferenced_files = set()
-    purged_data = Data.objects.none()
-    referenced_by_data = location.data.exists()
-    if referenced_by_data:
-        if location.data.exclude(
-            status__in=[Data.STATUS_DONE, Data.STATUS_ERROR]
-        ).exists():
-            return
+    purge = _prepare_location_purge(location)
+    if purge is None:
+        return
 
-        # Perform cleanup.
-        purge_files_sets = list()
-        purged_data = location.data.all()
-        for data in purged_data:
-            purge_files_sets.append(
-                get_purge_files(
-                    location.get_path(),
-                    data.output,
-                    data.process.output_schema,
-                    data.descriptor,
-                    getattr(data.descriptor_schema, "schema", []),
-                )
-            )
+    purge.run(delete=delete)
+    _finish_location_purge(purge, delete=delete, verbosity=verbosity)
+
+    return purge
 
-        intersected_files = (
-            set.intersection(*purge_files_sets) if purge_files_sets else set()
+
+def _run_location_purge(purge, delete):
+    """Run the purge in a worker thread, log and return errors."""
+    try:
+        purge.run(delete=delete)
+    except Exception as error:
+        logger.exception(
+            __("Error while purging location id {}.", purge.location.id),
+            extra={"location_id": purge.location.id},
         )
-        unreferenced_files.update(intersected_files)
-    else:
-        # Remove data directory.
-        unreferenced_files.add(location.get_path())
-        unreferenced_files.add(location.get_runtime_path())
+        return error
 
-    if verbosity >= 1:
-        # Print unreferenced files
-        if unreferenced_files:
-            logger.info(
-                __(
-                    "Unreferenced files for location id {} ({}):",
-                    location_id,
-                    len(unreferenced_files),
-                )
-            )
-            for name in unreferenced_files:
-                logger.info(__("  {}", name))
-        else:
-            logger.info(__("No unreferenced files for location id {}", location_id))
 
-    # Go through unreferenced files and delete them.
-    if delete:
-        for name in unreferenced_files:
-            if os.path.isfile(name) or os.path.islink(name):
-                os.remove(name)
-            elif os.path.isdir(name):
-                shutil.rmtree(name)
+def purge_locations(
+    locations, delete=False, verbosity=0, workers=DEFAULT_PURGE_WORKERS
+):
+    """Purge the given data locations in parallel.
+
+    :param locations: :class:`~resolwe.flow.models.DataLocation`
+        queryset
+    :param delete: If ``True``, then delete unreferenced files.
+    :param workers: Number of threads used to purge data locations.
+    :return: dictionary with the number of purged locations, files and
+        bytes
+    """
+    report = {"locations": 0, "files": 0, "bytes": 0}
+
+    def purge_batch(batch):
+        """Purge prepared locations in parallel."""
+        results = pool.map(lambda purge: _run_location_purge(purge, delete), batch)
+        for purge, error in zip(batch, list(results)):
+            if error is not None:
+                continue
+
+            _finish_location_purge(purge, delete=delete, verbosity=verbosity)
+            report["locations"] += 1
+            report["files"] += purge.files
+            report["bytes"] += purge.bytes
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        for location in locations.iterator():
+            purge = _prepare_location_purge(location)
+            if purge is not None:
+                batch.append(purge)
+
+            if len(batch) >= PURGE_BATCH_SIZE:
+                purge_batch(batch)
+                batch = []
+
+        if batch:
+            purge_batch(batch)
+
+    logger.info(
+        __(
+            "{} {} bytes in {} files from {} data locations.",
+            "Reclaimed" if delete else "Purge would reclaim",
+            report["bytes"],
+            report["files"],
+            report["locations"],
+        )
+    )
 
-        location.purged = True
-        location.save()
+    return report
 
-        if not referenced_by_data:
-            location.delete()
 
+def purge_sweep(limit=None, verbosity=0, workers=1):
+    """Purge finished data locations which were not purged yet.
 
-def _location_purge_all(delete=False, verbosity=0):
-    """Purge all data locations."""
-    if DataLocation.objects.exists():
-        for location in DataLocation.objects.filter(Q(purged=False) | Q(data=None)):
-            location_purge(location.id, delete, verbosity)
-    else:
+    The sweep catches up on locations whose purge was never triggered
+    (e.g. because the purge message was dropped). Locations without data
+    objects are skipped, as they may belong to data objects that are
+    just being created.
+
+    :param limit: Optional maximal number of purged locations.
+    :param workers: Number of threads used to purge data locations.
+    :return: dictionary with the number of purged locations, files and
+        bytes
+    """
+    unfinished = [
+        status
+        for status, _ in Data.STATUS_CHOICES
+        if status not in (Data.STATUS_DONE, Data.STATUS_ERROR)
+    ]
+    locations = (
+        DataLocation.objects.filter(purged=False)
+        .exclude(data=None)
+        .exclude(data__status__in=unfinished)
+        .distinct()
+        .order_by("id")
+    )
+    if limit:
+        locations = locations[:limit]
+
+    return purge_locations(locations, delete=True, verbosity=verbosity, workers=workers)
+
+
+def _location_purge_all(delete=False, verbosity=0, workers=DEFAULT_PURGE_WORKERS):
+    """Purge all data locations.
+
+    :return: dictionary with the number of purged locations, files and
+        bytes
+    """
+    if not DataLocation.objects.exists():
         logger.info("No data locations")
+        return {"locations": 0, "files": 0, "bytes": 0}
+
+    return purge_locations(
+        DataLocation.objects.filter(Q(purged=False) | Q(data=None)).distinct(),
+        delete=delete,
+        verbosity=verbosity,
+        workers=workers,
+    )
 
 
 def _storage_purge_all(delete=False, verbosity=0):
@@ -202,7 +437,14 @@ def _storage_purge_all(delete=False, verbosity=0):
         orphaned_storages.delete_chunked()
 
 
-def purge_all(delete=False, verbosity=0):
-    """Purge all data locations."""
-    _location_purge_all(delete, verbosity)
+def purge_all(delete=False, verbosity=0, workers=DEFAULT_PURGE_WORKERS):
+    """Purge all data locations.
+
+    :param delete: If ``True``, then delete unreferenced files.
+    :param workers: Number of threads used to purge data locations.
+    :return: dictionary with the number of purged data locations, files
+        and bytes (to be) reclaimed
+    """
+    report = _location_purge_all(delete, verbosity, workers)
     _storage_purge_all(delete, verbosity)
+    return report
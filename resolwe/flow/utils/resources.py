@@ -0,0 +1,189 @@
+""".. Ignore pydocstyle D400.
+
+========================
+Adaptive Resource Limits
+========================
+
+Executors report resources used by each job, which are stored in
+:attr:`~resolwe.flow.models.Data.process_resources`. Resource limits of
+a process (slug and version) are suggested from a percentile of the
+usage observed in its latest successful jobs. Measurements flagged as
+inaccurate by the executor (sampled or shared by pooled jobs) are not
+used. Failed jobs, which reached their memory limit or were killed,
+tell that the limit was too low, so the memory is raised above their
+limit. Suggested limits are within configured bounds and never exceed
+the limits from the process schema.
+
+Limits of a job are computed once, when it is dispatched, and stored in
+:attr:`~resolwe.flow.models.Data.process_memory` and
+:attr:`~resolwe.flow.models.Data.process_cores`.
+
+The policy is configured with the ``FLOW_PROCESS_ADAPTIVE_RESOURCES``
+setting, a dictionary with the following keys:
+
+- ``APPLY``: use suggested limits for new jobs instead of only
+  suggesting them (defaults to ``False``)
+- ``PERCENTILE``: percentile of the observed usage (defaults to 95)
+- ``MIN_SAMPLES``: minimal number of observed jobs (defaults to 10)
+- ``HISTORY``: number of latest jobs considered (defaults to 100)
+- ``MEMORY_MARGIN``: factor of the memory percentile (defaults to 1.2)
+- ``MEMORY_INCREASE``: factor of the memory limit of jobs that exceeded
+  it (defaults to 1.5)
+- ``MIN_MEMORY``: lower bound of memory, in MB (defaults to 256)
+- ``MIN_CORES``: lower bound of cores (defaults to 1)
+
+"""
+import math
+
+from django.conf import settings
+
+from resolwe.flow.executors.resources import USAGE_FLAGS
+
+from .stats import percentile
+
+POLICY_DEFAULTS = {
+    "APPLY": False,
+    "PERCENTILE": 95,
+    "MIN_SAMPLES": 10,
+    "HISTORY": 100,
+    "MEMORY_MARGIN": 1.2,
+    "MEMORY_INCREASE": 1.5,
+    "MIN_MEMORY": 256,
+    "MIN_CORES": 1,
+}
+
+
+def get_policy():
+    """Return the adaptive resource limits policy."""
+    return dict(
+        POLICY_DEFAULTS, **getattr(settings, "FLOW_PROCESS_ADAPTIVE_RESOURCES", {})
+    )
+
+
+#: Return code of processes killed with ``SIGKILL``, e.g. when they run
+#: out of memory.
+KILLED_RETURN_CODE = 128 + 9
+
+
+def observed_usage(process, history):
+    """Return resources used by the latest finished jobs of the process.
+
+    Failed jobs are only included if they reached their memory limit
+    or were killed, and successful jobs only if their measurements are
+    accurate.
+
+    :return: list of dictionaries with the peak memory in MB, the
+        average number of used cores and a flag telling if the job
+        exceeded its memory limit of each job; the memory of jobs that
+        exceeded it is their memory limit
+    """
+    from resolwe.flow.models import Data  # Prevent circular import.
+
+    jobs = (
+        Data.objects.filter(
+            process=process,
+            status__in=[Data.STATUS_DONE, Data.STATUS_ERROR],
+            process_resources__has_key="max_memory",
+        )
+        .order_by("-finished")
+        .values_list(
+            "process_resources",
+            "started",
+            "finished",
+            "status",
+            "process_memory",
+            "process_rc",
+        )[:history]
+    )
+
+    usage = []
+    for resources, started, finished, status, memory_limit, return_code in jobs:
+        accurate = not any(resources.get(flag) for flag in USAGE_FLAGS)
+        if status == Data.STATUS_ERROR:
+            if memory_limit and (
+                return_code == KILLED_RETURN_CODE
+                or (accurate and resources["max_memory"] >= memory_limit)
+            ):
+                usage.append({"memory": memory_limit, "cores": None, "exceeded": True})
+            continue
+
+        if not accurate:
+            continue
+
+        cores = None
+        if started and finished and finished > started:
+            duration = (finished - started).total_seconds()
+            cores = resources.get("cpu_time", 0) / duration
+        usage.append(
+            {"memory": resources["max_memory"], "cores": cores, "exceeded": False}
+        )
+    return usage
+
+
+def suggest_resource_limits(process, limits, policy=None):
+    """Suggest resource limits of the process from its observed usage.
+
+    :param process: The :class:`~resolwe.flow.models.Process`
+    :param limits: Resource limits of the process as given by its schema
+    :param policy: The policy, :func:`get_policy` is used if ``None``
+    :return: A dictionary with the suggested ``memory`` and ``cores`` and
+        the number of observed ``samples`` or ``None`` if there are not
+        enough observed jobs
+    """
+    if policy is None:
+        policy = get_policy()
+
+    usage = observed_usage(process, policy["HISTORY"])
+    if len(usage) < max(policy["MIN_SAMPLES"], 1):
+        return None
+
+    memory = 0
+    completed = [job["memory"] for job in usage if not job["exceeded"]]
+    if completed:
+        memory = percentile(completed, policy["PERCENTILE"])
+        memory = math.ceil(memory * policy["MEMORY_MARGIN"])
+    # Limits of jobs that exceeded them were too low.
+    exceeded = [job["memory"] for job in usage if job["exceeded"]]
+    if exceeded:
+        memory = max(memory, math.ceil(max(exceeded) * policy["MEMORY_INCREASE"]))
+
+    suggested = {
+        "memory": min(max(memory, policy["MIN_MEMORY"]), limits["memory"]),
+        "cores": limits["cores"],
+        "samples": len(usage),
+    }
+
+    cores = [job["cores"] for job in usage if job["cores"] is not None]
+    if cores:
+        cores = math.ceil(percentile(cores, policy["PERCENTILE"]))
+        suggested["cores"] = min(max(cores, policy["MIN_CORES"]), limits["cores"])
+
+    return suggested
+
+
+def resource_limit_stats():
+    """Summarize observed usage and suggested limits of processes.
+
+    :return: list of dictionaries with the process slug and version,
+        the limits from its schema and the suggested limits
+    """
+    from resolwe.flow.models import Process  # Prevent circular import.
+
+    policy = get_policy()
+    processes = Process.objects.filter(
+        data__process_resources__has_key="max_memory"
+    ).distinct()
+
+    result = []
+    for process in processes.order_by("slug", "version"):
+        limits = process.get_resource_limits(adaptive=False)
+        result.append(
+            {
+                "process": process.slug,
+                "version": str(process.version),
+                "limits": limits,
+                "suggested": suggest_resource_limits(process, limits, policy),
+                "applied": policy["APPLY"],
+            }
+        )
+    return result
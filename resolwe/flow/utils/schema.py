@@ -0,0 +1,165 @@
+""".. Ignore pydocstyle D400.
+
+===============
+Compiled Schema
+===============
+
+Field schemas of processes and descriptor schemas are lists of field
+definitions which have to be scanned every time a value is looked up.
+:class:`CompiledSchema` precomputes name lookups, group nesting and
+dotted paths of all fields once, so hot paths (hydration, validation,
+purge, ...) can only visit the fields of interest.
+
+"""
+import copy
+import threading
+from collections import OrderedDict
+
+# Maximum number of compiled schemas kept in the cache.
+SCHEMA_CACHE_SIZE = 1024
+
+
+class CompiledSchema:
+    """Field schema with precomputed lookup structures.
+
+    Compiled schema behaves as a sequence of field definitions, so it
+    can be used everywhere a plain schema list is expected.
+    """
+
+    def __init__(self, schema):
+        """Compile the given field schema.
+
+        :param list schema: schema to compile
+        """
+        self.schema = schema
+        #: field definitions on this level, by name
+        self.fields = {}
+        #: compiled schemas of groups on this level, by name
+        self.groups = {}
+        #: ``(path, field schema)`` tuples of all non-group fields, where
+        #: path is a tuple of names leading to the field
+        self.leaves = []
+        self._by_type = {}
+
+        for field_schema in schema:
+            name = field_schema["name"]
+            self.fields[name] = field_schema
+            if "group" in field_schema:
+                group = CompiledSchema(field_schema["group"])
+                self.groups[name] = group
+                self.leaves.extend(
+                    ((name,) + path, group_field) for path, group_field in group.leaves
+                )
+            else:
+                self.leaves.append(((name,), field_schema))
+
+        #: field definitions of all non-group fields, by dotted path
+        self.paths = {".".join(path): field for path, field in self.leaves}
+
+    def __iter__(self):
+        """Iterate over field definitions on the top level."""
+        return iter(self.schema)
+
+    def __len__(self):
+        """Return the number of fields on the top level."""
+        return len(self.schema)
+
+    def fields_of_type(self, *prefixes):
+        """Return non-group fields whose type starts with one of prefixes.
+
+        :return: tuple of ``(path, field schema)`` tuples
+        """
+        try:
+            return self._by_type[prefixes]
+        except KeyError:
+            fields = tuple(
+                (path, field_schema)
+                for path, field_schema in self.leaves
+                if field_schema.get("type", "").startswith(prefixes)
+            )
+            self._by_type[prefixes] = fields
+            return fields
+
+    def iterate_fields(self, fields, *prefixes):
+        """Iterate over values of fields of the given types.
+
+        Only fields whose type starts with one of ``prefixes`` (or all
+        fields if no prefix is given) and which are present in
+        ``fields`` are visited. Unlike
+        :func:`~resolwe.flow.utils.iterate_fields`, values without a
+        definition in the schema are silently ignored.
+
+        :param dict fields: field values to iterate over
+        :return: (field schema, container of the field value)
+        :rtype: tuple
+        """
+        leaves = self.fields_of_type(*prefixes) if prefixes else self.leaves
+        for path, field_schema in leaves:
+            container = fields
+            for name in path[:-1]:
+                container = container.get(name)
+                if not isinstance(container, dict):
+                    break
+            else:
+                if path[-1] in container:
+                    yield field_schema, container
+
+
+class SchemaCache:
+    """Thread-safe LRU cache of compiled schemas.
+
+    Compiled schemas are looked up by key only, so the key must change
+    whenever the schema changes, e.g. by including the modification time
+    of the object holding it. Compiled schemas hold a copy of the source
+    schema, so later in-place changes of the source do not affect them.
+    """
+
+    def __init__(self, maxsize=SCHEMA_CACHE_SIZE):
+        """Initialize an empty cache."""
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, schema):
+        """Return the compiled schema for key, compile it on a miss."""
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+
+        if compiled is not None:
+            return compiled
+
+        compiled = CompiledSchema(copy.deepcopy(schema))
+
+        with self._lock:
+            self._cache[key] = compiled
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+        return compiled
+
+    def clear(self):
+        """Remove all compiled schemas from the cache."""
+        with self._lock:
+            self._cache.clear()
+
+
+schema_cache = SchemaCache()
+
+
+def compile_schema(schema, cache_key=None):
+    """Return compiled version of the given schema.
+
+    :param schema: schema list or already compiled schema
+    :param cache_key: optional hashable key under which the compiled
+        schema is cached
+    :rtype: CompiledSchema
+    """
+    if isinstance(schema, CompiledSchema):
+        return schema
+
+    if cache_key is None:
+        return CompiledSchema(schema)
+
+    return schema_cache.get(cache_key, schema)
@@ -11,6 +11,16 @@ import time
 from collections import deque, namedtuple
 
 
+def percentile(values, percent):
+    """Compute the percentile of values using the nearest-rank method."""
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
 class NumberSeriesShape:
     """Helper class for computing characteristics for numerical data.
 
@@ -16,6 +16,9 @@ Flow Views
 .. autoclass:: resolwe.flow.views.entity.EntityViewSet
     :members:
 
+.. autoclass:: resolwe.flow.views.metrics.MetricsViewSet
+    :members:
+
 .. autoclass:: resolwe.flow.views.process.ProcessViewSet
     :members:
 
@@ -30,6 +33,7 @@ from .collection import CollectionViewSet
 from .data import DataViewSet
 from .descriptor import DescriptorSchemaViewSet
 from .entity import EntityViewSet
+from .metrics import MetricsViewSet
 from .process import ProcessViewSet
 from .relation import RelationViewSet
 from .storage import StorageViewSet
@@ -39,6 +43,7 @@ __all__ = (
     "DataViewSet",
     "DescriptorSchemaViewSet",
     "EntityViewSet",
+    "MetricsViewSet",
     "ProcessViewSet",
     "RelationViewSet",
     "StorageViewSet",
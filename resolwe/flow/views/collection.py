@@ -12,7 +12,7 @@ from resolwe.flow.serializers import CollectionSerializer
 from resolwe.permissions.loader import get_permissions_class
 from resolwe.permissions.mixins import ResolwePermissionsMixin
 from resolwe.permissions.shortcuts import get_objects_for_user
-from resolwe.permissions.utils import update_permission
+from resolwe.permissions.utils import bulk_update_permission
 
 from ..elastic_indexes import CollectionDocument
 from .mixins import (
@@ -137,15 +137,22 @@ class CollectionViewSet(
 
         return search
 
+    def _share_objects(self, user, queryset, perm, payload):
+        """Apply permissions to all objects in queryset shareable by user."""
+        # Prevent circular import.
+        from resolwe.elastic.builder import index_builder
+
+        shareable = get_objects_for_user(user, perm, queryset).values_list(
+            "id", flat=True
+        )
+        queryset = queryset.model.objects.filter(id__in=list(shareable))
+        if bulk_update_permission(queryset, payload):
+            index_builder.build(queryset=queryset)
+
     def set_content_permissions(self, user, obj, payload):
         """Apply permissions to data objects and entities in ``Collection``."""
-        for entity in obj.entity_set.all():
-            if user.has_perm("share_entity", entity):
-                update_permission(entity, payload)
-
-        for data in obj.data.all():
-            if user.has_perm("share_data", data):
-                update_permission(data, payload)
+        self._share_objects(user, obj.entity_set.all(), "share_entity", payload)
+        self._share_objects(user, obj.data.all(), "share_data", payload)
 
     def create(self, request, *args, **kwargs):
         """Only authenticated users can create new collections."""
@@ -7,7 +7,7 @@ from rest_framework.response import Response
 
 from resolwe.elastic.composer import composer
 from resolwe.elastic.viewsets import ElasticSearchCombinedViewSet
-from resolwe.flow.models import Data, Process
+from resolwe.flow.models import Data, DataDependency, Process
 from resolwe.flow.models.utils import fill_with_defaults
 from resolwe.flow.serializers import DataSerializer
 from resolwe.flow.utils import get_data_checksum
@@ -247,3 +247,51 @@ class DataViewSet(
     def children(self, request, pk=None):
         """Return children of the current data object."""
         return self._parents_children(request, self.get_object().children)
+
+    def _get_lineage_parameters(self, request):
+        """Parse depth and kind filters of lineage queries."""
+        depth = request.query_params.get("depth")
+        if depth is not None:
+            if not depth.isdigit() or int(depth) < 1:
+                raise exceptions.ParseError(
+                    "`depth` parameter must be a positive integer"
+                )
+            depth = int(depth)
+
+        kinds = request.query_params.get("kind")
+        if kinds is not None:
+            kinds = kinds.split(",")
+            valid_kinds = [kind for kind, _ in DataDependency.KIND_CHOICES]
+            for kind in kinds:
+                if kind not in valid_kinds:
+                    raise exceptions.ParseError(
+                        "Unknown dependency kind: {}".format(kind)
+                    )
+
+        return {"depth": depth, "kinds": kinds}
+
+    @action(detail=True)
+    def ancestors(self, request, pk=None):
+        """Return all ancestors of the current data object.
+
+        The number of levels can be limited with the ``depth`` parameter
+        and followed dependencies with the comma-separated ``kind``
+        parameter.
+        """
+        return self._parents_children(
+            request,
+            self.get_object().ancestors(**self._get_lineage_parameters(request)),
+        )
+
+    @action(detail=True)
+    def descendants(self, request, pk=None):
+        """Return all descendants of the current data object.
+
+        The number of levels can be limited with the ``depth`` parameter
+        and followed dependencies with the comma-separated ``kind``
+        parameter.
+        """
+        return self._parents_children(
+            request,
+            self.get_object().descendants(**self._get_lineage_parameters(request)),
+        )
@@ -6,7 +6,6 @@ from rest_framework.response import Response
 from resolwe.flow.models import Collection, Entity
 from resolwe.flow.serializers import EntitySerializer
 from resolwe.permissions.shortcuts import get_objects_for_user
-from resolwe.permissions.utils import update_permission
 
 from ..elastic_indexes import EntityDocument
 from .collection import CollectionViewSet
@@ -53,9 +52,7 @@ class EntityViewSet(CollectionViewSet):
 
     def set_content_permissions(self, user, obj, payload):
         """Apply permissions to data objects in ``Entity``."""
-        for data in obj.data.all():
-            if user.has_perm("share_data", data):
-                update_permission(data, payload)
+        self._share_objects(user, obj.data.all(), "share_data", payload)
 
     @action(detail=False, methods=["post"])
     def move_to_collection(self, request, *args, **kwargs):
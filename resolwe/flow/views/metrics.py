@@ -0,0 +1,36 @@
+"""Metrics viewset."""
+from django.http import HttpResponse
+
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from resolwe.flow.utils.metrics import cache_hit_stats, export_metrics, job_phase_stats
+from resolwe.flow.utils.resources import resource_limit_stats
+
+
+class MetricsViewSet(viewsets.ViewSet):
+    """API view for manager metrics, available to staff users."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def list(self, request):
+        """Return all metrics in the Prometheus text format."""
+        return HttpResponse(
+            export_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    @action(detail=False, methods=["get"])
+    def lifecycle(self, request):
+        """Return histograms of job lifecycle phase durations."""
+        return Response(job_phase_stats())
+
+    @action(detail=False, methods=["get"])
+    def cache(self, request):
+        """Return hit rates of reused results of cached processes."""
+        return Response(cache_hit_stats())
+
+    @action(detail=False, methods=["get"])
+    def resources(self, request):
+        """Return observed resource usage and suggested resource limits."""
+        return Response(resource_limit_stats())
@@ -1,12 +1,16 @@
 """Relation viewset."""
 from itertools import zip_longest
 
+from django.db import IntegrityError, transaction
+
 from rest_framework import exceptions, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from resolwe.flow.filters import RelationFilter
 from resolwe.flow.models import Relation
 from resolwe.flow.serializers import RelationSerializer
+from resolwe.permissions.utils import bulk_assign_contributor_permissions
 
 from .mixins import ResolweCreateModelMixin
 
@@ -70,6 +74,41 @@ class RelationViewSet(ResolweCreateModelMixin, viewsets.ModelViewSet):
 
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=["post"])
+    def bulk_create(self, request, *args, **kwargs):
+        """Create multiple ``Relation`` objects in one request.
+
+        The request body is a list of relations in the same format as
+        when creating a single relation. Either all relations are
+        created or none of them.
+        """
+        user = request.user
+        if not user.is_authenticated:
+            raise exceptions.NotFound
+
+        if not isinstance(request.data, list) or not all(
+            isinstance(relation, dict) for relation in request.data
+        ):
+            raise exceptions.ParseError("Request body must be a list of relations.")
+
+        contributor = self.resolve_user(user).pk
+        serializer = self.get_serializer(
+            data=[dict(relation, contributor=contributor) for relation in request.data],
+            many=True,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            with transaction.atomic():
+                relations = serializer.save()
+
+                # Assign all permissions to the object contributor.
+                bulk_assign_contributor_permissions(relations)
+        except IntegrityError as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_409_CONFLICT)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def update(self, request, *args, **kwargs):
         """Update the ``Relation`` object.
 
@@ -13,6 +13,7 @@ from resolwe.flow.models import Collection, Data, DescriptorSchema, Entity, Proc
 from resolwe.flow.views import CollectionViewSet, DescriptorSchemaViewSet
 from resolwe.permissions.utils import (
     assign_contributor_permissions,
+    bulk_update_permission,
     check_owner_permission,
     check_public_permissions,
     check_user_permissions,
@@ -475,3 +476,47 @@ class PermissionsUtilitiesTest(TestCase):
         data = {"public": {"add": ["view", "edit"]}}
         with self.assertRaises(exceptions.PermissionDenied):
             check_public_permissions(data)
+
+    def test_bulk_update_permission(self):
+        owner = get_user_model().objects.create(username="owner")
+        user = get_user_model().objects.create(username="user")
+        group = Group.objects.create(name="Test group")
+        public = get_user_model().objects.get(username="public")
+        entity_1 = Entity.objects.create(contributor=owner, name="Entity 1")
+        entity_2 = Entity.objects.create(contributor=owner, name="Entity 2")
+        entity_3 = Entity.objects.create(contributor=owner, name="Entity 3")
+        assign_perm("edit_entity", user, entity_1)
+        queryset = Entity.objects.filter(pk__in=[entity_1.pk, entity_2.pk])
+
+        data = {
+            "users": {"add": {str(user.pk): ["view", "edit"]}},
+            "groups": {"add": {str(group.pk): ["view"]}},
+            "public": {"add": ["view"]},
+        }
+        self.assertTrue(bulk_update_permission(queryset, data))
+        for entity in [entity_1, entity_2]:
+            self.assertCountEqual(
+                get_perms(user, entity), ["view_entity", "edit_entity"]
+            )
+            self.assertEqual(get_perms(group, entity), ["view_entity"])
+            self.assertEqual(get_perms(public, entity), ["view_entity"])
+        self.assertEqual(get_perms(user, entity_3), [])
+
+        data = {"users": {"remove": {user.username: ["edit"]}}}
+        self.assertFalse(bulk_update_permission(queryset, data))
+        self.assertEqual(get_perms(user, entity_1), ["view_entity"])
+        self.assertEqual(get_perms(user, entity_2), ["view_entity"])
+
+        data = {
+            "groups": {"remove": {group.name: "ALL"}},
+            "public": {"remove": ["view"]},
+        }
+        self.assertTrue(bulk_update_permission(queryset, data))
+        self.assertEqual(get_perms(group, entity_1), [])
+        self.assertEqual(get_perms(public, entity_2), [])
+        self.assertEqual(get_perms(user, entity_1), ["view_entity"])
+
+        data = {"users": {"add": {str(user.pk): ["view", "foo"]}}}
+        with self.assertRaises(exceptions.ParseError):
+            bulk_update_permission(queryset, data)
+        self.assertEqual(get_perms(user, entity_1), ["view_entity"])
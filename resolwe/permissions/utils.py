@@ -5,16 +5,22 @@ Permissions utils
 =================
 
 .. autofunction:: copy_permissions
+.. autofunction:: bulk_copy_permissions
+.. autofunction:: bulk_assign_contributor_permissions
+.. autofunction:: bulk_update_permission
 
 """
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AnonymousUser, Group
+from django.contrib.auth.models import AnonymousUser, Group, Permission
 from django.contrib.contenttypes.models import ContentType
-from django.db import transaction
+from django.db import router, transaction
 from django.db.models import Q
 
 from guardian.models import GroupObjectPermission, UserObjectPermission
 from guardian.shortcuts import assign_perm, remove_perm
+from guardian.utils import get_anonymous_user
 from rest_framework import exceptions
 
 
@@ -83,6 +89,93 @@ def copy_permissions(src_obj, dest_obj):
         _process_permission(perm.permission.codename, perm.group, dest_obj, relabel)
 
 
+def _get_permission_objects(dest_obj):
+    """Return permissions of ``dest_obj`` content type by their codenames."""
+    return {
+        permission.codename: permission
+        for permission in Permission.objects.filter(
+            content_type=ContentType.objects.get_for_model(dest_obj),
+            codename__in=get_all_perms(dest_obj),
+        )
+    }
+
+
+def bulk_copy_permissions(pairs):
+    """Copy permissions from source objects to destination objects.
+
+    This is a bulk version of :func:`copy_permissions`, which copies
+    permissions of all given objects with a few queries. Signals are not
+    sent for the created permissions.
+
+    :param pairs: iterable of ``(src_obj, dest_obj)`` tuples, pairs
+        where ``src_obj`` is ``None`` are skipped
+    """
+    groups = defaultdict(lambda: defaultdict(list))
+    for src_obj, dest_obj in pairs:
+        if src_obj is None:
+            continue
+        key = (type(src_obj), type(dest_obj))
+        groups[key][str(src_obj.pk)].append(dest_obj)
+
+    for (src_model, dest_model), targets in groups.items():
+        src_ctype = ContentType.objects.get_for_model(src_model)
+        dest_ctype = ContentType.objects.get_for_model(dest_model)
+        dest_perms = _get_permission_objects(dest_model)
+
+        for perm_model, identity in [
+            (UserObjectPermission, "user_id"),
+            (GroupObjectPermission, "group_id"),
+        ]:
+            permissions = []
+            for object_pk, identity_id, codename in perm_model.objects.filter(
+                object_pk__in=targets.keys(), content_type=src_ctype
+            ).values_list("object_pk", identity, "permission__codename"):
+                if src_ctype != dest_ctype:
+                    codename = change_perm_ctype(codename, dest_model)
+                if codename not in dest_perms:
+                    continue  # dest object doesn't have matching permission
+
+                permissions.extend(
+                    perm_model(
+                        content_type=dest_ctype,
+                        object_pk=str(dest_obj.pk),
+                        permission=dest_perms[codename],
+                        **{identity: identity_id},
+                    )
+                    for dest_obj in targets[object_pk]
+                )
+
+            perm_model.objects.bulk_create(permissions, ignore_conflicts=True)
+
+
+def bulk_assign_contributor_permissions(objs, contributor=None):
+    """Assign all permissions to contributors of objects.
+
+    This is a bulk version of :func:`assign_contributor_permissions`.
+    Signals are not sent for the created permissions.
+
+    :param objs: list of objects of the same type
+    """
+    if not objs:
+        return
+
+    ctype = ContentType.objects.get_for_model(objs[0])
+    permissions = _get_permission_objects(objs[0]).values()
+    UserObjectPermission.objects.bulk_create(
+        [
+            UserObjectPermission(
+                content_type=ctype,
+                object_pk=str(obj.pk),
+                permission=permission,
+                user_id=contributor.pk if contributor else obj.contributor_id,
+            )
+            for obj in objs
+            for permission in permissions
+        ],
+        ignore_conflicts=True,
+    )
+
+
 def fetch_user(query):
     """Get user by ``pk``, ``username`` or ``email``.
 
@@ -210,6 +303,91 @@ def update_permission(obj, data):
         set_public_permissions("remove")
 
 
+def bulk_update_permission(queryset, data):
+    """Update permissions of all objects in ``queryset`` at once.
+
+    The ``data`` payload has the same format as in
+    :func:`update_permission` and changes are applied in the same order,
+    but with a constant number of queries regardless of the number of
+    objects. Per-object signals are not sent, so search indexes of the
+    objects must be rebuilt by the caller.
+
+    :return: ``True`` if view or owner permissions were changed
+    """
+    model = queryset.model
+    full_permissions = get_all_perms(model)
+    permissions = _get_permission_objects(model)
+    ctype = ContentType.objects.get_for_model(model)
+
+    def get_permissions(perms):
+        """Validate permissions and return their codenames."""
+        if perms == "ALL":
+            perms = full_permissions
+        codenames = []
+        for perm in perms:
+            perm_codename = get_full_perm(perm, model)
+            if perm_codename not in full_permissions:
+                raise exceptions.ParseError("Unknown permission: {}".format(perm))
+            codenames.append(perm_codename)
+        return codenames
+
+    # Identities are fetched and permissions validated before any change.
+    changes = []
+    for entity_type, fetch_fn in (("users", fetch_user), ("groups", fetch_group)):
+        for perm_type in ("add", "remove"):
+            for entity_id, perms in (
+                data.get(entity_type, {}).get(perm_type, {}).items()
+            ):
+                entity = fetch_fn(entity_id)
+                if entity:
+                    changes.append((perm_type, entity, get_permissions(perms)))
+    for perm_type in ("add", "remove"):
+        perms = data.get("public", {}).get(perm_type, [])
+        if perms:
+            changes.append((perm_type, get_anonymous_user(), get_permissions(perms)))
+
+    object_pks = [str(pk) for pk in queryset.values_list("pk", flat=True)]
+    if not object_pks or not changes:
+        return False
+
+    with transaction.atomic():
+        for perm_type, entity, codenames in changes:
+            if isinstance(entity, Group):
+                perm_model, identity = GroupObjectPermission, {"group": entity}
+            else:
+                perm_model, identity = UserObjectPermission, {"user": entity}
+
+            if perm_type == "add":
+                perm_model.objects.bulk_create(
+                    [
+                        perm_model(
+                            content_type=ctype,
+                            object_pk=object_pk,
+                            permission=permissions[codename],
+                            **identity,
+                        )
+                        for object_pk in object_pks
+                        for codename in codenames
+                    ],
+                    ignore_conflicts=True,
+                )
+            else:
+                removed = perm_model.objects.filter(
+                    content_type=ctype,
+                    object_pk__in=object_pks,
+                    permission__codename__in=codenames,
+                    **identity,
+                )
+                # Raw delete skips per-object signals and index rebuilds.
+                removed._raw_delete(router.db_for_write(perm_model))
+
+    return any(
+        get_perm_action(codename) in ("view", "owner")
+        for _, _, codenames in changes
+        for codename in codenames
+    )
+
+
 def assign_contributor_permissions(obj, contributor=None):
     """Assign all permissions to object's contributor."""
     for permission in get_all_perms(obj):
@@ -1,9 +1,227 @@
 """Process input or output fields."""
+import bz2
 import collections
+import gzip
+import hashlib
 import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import zlib
+from contextlib import ExitStack
 
 import resolwe_runtime_utils
 
+from .transfer import transfer_file
+
+#: Extensions of archives, which are imported by resolwe-runtime-utils.
+ARCHIVE_EXTENSIONS = (
+    ".zip",
+    ".rar",
+    ".7z",
+    ".tgz",
+    ".tar",
+    ".tar.gz",
+    ".tar.bz2",
+    ".tar.xz",
+)
+
+#: Decompressors of compressed files by their extensions: a command of
+#: a multi-threaded decompressor, a Python fallback if it is missing and
+#: the error message of invalid files, as given by resolwe-runtime-utils.
+DECOMPRESSORS = {
+    ".gz": (["pigz", "-dc"], gzip.open, "Invalid gzip file format: {}"),
+    ".bz2": (["pbzip2", "-dc"], bz2.open, "Failed to extract file: {}"),
+}
+
+#: Command of a multi-threaded gzip compressor.
+COMPRESSOR = ["pigz", "-c"]
+
+#: Number of bytes read at once when importing files.
+IMPORT_CHUNK_SIZE = 1024 * 1024
+
+#: Minimal change of progress reported while importing files.
+PROGRESS_STEP = 0.01
+
+
+class DecompressionError(Exception):
+    """Compressed data is invalid."""
+
+
+class DecompressedReader:
+    """Binary file wrapper raising :exc:`DecompressionError` on invalid data."""
+
+    def __init__(self, handle):
+        """Construct a decompressed reader of the decompressing file."""
+        self.handle = handle
+
+    def read(self, size=-1):
+        """Read at most ``size`` bytes of decompressed data."""
+        try:
+            return self.handle.read(size)
+        except (EOFError, OSError, zlib.error) as error:
+            raise DecompressionError(str(error)) from error
+
+
+class ProgressReader:
+    """Binary file wrapper reporting the progress of reading it."""
+
+    def __init__(self, handle, callback, progress_from=0.0, progress_to=None):
+        """Construct a progress reader.
+
+        :param handle: Binary file to read from
+        :param callback: Function called with the current progress
+        :param progress_from: Progress before the file is read
+        :param progress_to: Progress after the file is read, no progress
+            is reported if ``None``
+        """
+        self.handle = handle
+        self.callback = callback
+        self.progress_from = progress_from
+        self.progress_to = progress_to
+        self.total = max(os.fstat(handle.fileno()).st_size, 1)
+        self.position = 0
+        self.reported = progress_from
+
+    def read(self, size=-1):
+        """Read at most ``size`` bytes and report the progress."""
+        data = self.handle.read(size)
+        self.position += len(data)
+
+        if self.progress_to is not None:
+            progress = self.progress_from + (
+                self.progress_to - self.progress_from
+            ) * min(self.position / self.total, 1.0)
+            if progress - self.reported >= PROGRESS_STEP:
+                self.reported = progress
+                self.callback(progress)
+
+        return data
+
+
+def decompressed_stream(reader, extension):
+    """Decompress the stream with a multi-threaded decompressor.
+
+    Compressed data is fed to the decompressor in a separate thread. If
+    the decompressor is not installed, data is decompressed in Python.
+
+    :return: tuple of a binary stream of decompressed data and a
+        function, which waits for the decompressor to finish and raises
+        its errors, or stops it if called with ``abort=True``; invalid
+        data raises :exc:`DecompressionError`
+    """
+    command, opener, _ = DECOMPRESSORS[extension]
+    if shutil.which(command[0]) is None:
+        return DecompressedReader(opener(reader, "rb")), lambda abort=False: None
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    errors = []
+
+    def feed():
+        """Feed compressed data to the decompressor."""
+        try:
+            for chunk in iter(lambda: reader.read(IMPORT_CHUNK_SIZE), b""):
+                process.stdin.write(chunk)
+        except BrokenPipeError:
+            pass
+        except Exception as error:
+            errors.append(error)
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    def wait(abort=False):
+        """Wait for the decompressor and check its exit status."""
+        if abort:
+            # The output is not read anymore, so the feeder could block.
+            process.kill()
+        feeder.join()
+        process.stdout.close()
+        returncode = process.wait()
+        if abort:
+            return
+        if errors:
+            raise errors[0]
+        if returncode:
+            raise DecompressionError(
+                "Unable to decompress file with {}".format(command[0])
+            )
+
+    return process.stdout, wait
+
+
+class GzipWriter:
+    """Compress data to a gzip file concurrently with the caller.
+
+    Data is compressed by a multi-threaded compressor if installed or
+    in a separate thread otherwise. Errors of the compressor are raised
+    by :meth:`write` and :meth:`close`.
+    """
+
+    def __init__(self, path):
+        """Open the compressed file."""
+        self.output = open(path, "wb")
+        self.process = None
+        self.thread = None
+        self.error = None
+
+        if shutil.which(COMPRESSOR[0]) is not None:
+            self.process = subprocess.Popen(
+                COMPRESSOR, stdin=subprocess.PIPE, stdout=self.output
+            )
+        else:
+            self.chunks = queue.Queue(maxsize=16)
+            self.thread = threading.Thread(target=self._compress, daemon=True)
+            self.thread.start()
+
+    def _compress(self):
+        """Compress chunks from the queue, ``None`` marks the end."""
+        try:
+            with gzip.open(self.output, "wb") as compressed:
+                for chunk in iter(self.chunks.get, None):
+                    compressed.write(chunk)
+        except Exception as error:
+            self.error = error
+            # Drain the queue, so the writer is never blocked.
+            for _ in iter(self.chunks.get, None):
+                pass
+
+    def write(self, chunk):
+        """Compress the chunk of data."""
+        if self.process is not None:
+            self.process.stdin.write(chunk)
+        elif self.error is not None:
+            raise self.error
+        else:
+            self.chunks.put(chunk)
+
+    def close(self):
+        """Wait for all data to be compressed and close the file."""
+        try:
+            if self.process is not None:
+                try:
+                    self.process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                if self.process.wait():
+                    raise RuntimeError(
+                        "Unable to compress file with {}".format(COMPRESSOR[0])
+                    )
+            else:
+                self.chunks.put(None)
+                self.thread.join()
+                if self.error is not None:
+                    raise self.error
+        finally:
+            self.output.close()
+
 
 class ValidationError(Exception):
     """Field value validation error."""
@@ -272,13 +490,38 @@ class FileDescriptor:
         if refs is None:
             refs = []
         self.refs = refs
-
-    def import_file(self, imported_format=None, progress_from=0.0, progress_to=None):
+        # SHA-256 checksum of the extracted content, set by import_file
+        # if the content was read, i.e. the file was not only linked.
+        self.checksum = None
+        # Default progress callback of import_file, set by the process
+        # runtime to report progress through its buffer.
+        self.progress_callback = None
+
+    def import_file(
+        self,
+        imported_format=None,
+        progress_from=0.0,
+        progress_to=None,
+        progress_callback=None,
+    ):
         """Import field source file to working directory.
 
+        Local files which are not archives are imported in a single pass:
+        the file is decompressed and recompressed concurrently with
+        multi-threaded codecs if available and the checksum of its
+        extracted content is computed on the fly and stored to
+        ``checksum``. Files already in the requested format are linked
+        instead of copied, compressed files are still decompressed once
+        to verify them. If no content has to be read, because the
+        uncompressed file is only linked, ``checksum`` is ``None``.
+        Partial outputs are removed if the import fails.
+
         :param imported_format: Import file format (extracted, compressed or both)
         :param progress_from: Initial progress value
         :param progress_to: Final progress value
+        :param progress_callback: Function called with the progress, e.g.
+            :meth:`~resolwe.process.runtime.Process.progress`, which is
+            used by default when running in a process
         :return: Destination file path (if extracted and compressed, extracted path given)
         """
         if not hasattr(resolwe_runtime_utils, "import_file"):
@@ -287,6 +530,33 @@ class FileDescriptor:
         if imported_format is None:
             imported_format = resolwe_runtime_utils.ImportedFormat.BOTH
 
+        if progress_to is not None:
+            if not isinstance(progress_from, float) or not isinstance(
+                progress_to, float
+            ):
+                raise ValueError("Progress_from and progress_to must be float")
+            if progress_from < 0 or progress_from > 1:
+                raise ValueError("Progress_from must be between 0 and 1")
+            if progress_to < 0 or progress_to > 1:
+                raise ValueError("Progress_to must be between 0 and 1")
+            if progress_from >= progress_to:
+                raise ValueError("Progress_to must be higher than progress_from")
+
+        if progress_callback is None:
+            progress_callback = self.progress_callback
+
+        if progress_callback is None:
+
+            def progress_callback(progress):
+                """Report progress to the standard output."""
+                print(resolwe_runtime_utils.progress(progress))
+
+        split = self._split_compression()
+        if split is not None:
+            return self._import_stream(
+                imported_format, progress_from, progress_to, progress_callback, *split
+            )
+
         return resolwe_runtime_utils.import_file(
             src=self.file_temp,
             file_name=self.path,
@@ -295,6 +565,112 @@ class FileDescriptor:
             progress_to=progress_to,
         )
 
+    def _split_compression(self):
+        """Split the path into the name and the compression extension.
+
+        :return: tuple of the name and the extension (``None`` for
+            uncompressed files) or ``None`` if the file must be imported
+            by resolwe-runtime-utils
+        """
+        if self.is_remote or not self.file_temp or not os.path.isfile(self.file_temp):
+            return None
+
+        # The format is determined by the original file name, as the
+        # temporary file name has no extension. Extensions are case
+        # sensitive, as in resolwe-runtime-utils.
+        if self.path.endswith(ARCHIVE_EXTENSIONS):
+            return None
+
+        for extension in DECOMPRESSORS:
+            if self.path.endswith(extension):
+                return self.path[: -len(extension)], extension
+        return self.path, None
+
+    def _import_stream(
+        self,
+        imported_format,
+        progress_from,
+        progress_to,
+        progress_callback,
+        name,
+        extension,
+    ):
+        """Import the local file in a single pass."""
+        ImportedFormat = resolwe_runtime_utils.ImportedFormat
+        extract = imported_format != ImportedFormat.COMPRESSED
+        compress = imported_format != ImportedFormat.EXTRACTED
+        extracted_path = name
+        compressed_path = "{}.gz".format(name)
+        self.checksum = None
+
+        # Paths of outputs created so far, removed if the import fails.
+        created = []
+        try:
+            # Link files which are already in the requested format.
+            if extension is None and extract:
+                mechanism = transfer_file(self.file_temp, extracted_path)
+                created.append(extracted_path)
+                print("Imported file '{}' using {}.".format(extracted_path, mechanism))
+                extract = False
+            if extension == ".gz" and compress:
+                mechanism = transfer_file(self.file_temp, compressed_path)
+                created.append(compressed_path)
+                print("Imported file '{}' using {}.".format(compressed_path, mechanism))
+                compress = False
+
+            # Compressed files are always read to verify them.
+            if extract or compress or extension is not None:
+                checksum = hashlib.sha256()
+                with ExitStack() as stack:
+                    handle = stack.enter_context(open(self.file_temp, "rb"))
+                    reader = ProgressReader(
+                        handle, progress_callback, progress_from, progress_to
+                    )
+                    if extension is None:
+                        stream, wait = reader, lambda abort=False: None
+                    else:
+                        stream, wait = decompressed_stream(reader, extension)
+                    # The decompressor is stopped if reading fails.
+                    stack.push(
+                        lambda exc_type, exc, traceback: wait(
+                            abort=exc_type is not None
+                        )
+                    )
+
+                    outputs = []
+                    if extract:
+                        outputs.append(stack.enter_context(open(extracted_path, "wb")))
+                        created.append(extracted_path)
+                    if compress:
+                        compressed = GzipWriter(compressed_path)
+                        stack.callback(compressed.close)
+                        created.append(compressed_path)
+                        outputs.append(compressed)
+
+                    for chunk in iter(lambda: stream.read(IMPORT_CHUNK_SIZE), b""):
+                        checksum.update(chunk)
+                        for output in outputs:
+                            output.write(chunk)
+
+                self.checksum = checksum.hexdigest()
+        except BaseException as error:
+            for path in created:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if isinstance(error, DecompressionError):
+                message = DECOMPRESSORS[extension][2].format(self.path)
+                raise ValueError(message) from error
+            raise
+
+        if progress_to is not None:
+            progress_callback(progress_to)
+
+        if imported_format == ImportedFormat.COMPRESSED:
+            return compressed_path
+        return extracted_path
+
     def __repr__(self):
         """Return string representation."""
         return "<FileDescriptor path={}>".format(self.path)
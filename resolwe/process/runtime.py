@@ -3,12 +3,11 @@ import json
 import logging
 import os
 import sys
+import time
 import urllib
 
-import resolwe_runtime_utils
-
 from .descriptor import ProcessDescriptor
-from .fields import Field
+from .fields import Field, FileDescriptor, GroupDescriptor
 
 try:
     from plumbum import local as Cmd
@@ -43,6 +42,69 @@ except ImportError:
 PROCESS_INPUTS_NAME = "Input"
 # Outputs class name.
 PROCESS_OUTPUTS_NAME = "Output"
+# Minimal number of seconds between automatic flushes of buffered updates.
+FLUSH_INTERVAL = 1.0
+# Minimal change of progress which is reported.
+PROGRESS_DELTA = 0.01
+
+
+class UpdateBuffer:
+    """Buffer of updates sent to the executor.
+
+    Outputs are coalesced (the last value of a field wins), progress is
+    throttled and messages are collected, so all pending updates are
+    sent as a single protocol message. The buffer is flushed when
+    :data:`FLUSH_INTERVAL` elapses since the last flush, at checkpoints
+    and when the process exits.
+    """
+
+    def __init__(self):
+        """Construct an empty buffer."""
+        self.outputs = {}
+        self.messages = {}
+        self.progress = None
+        self.reported_progress = 0.0
+        self.flushed = time.monotonic()
+
+    def update_outputs(self, outputs):
+        """Buffer output values."""
+        self.outputs.update(outputs)
+        self.flush_if_due()
+
+    def update_progress(self, progress):
+        """Buffer progress, which is sent only if it changed enough."""
+        self.progress = progress
+        self.flush_if_due()
+
+    def add_message(self, key, message):
+        """Buffer a message under the protocol key, e.g. ``proc.info``."""
+        self.messages.setdefault(key, []).append(message)
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        """Flush the buffer if the flush interval has elapsed."""
+        if time.monotonic() - self.flushed >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self, final=False):
+        """Send all pending updates as a single protocol message.
+
+        :param final: Report any change of progress, however small
+        """
+        update = dict(self.outputs)
+        update.update(self.messages)
+        if self.progress is not None:
+            delta = abs(self.progress - self.reported_progress)
+            if delta >= PROGRESS_DELTA or (final and delta):
+                update["proc.progress"] = self.progress
+                self.reported_progress = self.progress
+                self.progress = None
+
+        self.outputs = {}
+        self.messages = {}
+        self.flushed = time.monotonic()
+        if update:
+            print(json.dumps(update), flush=True)
 
 
 class _IoBase:
@@ -116,6 +178,15 @@ class Inputs(_IoBase):
 class Outputs(_IoBase):
     """Process outputs."""
 
+    def __init__(self, fields, buffer=None, **kwargs):
+        """Construct outputs.
+
+        :param buffer: An instance of :class:`UpdateBuffer` collecting
+            output values, they are printed immediately if ``None``
+        """
+        super(_IoBase, self).__setattr__("_buffer", buffer)
+        super().__init__(fields, **kwargs)
+
     def __getattr__(self, name):
         """Get output field.
 
@@ -131,7 +202,10 @@ class Outputs(_IoBase):
         super().__setattr__(name, value)
 
         output_value = self._fields[name].to_output(self._data[name])
-        print(json.dumps(output_value))
+        if self._buffer is not None:
+            self._buffer.update_outputs(output_value)
+        else:
+            print(json.dumps(output_value))
 
 
 class ProcessMeta(type):
@@ -177,6 +251,7 @@ class Process(metaclass=ProcessMeta):
     def __init__(self):
         """Construct a new process instance."""
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._buffer = UpdateBuffer()
 
     def run(self, inputs, outputs):
         """Process entry point."""
@@ -198,6 +273,9 @@ class Process(metaclass=ProcessMeta):
                 for item in value:
                     export_files(item)
 
+        # Spawned process may depend on outputs set so far.
+        self.flush()
+
         export_files(inputs)
         print(
             "run {}".format(
@@ -205,32 +283,48 @@ class Process(metaclass=ProcessMeta):
             )
         )
 
+    def _bind_progress(self, value):
+        """Report progress of importing input files through the buffer."""
+        if isinstance(value, FileDescriptor):
+            value.progress_callback = self.progress
+        elif isinstance(value, GroupDescriptor):
+            for item in value._value.values():
+                self._bind_progress(item)
+        elif isinstance(value, list):
+            for item in value:
+                self._bind_progress(item)
+
+    def flush(self):
+        """Send buffered outputs, progress and messages to the executor.
+
+        Updates are flushed periodically and when the process exits, so
+        this is only needed at checkpoints, e.g. before a long-running
+        step whose results should not wait for its end.
+        """
+        self._buffer.flush(final=True)
+
     def progress(self, progress):
         """Report process progress.
 
         :param progress: A float between 0 and 1 denoting the progress
         """
-        report = resolwe_runtime_utils.progress(progress)
-        # TODO: Use the protocol to report progress.
-        print(report)
+        self._buffer.update_progress(progress)
 
     def info(self, *args):
         """Log informational message."""
-        report = resolwe_runtime_utils.info(" ".join([str(x) for x in args]))
-        # TODO: Use the protocol to report progress.
-        print(report)
+        self._buffer.add_message("proc.info", " ".join([str(x) for x in args]))
 
     def warning(self, *args):
         """Log warning message."""
-        report = resolwe_runtime_utils.warning(" ".join([str(x) for x in args]))
-        # TODO: Use the protocol to report progress.
-        print(report)
+        self._buffer.add_message("proc.warning", " ".join([str(x) for x in args]))
 
     def error(self, *args):
-        """Log error message."""
-        report = resolwe_runtime_utils.error(" ".join([str(x) for x in args]))
-        # TODO: Use the protocol to report progress.
-        print(report)
+        """Log error message.
+
+        Errors are sent immediately, together with pending updates.
+        """
+        self._buffer.add_message("proc.error", " ".join([str(x) for x in args]))
+        self.flush()
 
     def get_data_id_by_slug(self, slug):
         """Find data object ID for given slug.
@@ -279,7 +373,9 @@ class Process(metaclass=ProcessMeta):
         """
         self.logger.info("Process is starting")
 
-        outputs = Outputs(self._meta.outputs)
+        outputs = Outputs(self._meta.outputs, buffer=self._buffer)
+        for _, value in inputs.items():
+            self._bind_progress(value)
 
         self.logger.info("Process is running")
         try:
@@ -287,11 +383,12 @@ class Process(metaclass=ProcessMeta):
             return outputs.freeze()
         except Exception as error:
             self.logger.exception("Exception while running process")
-            print(resolwe_runtime_utils.error(str(error)))
+            self._buffer.add_message("proc.error", str(error))
             raise
         except:  # noqa
             self.logger.exception("Exception while running process")
-            print(resolwe_runtime_utils.error("Exception while running process"))
+            self._buffer.add_message("proc.error", "Exception while running process")
             raise
         finally:
+            self.flush()
             self.logger.info("Process has finished")
@@ -1,7 +1,16 @@
 # pylint: disable=missing-docstring
+import gzip
+import hashlib
+import io
+import json
 import os
+import shutil
 import sys
+import tempfile
 import unittest
+from unittest import mock
+
+import resolwe_runtime_utils
 
 from django.contrib.auth.models import AnonymousUser
 from django.test import LiveServerTestCase, override_settings
@@ -9,8 +18,13 @@ from django.test import LiveServerTestCase, override_settings
 from guardian.shortcuts import assign_perm
 
 from resolwe.flow.models import Data, Entity, Process
+from resolwe.process import FileField, GroupField, ListField
+from resolwe.process import Process as RuntimeProcess
+from resolwe.process.fields import FileDescriptor
+from resolwe.process.runtime import Inputs, UpdateBuffer
 from resolwe.test import (
     ProcessTestCase,
+    TestCase,
     tag_process,
     with_docker_executor,
     with_resolwe_host,
@@ -186,6 +200,170 @@ class PythonProcessTest(ProcessTestCase):
         self.assertEqual(data.output["dst"]["size"], 15)
 
 
+class FileDescriptorImportTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+        self.content = b"".join(b"line %d\n" % i for i in range(10000))
+        self.file_temp = os.path.join(self.tmp_dir, "upload")
+        with gzip.open(self.file_temp, "wb") as handle:
+            handle.write(self.content)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def test_import_both(self):
+        progress = []
+        descriptor = FileDescriptor("reads.txt.gz", file_temp=self.file_temp)
+        path = descriptor.import_file(
+            resolwe_runtime_utils.ImportedFormat.BOTH,
+            progress_to=0.5,
+            progress_callback=progress.append,
+        )
+
+        self.assertEqual(path, "reads.txt")
+        with open("reads.txt", "rb") as handle:
+            self.assertEqual(handle.read(), self.content)
+        with gzip.open("reads.txt.gz", "rb") as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.assertEqual(descriptor.checksum, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(progress[-1], 0.5)
+
+    def test_import_recompress(self):
+        with gzip.open(self.file_temp, "rb") as handle, open("plain", "wb") as plain:
+            shutil.copyfileobj(handle, plain)
+
+        descriptor = FileDescriptor("reads.txt", file_temp="plain")
+        path = descriptor.import_file(resolwe_runtime_utils.ImportedFormat.COMPRESSED)
+
+        self.assertEqual(path, "reads.txt.gz")
+        with gzip.open("reads.txt.gz", "rb") as handle:
+            self.assertEqual(handle.read(), self.content)
+
+    def test_import_linked(self):
+        with gzip.open(self.file_temp, "rb") as handle, open("plain", "wb") as plain:
+            shutil.copyfileobj(handle, plain)
+
+        descriptor = FileDescriptor("reads.txt", file_temp="plain")
+        descriptor.checksum = "stale"
+        path = descriptor.import_file(resolwe_runtime_utils.ImportedFormat.EXTRACTED)
+
+        # The content is not read, so no checksum is computed.
+        self.assertEqual(path, "reads.txt")
+        self.assertIsNone(descriptor.checksum)
+
+    def test_import_linked_compressed(self):
+        descriptor = FileDescriptor("reads.txt.gz", file_temp=self.file_temp)
+        path = descriptor.import_file(resolwe_runtime_utils.ImportedFormat.COMPRESSED)
+
+        # The linked file is still decompressed to verify it.
+        self.assertEqual(path, "reads.txt.gz")
+        self.assertFalse(os.path.exists("reads.txt"))
+        self.assertEqual(descriptor.checksum, hashlib.sha256(self.content).hexdigest())
+
+    @mock.patch("resolwe_runtime_utils.import_file")
+    def test_import_delegated(self, import_file):
+        # Only lower case .gz and .bz2 files are decompressed, as by
+        # resolwe-runtime-utils.
+        for name in ["reads.txt.xz", "reads.txt.GZ"]:
+            descriptor = FileDescriptor(name, file_temp=self.file_temp)
+            path = descriptor.import_file(resolwe_runtime_utils.ImportedFormat.BOTH)
+            self.assertEqual(path, name)
+            self.assertTrue(os.path.isfile("{}.gz".format(name)))
+
+        descriptor = FileDescriptor("reads.tar.gz", file_temp=self.file_temp)
+        descriptor.import_file(resolwe_runtime_utils.ImportedFormat.BOTH)
+        import_file.assert_called_once()
+
+    def test_import_progress_checks(self):
+        descriptor = FileDescriptor("reads.txt.gz", file_temp=self.file_temp)
+        for progress_from, progress_to in [(0, 0.5), (0.5, 1.5), (0.5, 0.5)]:
+            with self.assertRaises(ValueError):
+                descriptor.import_file(
+                    progress_from=progress_from, progress_to=progress_to
+                )
+        self.assertFalse(os.path.exists("reads.txt"))
+
+    @mock.patch("resolwe.process.runtime.FLUSH_INTERVAL", 3600)
+    def test_import_progress_buffered(self):
+        class ImportProcess(RuntimeProcess):
+            slug = "test-import-progress"
+            name = "Test Import Progress"
+            version = "1.0.0"
+            process_type = "data:test"
+
+            class Input:
+                class Group:
+                    files = ListField(FileField())
+
+                group = GroupField(Group)
+
+            def run(self, inputs, outputs):
+                inputs.group.files[0].import_file(progress_to=0.5)
+
+        process = ImportProcess()
+        inputs = Inputs(process._meta.inputs)
+        inputs.group = {
+            "files": [{"file": "reads.txt.gz", "file_temp": self.file_temp}]
+        }
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            with mock.patch.object(process, "flush"):
+                process.start(inputs)
+
+        # Progress is reported through the process' buffer.
+        self.assertNotIn("proc.progress", stdout.getvalue())
+        self.assertEqual(process._buffer.progress, 0.5)
+
+    def test_import_corrupted(self):
+        with open(self.file_temp, "rb") as handle:
+            compressed = handle.read()
+        with open(self.file_temp, "wb") as handle:
+            handle.write(compressed[: len(compressed) // 2])
+
+        for imported_format in [
+            resolwe_runtime_utils.ImportedFormat.BOTH,
+            resolwe_runtime_utils.ImportedFormat.COMPRESSED,
+        ]:
+            descriptor = FileDescriptor("reads.txt.gz", file_temp=self.file_temp)
+            with self.assertRaisesRegex(ValueError, "Invalid gzip file format"):
+                descriptor.import_file(imported_format)
+
+            # Partial outputs are removed.
+            self.assertFalse(os.path.exists("reads.txt"))
+            self.assertFalse(os.path.exists("reads.txt.gz"))
+            self.assertIsNone(descriptor.checksum)
+
+
+class UpdateBufferTest(TestCase):
+    def flush(self, buffer, **kwargs):
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            buffer.flush(**kwargs)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    @mock.patch("resolwe.process.runtime.FLUSH_INTERVAL", 3600)
+    def test_coalesce(self):
+        buffer = UpdateBuffer()
+        for value in range(10):
+            buffer.update_outputs({"value": value})
+            buffer.update_progress(value / 1000)
+        buffer.add_message("proc.info", "first")
+        buffer.add_message("proc.info", "second")
+
+        self.assertEqual(
+            self.flush(buffer), [{"value": 9, "proc.info": ["first", "second"]}],
+        )
+        self.assertEqual(self.flush(buffer), [])
+        self.assertEqual(self.flush(buffer, final=True), [{"proc.progress": 0.009}])
+
+        buffer.update_progress(0.5)
+        self.assertEqual(self.flush(buffer), [{"proc.progress": 0.5}])
+
+
 class PythonProcessRequirementsTest(ProcessTestCase):
     def setUp(self):
         super().setUp()
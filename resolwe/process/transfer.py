@@ -0,0 +1 @@
+../flow/executors/transfer.py
\ No newline at end of file
@@ -0,0 +1,72 @@
+# pylint: disable=missing-docstring
+import csv
+import gzip
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+
+from resolwe.test import TestCase
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), "..", "tools")
+
+
+def load_tool(name):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(TOOLS_DIR, "{}.py".format(name))
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ParseTabularFileTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tool = load_tool("parse_tabular_file")
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.tmp_dir, "output.tab.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        super().tearDown()
+
+    def expected(self, text, delimiter):
+        output = io.StringIO()
+        csvwriter = csv.writer(output, delimiter="\t", lineterminator="\n")
+        for line in io.StringIO(text, newline=None):
+            csvwriter.writerow(line.strip().split(delimiter))
+        return output.getvalue()
+
+    def parse(self, name, text, gzipped=False, chunk_size=None):
+        input_file = os.path.join(self.tmp_dir, name)
+        opener = gzip.open if gzipped else open
+        with opener(input_file, "wt") as handle:
+            handle.write(text)
+
+        ext, detected = self.tool.detect_format(input_file)
+        self.assertEqual(detected, gzipped)
+        if chunk_size is not None:
+            self.tool.CHUNK_SIZE = chunk_size
+
+        chunks = self.tool.text_rows(input_file, detected, self.tool.DELIMITERS[ext])
+        self.tool.write_output(chunks, self.output_file, workers=2)
+        with gzip.open(self.output_file, "rt") as handle:
+            return handle.read()
+
+    def test_tab(self):
+        text = 'Gene\tExpression\nA\t1.5\n\nB\t"2"\r\nC \t3\n'
+        self.assertEqual(self.parse("input.tab", text), self.expected(text, "\t"))
+
+    def test_csv(self):
+        text = "Gene,Expression\nA,1.5\nB\t,2\n"
+        self.assertEqual(self.parse("input.csv", text), self.expected(text, ","))
+
+    def test_gzipped_chunks(self):
+        text = "".join("Gene{}\t{}\n".format(i, i / 3) for i in range(1000))
+        output = self.parse("input.txt.gz", text, gzipped=True, chunk_size=100)
+        self.assertEqual(output, self.expected(text, "\t"))
+
+    def test_empty(self):
+        self.assertEqual(self.parse("input.tsv", ""), "")
@@ -1,11 +1,37 @@
 #!/usr/bin/env python3
-"""Parse tabular file."""
+"""Parse tabular file.
+
+Input is read (and decompressed, if gzipped) in a separate thread and
+parsed in large chunks of lines. Parsed chunks are compressed in
+parallel into independent gzip members, which are written to the output
+file in order. Decompressed output is the same as if it was written
+through a single gzip stream.
+"""
 import argparse
 import csv
 import gzip
+import io
+import locale
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+#: Approximate number of characters of input parsed at once.
+CHUNK_SIZE = 4 * 1024 * 1024
+
+#: Compression level of output, the same as the default of :func:`gzip.open`.
+COMPRESSION_LEVEL = 9
+
+#: Number of chunks read ahead of parsing.
+READ_AHEAD = 4
 
-import xlrd
+#: Delimiters of supported text formats by their extensions.
+DELIMITERS = {".tab": "\t", ".txt": "\t", ".tsv": "\t", ".csv": ","}
+
+#: Magic number at the start of gzip files.
+GZIP_MAGIC = b"\x1f\x8b"
 
 
 def parse_arguments():
@@ -13,38 +39,136 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description="Parse tabular file")
     parser.add_argument("input_file", help="Tabular file.")
     parser.add_argument("output_file", help="Output file.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of threads compressing the output.",
+    )
     return parser.parse_args()
 
 
+def detect_format(path):
+    """Detect the extension and compression of the input file.
+
+    :return: tuple of the extension (without the ``.gz`` suffix) and a
+        flag telling if the file is gzipped
+    """
+    with open(path, "rb") as handle:
+        gzipped = handle.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+    name, ext = os.path.splitext(path)
+    if ext.lower() == ".gz":
+        ext = os.path.splitext(name)[-1]
+    return ext.lower(), gzipped
+
+
+def read_chunks(path, gzipped):
+    """Read lines of the text file in chunks in a separate thread."""
+    chunks = queue.Queue(maxsize=READ_AHEAD)
+
+    def reader():
+        """Put chunks of lines into the queue, ``None`` marks the end."""
+        try:
+            opener = gzip.open if gzipped else open
+            with opener(path, "rt") as infile:
+                while True:
+                    lines = infile.readlines(CHUNK_SIZE)
+                    if not lines:
+                        break
+                    chunks.put(lines)
+            chunks.put(None)
+        except Exception as error:
+            chunks.put(error)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
+
+    thread.join()
+
+
+def text_rows(path, gzipped, delimiter):
+    """Generate chunks of rows of the delimited text file."""
+    for lines in read_chunks(path, gzipped):
+        yield [line.strip().split(delimiter) for line in lines]
+
+
+def excel_rows(path):
+    """Generate chunks of rows of the first sheet of the Excel file."""
+    import xlrd
+
+    worksheet = xlrd.open_workbook(path).sheets()[0]
+    rows_per_chunk = 10000
+    for start in range(0, worksheet.nrows, rows_per_chunk):
+        stop = min(start + rows_per_chunk, worksheet.nrows)
+        yield [worksheet.row_values(rownum) for rownum in range(start, stop)]
+
+
+def format_rows(rows):
+    """Format rows as tab separated lines."""
+    output = io.StringIO()
+    csvwriter = csv.writer(output, delimiter=str("\t"), lineterminator="\n")
+    csvwriter.writerows(rows)
+    return output.getvalue()
+
+
+def compress(text, encoding):
+    """Compress the text into a gzip member."""
+    return gzip.compress(text.encode(encoding), COMPRESSION_LEVEL)
+
+
+def write_output(chunks, output_file, workers):
+    """Format and compress chunks of rows and write them in order.
+
+    At most ``2 * workers`` chunks are held in memory at once.
+    """
+    # The same encoding as used by files opened in text mode.
+    encoding = locale.getpreferredencoding(False)
+    pending = deque()
+    written = 0
+
+    with open(output_file, "wb") as outfile, ThreadPoolExecutor(workers) as pool:
+        for rows in chunks:
+            pending.append(pool.submit(compress, format_rows(rows), encoding))
+            if len(pending) >= 2 * workers:
+                outfile.write(pending.popleft().result())
+                written += 1
+
+        while pending:
+            outfile.write(pending.popleft().result())
+            written += 1
+
+        # Empty output must still be a valid gzip file.
+        if not written:
+            outfile.write(compress("", encoding))
+
+
 def main():
     """Run the program."""
     args = parse_arguments()
 
-    ext = os.path.splitext(args.input_file)[-1].lower()
-    with gzip.open(args.output_file, mode="wt") as outfile:
-        csvwriter = csv.writer(outfile, delimiter=str("\t"), lineterminator="\n")
+    try:
+        ext, gzipped = detect_format(args.input_file)
+        if ext in DELIMITERS:
+            chunks = text_rows(args.input_file, gzipped, DELIMITERS[ext])
+        elif ext in (".xls", ".xlsx"):
+            chunks = excel_rows(args.input_file)
+        else:
+            print('{"proc.error":"File extension not recognized."}')
+            chunks = []
 
-        try:
-            if ext in (".tab", ".txt", ".tsv"):
-                with open(args.input_file) as infile:
-                    for line in infile:
-                        outline = line.strip().split("\t")
-                        csvwriter.writerow(outline)
-            elif ext == ".csv":
-                with open(args.input_file) as infile:
-                    for line in infile:
-                        outline = line.strip().split(",")
-                        csvwriter.writerow(outline)
-            elif ext in (".xls", ".xlsx"):
-                workbook = xlrd.open_workbook(args.input_file)
-                worksheet = workbook.sheets()[0]
-                for rownum in range(worksheet.nrows):
-                    csvwriter.writerow(worksheet.row_values(rownum))
-            else:
-                print('{"proc.error":"File extension not recognized."}')
-        except Exception:
-            print('{"proc.error":"Corrupt or unrecognized file."}')
-            raise
+        write_output(chunks, args.output_file, max(1, args.workers))
+    except Exception:
+        print('{"proc.error":"Corrupt or unrecognized file."}')
+        raise
 
 
 if __name__ == "__main__":